@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Portique du scoring ML (ml/gate.py) contre la forêt seule, sur des flux reproductibles :
+  - corpus de benchmark (trafic normal, attaques générées, payloads du générateur)
+  - trafic légitime d'une version de l'API jamais vue à l'entraînement (benchmarks/compare_models.py)
+Chaque ligne admise est aussi scorée par la forêt (contrôle complet, pas d'échantillonnage) :
+taux d'admission, désaccords, écart de score et indice de stabilité (PSI) des scores, débit.
+
+    python benchmarks/check_gate.py            # code de sortie 1 si trop de désaccords
+    python benchmarks/check_gate.py --json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from benchmarks.corpus import build_corpus
+from benchmarks.compare_models import drift_logs
+from config.settings import settings
+from ml.anomaly_detector import AnomalyDetector
+from ml.retrain import population_stability
+from ml.train import generate_normal_logs, featurize
+
+# Désaccords tolérés : part des lignes admises que la forêt aurait signalées
+MAX_DISAGREEMENT = 0.001
+# Mesures de débit répétées (portique activé / désactivé en alternance), la meilleure est gardée
+REPEAT = 3
+
+
+def run(score_batch, items, gate: bool, batch: int) -> tuple:
+    """(résultats, durée en s) du scoring de `items` par lots, portique activé ou non"""
+    settings.ML_GATE = gate
+    t0 = time.perf_counter()
+    results = []
+    for i in range(0, len(items), batch):
+        results.extend(score_batch(items[i:i + batch]))
+    return results, time.perf_counter() - t0
+
+
+def throughput(score_batch, items, batch: int) -> dict:
+    """Lignes/s sans et avec portique, après un passage de chauffe"""
+    run(score_batch, items, True, batch)
+    best = {False: float("inf"), True: float("inf")}
+    for _ in range(REPEAT):
+        for gate in best:
+            best[gate] = min(best[gate], run(score_batch, items, gate, batch)[1])
+    return {"forest": round(len(items) / best[False], 1), "gate": round(len(items) / best[True], 1)}
+
+
+def check_stream(detector, lines: list, batch: int) -> dict:
+    import numpy as np
+
+    X = featurize(lines, n_jobs=1)
+    admitted, _ = detector.current.gate.admit(X)
+    forest, _ = run(detector.predict_features, X, False, batch)
+    cascade, _ = run(detector.predict_features, X, True, batch)
+
+    disagreements = sum(1 for a, (f, _) in zip(admitted, forest) if a and f)
+    errors = np.array([abs(c - f) for a, (_, c), (_, f) in zip(admitted, cascade, forest) if a])
+    return {
+        "lines": len(lines),
+        "admitted": int(admitted.sum()),
+        "pass_rate": round(float(admitted.mean()), 4),
+        "disagreements": disagreements,
+        "score_error": {"mean": round(float(errors.mean()), 4) if len(errors) else 0.0,
+                        "max": round(float(errors.max()), 4) if len(errors) else 0.0},
+        "psi": round(population_stability([s for _, s in forest], [s for _, s in cascade]), 4),
+        # Scoring seul (features déjà extraites) puis bout en bout (extraction comprise, comme le moteur)
+        "scoring_lines_per_sec": throughput(detector.predict_features, X, batch),
+        "end_to_end_lines_per_sec": throughput(detector.predict_batch, lines, batch),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Portique ML contre la forêt seule : admission, désaccords, débit")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--train", type=int, default=5000, help="Lignes normales d'entraînement")
+    parser.add_argument("--drift", type=int, default=4000, help="Lignes du flux dérivé")
+    parser.add_argument("--batch", type=int, default=500, help="Lignes par lot")
+    parser.add_argument("--json", action="store_true", help="Rapport JSON sur stdout")
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    train = generate_normal_logs(args.train)
+    streams = {"corpus": build_corpus(args.seed), "drift": drift_logs(args.drift, args.seed + 1)}
+    with tempfile.TemporaryDirectory(prefix="siem_gate_") as tmpdir:
+        paths = os.path.join(tmpdir, "model.pkl"), os.path.join(tmpdir, "scaler.pkl")
+        trained = AnomalyDetector(*paths)
+        trained.train(train, contamination=0.01)
+        trained.save_model()
+        # Rechargé depuis la forêt exportée et le portique enregistré, comme en production
+        detector = AnomalyDetector(*paths)
+        report = {name: check_stream(detector, lines, args.batch) for name, lines in streams.items()}
+
+    failed = False
+    for name, r in report.items():
+        rate = r["disagreements"] / max(r["admitted"], 1)
+        failed |= rate > MAX_DISAGREEMENT
+        print(f"{name:<8} admises {r['admitted']}/{r['lines']} ({r['pass_rate']:.1%})  "
+              f"désaccords {r['disagreements']}  écart de score moyen {r['score_error']['mean']:.3f} "
+              f"(max {r['score_error']['max']:.3f})  PSI {r['psi']:.3f}  "
+              f"scoring {r['scoring_lines_per_sec']['forest']:.0f} -> {r['scoring_lines_per_sec']['gate']:.0f} lignes/s  "
+              f"bout en bout {r['end_to_end_lines_per_sec']['forest']:.0f} -> "
+              f"{r['end_to_end_lines_per_sec']['gate']:.0f} lignes/s", file=sys.stderr)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
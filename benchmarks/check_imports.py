@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Budget de temps d'import des points d'entrée sans interface (rejeu, moteur headless) :
+chaque module est importé dans un interpréteur neuf (python -X importtime), son temps
+cumulé est comparé au budget et aucune dépendance lourde (Qt, folium, numpy, scikit-learn,
+requests, geoip2) ne doit être chargée à l'import
+
+    python benchmarks/check_imports.py              # code de sortie 1 si un budget est dépassé
+    python benchmarks/check_imports.py --scale 2    # budgets x2 (machine lente, CI partagée)
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Module -> budget d'import (ms)
+BUDGETS = {
+    "siem_cli": 50,
+    "ml.anomaly_detector": 50,
+    "core.replay": 250,
+    "core.engine": 250,
+}
+# Chargés à la demande (premier appel, warmup du modèle) : jamais à l'import
+FORBIDDEN = ("PySide6", "folium", "numpy", "sklearn", "requests", "geoip2")
+
+
+def measure(module: str):
+    """(temps cumulé en ms, dépendances lourdes chargées) pour un import à froid de `module`"""
+    code = f"import sys, {module}; print(','.join(m for m in {FORBIDDEN!r} if m in sys.modules))"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          cwd=BASE_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    cumulative = None
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package" ; le module lui-même est au niveau 0
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].rstrip() == f" {module}":
+            cumulative = int(parts[1]) / 1000
+    loaded = [m for m in proc.stdout.strip().split(",") if m]
+    return cumulative, loaded
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Budget de temps d'import des points d'entrée headless")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplie tous les budgets")
+    parser.add_argument("--runs", type=int, default=3, help="Imports par module (le plus rapide est gardé)")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    print(f"{'Module':<24}{'Import ms':>10}{'Budget':>8}  Dépendances lourdes")
+    for module, budget in BUDGETS.items():
+        try:
+            results = [measure(module) for _ in range(max(1, args.runs))]
+        except RuntimeError as e:
+            print(f"{module:<24}{'erreur':>10}{budget * args.scale:>8.0f}  {e}")
+            failures += 1
+            continue
+        elapsed = min(ms for ms, _ in results)
+        loaded = sorted({m for _, mods in results for m in mods})
+        ok = elapsed <= budget * args.scale and not loaded
+        failures += not ok
+        print(f"{module:<24}{elapsed:>10.1f}{budget * args.scale:>8.0f}  {', '.join(loaded) or '-'}"
+              f"{'' if ok else '  <- ÉCHEC'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
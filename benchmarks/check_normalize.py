@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Équivalence de utils.normalize avec l'ancienne implémentation sur un corpus de référence :
+corpus de benchmark + payloads du générateur sous différents encodages (URL, double URL,
+entités HTML, échappements \\xNN / \\uNNNN) et fragments aléatoires mêlant %, & et \\
+
+    python benchmarks/check_normalize.py            # code de sortie 1 en cas d'écart inattendu
+    python benchmarks/check_normalize.py -v         # affiche les écarts
+"""
+
+import os
+import sys
+import html
+import random
+import argparse
+import warnings
+from urllib.parse import quote, unquote
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from benchmarks.corpus import build_corpus, SIGNATURE_PAYLOADS, BEHAVIORAL_PAYLOADS
+from utils.normalize import normalize
+
+
+def legacy_normalize(text: str) -> str:
+    """Ancienne implémentation, conservée comme référence (None = repli sur erreur de décodage)"""
+    if not text:
+        return ""
+    try:
+        decoded = unquote(text)
+        decoded = unquote(decoded)
+        decoded = html.unescape(decoded)
+        decoded = decoded.encode('utf-8').decode('unicode_escape')
+        decoded = decoded.replace('\\"', '"').replace("\\'", "'")
+        decoded = decoded.replace("\\\\", "").replace("\\", "")
+        decoded = " ".join(decoded.split())
+        return decoded.lower().strip()
+    except Exception:
+        return None
+
+
+def encodings(payload: str) -> list:
+    escaped = "".join(f"\\x{ord(c):02x}" if c in "<>'\"/;" else c for c in payload)
+    return [
+        payload,
+        quote(payload, safe=""),
+        quote(quote(payload, safe=""), safe=""),
+        html.escape(payload),
+        "".join(f"&#{ord(c)};" if not c.isalnum() else c for c in payload),
+        escaped,
+        "".join(f"\\u{ord(c):04x}" if c in "<>'\"" else c for c in payload),
+        payload.replace("'", "\\'").replace('"', '\\"'),
+    ]
+
+
+FUZZ_TOKENS = ["%", "%25", "%27", "%3C", "%5C", "%2", "&", "&amp;", "&#39;", "&lt", "&#x3c;", "\\",
+               "\\x3c", "\\x4", "\\u0027", "\\n", "\\t", "\\'", '\\"', "\\\\", "\\101", "\\N{LESS-THAN SIGN}",
+               "x", "'", "<", " ", "  ", "\t", "A", "9", ";", "/", "=", "?"]
+
+
+def fuzz_cases(seed: int, count: int = 20000) -> list:
+    rng = random.Random(seed)
+    return ["".join(rng.choice(FUZZ_TOKENS) for _ in range(rng.randint(1, 12))) for _ in range(count)]
+
+
+def build_cases(seed: int) -> list:
+    cases = build_corpus(seed)
+    for payloads in (SIGNATURE_PAYLOADS, BEHAVIORAL_PAYLOADS):
+        for entries in payloads.values():
+            for payload in entries:
+                for variant in encodings(payload):
+                    cases.append(f"2026-02-04T12:00:00.000Z  10.0.0.1  GET /search?q={variant}  200  12ms")
+    return cases + fuzz_cases(seed)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Équivalence de normalize() avec l'ancienne implémentation")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+    # Séquences invalides (\d, \.) signalées par le codec unicode_escape de l'ancien code
+    warnings.simplefilter("ignore", DeprecationWarning)
+
+    cases = build_cases(args.seed)
+    same = fallback = non_ascii = 0
+    mismatches = []
+    for text in cases:
+        expected = legacy_normalize(text)
+        got = normalize(text)
+        if expected == got:
+            same += 1
+        elif expected is None:
+            # L'ancien code abandonnait tout décodage sur un échappement invalide
+            fallback += 1
+        elif any(ord(c) > 127 for c in unquote(unquote(text))):
+            # L'ancien aller-retour unicode_escape transformait l'UTF-8 en mojibake
+            non_ascii += 1
+        else:
+            mismatches.append((text, expected, got))
+
+    print(f"Lignes: {len(cases)}  identiques: {same}  écarts attendus: {fallback} (échappement invalide), "
+          f"{non_ascii} (non ASCII)  écarts inattendus: {len(mismatches)}")
+    if args.verbose:
+        for text, expected, got in mismatches[:50]:
+            print(f"- {text!r}\n  ancien : {expected!r}\n  nouveau: {got!r}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
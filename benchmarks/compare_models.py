@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Comparaison des détecteurs ML (ML_MODEL) : forêt d'isolement, Half-Space Trees en ligne
+et les deux combinés. Même flux pour tous, traité par lots comme dans le moteur
+(le modèle en ligne apprend chaque lot après l'avoir scoré) :
+  - détection : trafic normal + attaques mélangés, taux de faux positifs et de détection
+    (aussi sur les seules attaques sans pattern connu, là où le modèle compte vraiment)
+  - dérive : trafic légitime d'une nouvelle version de l'API, faux positifs par fenêtre
+  - latence : predict (une ligne) et predict_batch (lignes/s), mémoire du modèle en ligne
+Les taux "sans pattern" excluent les lignes où un pattern d'attaque connu force l'anomalie
+(même boost pour tous les modèles, ';' d'un user-agent suffit) : seul le modèle y décide.
+
+    python benchmarks/compare_models.py             # résumé + JSON sur stdout
+    python benchmarks/compare_models.py -o ml.json
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from benchmarks.run import summarize
+from ml.anomaly_detector import AnomalyDetector
+from ml.streaming import StreamingDetector
+from ml.train import generate_normal_logs, generate_attack_logs, featurize
+
+REQUEST_RE = re.compile(r"\b(GET|POST|PUT|DELETE|OPTIONS) (/\S*)")
+
+
+def drift_logs(count: int, seed: int) -> list:
+    """Trafic légitime jamais vu à l'entraînement : API /api/v2 paginée (un seul paramètre : '&' est un pattern)"""
+    rng = random.Random(seed)
+    random.seed(seed)
+
+    def rewrite(match):
+        path = match.group(2).split("?")[0]
+        return f"{match.group(1)} /api/v2{path}/items?page={rng.randint(1, 40)}"
+
+    return [REQUEST_RE.sub(rewrite, line, count=1) for line in generate_normal_logs(count)]
+
+
+def is_pattern(features) -> bool:
+    """Pattern d'attaque connu (indices 4 à 8) : boost identique pour tous les modèles"""
+    return bool((features[4:9] > 0).any())
+
+
+def run_stream(detector, lines: list, batch: int) -> list:
+    results = []
+    for i in range(0, len(lines), batch):
+        results.extend(detector.predict_batch(lines[i:i + batch]))
+    return results
+
+
+def bench_detection(detector, stream: list, labels: list, patterns: list, batch: int) -> dict:
+    flags = [a for a, _ in run_stream(detector, stream, batch)]
+
+    def rate(selected):
+        return round(sum(selected) / max(len(selected), 1), 4)
+
+    return {
+        "fp_rate": rate([f for f, y in zip(flags, labels) if not y]),
+        "fp_rate_no_pattern": rate([f for f, y, p in zip(flags, labels, patterns) if not y and not p]),
+        "tp_rate": rate([f for f, y in zip(flags, labels) if y]),
+        "tp_rate_no_pattern": rate([f for f, y, p in zip(flags, labels, patterns) if y and not p]),
+    }
+
+
+def bench_drift(detector, lines: list, patterns: list, batch: int, window: int) -> list:
+    """Taux de faux positifs (lignes sans pattern) de chaque fenêtre successive du flux dérivé"""
+    flags = [a for a, _ in run_stream(detector, lines, batch)]
+    rates = []
+    for i in range(0, len(flags), window):
+        kept = [f for f, p in zip(flags[i:i + window], patterns[i:i + window]) if not p]
+        rates.append(round(sum(kept) / max(len(kept), 1), 4))
+    return rates
+
+
+def bench_latency(detector, lines: list, batch: int) -> dict:
+    clock = time.perf_counter_ns
+    single = []
+    for line in lines[:300]:
+        t0 = clock()
+        detector.predict(line)
+        single.append(clock() - t0)
+    t0 = clock()
+    run_stream(detector, lines, batch)
+    batch_ns = clock() - t0
+    return {"predict": summarize(single, sum(single), len(single)),
+            "predict_batch": {"batch": batch, "lines_per_sec": round(len(lines) / (batch_ns / 1e9), 1)}}
+
+
+def build_detectors(args, tmpdir: str, train: list) -> dict:
+    # Forêt entraînée (random_state fixe) puis rechargée depuis sa forme exportée, comme en production
+    paths = os.path.join(tmpdir, "model.pkl"), os.path.join(tmpdir, "scaler.pkl")
+    trained = AnomalyDetector(*paths)
+    trained.train(train, contamination=0.01)
+    trained.save_model()
+    forest = AnomalyDetector(*paths)
+    detectors = {
+        "iforest": forest,
+        "hst": StreamingDetector(window=args.window),
+        "both": StreamingDetector(forest=forest, window=args.window),
+    }
+    # Modèles en ligne : mêmes lignes d'entraînement, apprises par lots (premières fenêtres)
+    X = featurize(train, n_jobs=1)
+    for name in ("hst", "both"):
+        online = detectors[name]
+        for i in range(0, len(X), args.batch):
+            online.hst.update(X[i:i + args.batch][~(X[i:i + args.batch, 4:9] > 0).any(axis=1)])
+    return detectors
+
+
+def run(args) -> dict:
+    random.seed(args.seed)
+    train = generate_normal_logs(args.train)
+    normal = generate_normal_logs(args.normal)
+    attacks = generate_attack_logs(args.attacks)
+    stream = [(line, False) for line in normal] + [(line, True) for line in attacks]
+    random.Random(args.seed).shuffle(stream)
+    lines = [line for line, _ in stream]
+    labels = [label for _, label in stream]
+    patterns = [is_pattern(x) for x in featurize(lines, n_jobs=1)]
+    drift = drift_logs(args.drift, args.seed + 1)
+    drift_patterns = [is_pattern(x) for x in featurize(drift, n_jobs=1)]
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="siem_ml_") as tmpdir:
+        detectors = build_detectors(args, tmpdir, train)
+        for name, detector in detectors.items():
+            results[name] = {"detection": bench_detection(detector, lines, labels, patterns, args.batch),
+                             "drift_fp_by_window": bench_drift(detector, drift, drift_patterns, args.batch,
+                                                               args.window)}
+        # Latences mesurées à part, sur des modèles déjà passés par les mêmes flux
+        for name, detector in detectors.items():
+            results[name]["latency"] = bench_latency(detector, normal, args.batch)
+            if isinstance(detector, StreamingDetector):
+                hst = detector.hst
+                results[name]["online_memory_kb"] = round(sum(a.nbytes for a in (
+                    hst.ref, hst.latest, hst.buffer, hst.feature, hst.value)) / 1024, 1)
+    return {
+        "meta": {"seed": args.seed, "train": args.train, "normal": args.normal, "attacks": args.attacks,
+                 "drift": args.drift, "window": args.window, "batch": args.batch},
+        "results": results,
+    }
+
+
+def print_summary(report: dict):
+    print(f"{'Modèle':<9}{'FP %':>7}{'TP %':>7}{'Sans pattern FP / TP %':>24}{'p50 µs':>9}{'p99 µs':>9}"
+          f"{'lignes/s':>10}  Dérive : FP % sans pattern par fenêtre", file=sys.stderr)
+    for name, r in report["results"].items():
+        d, lat = r["detection"], r["latency"]
+        drift = " ".join(f"{fp * 100:.1f}" for fp in r["drift_fp_by_window"])
+        hidden = f"{d['fp_rate_no_pattern'] * 100:.1f} / {d['tp_rate_no_pattern'] * 100:.1f}"
+        print(f"{name:<9}{d['fp_rate'] * 100:>7.1f}{d['tp_rate'] * 100:>7.1f}{hidden:>24}"
+              f"{lat['predict']['p50_us']:>9.0f}{lat['predict']['p99_us']:>9.0f}"
+              f"{lat['predict_batch']['lines_per_sec']:>10.0f}  {drift}", file=sys.stderr)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Forêt d'isolement / Half-Space Trees : détection, dérive, latence")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--train", type=int, default=5000, help="Lignes normales d'entraînement")
+    parser.add_argument("--normal", type=int, default=4000, help="Lignes normales du flux évalué")
+    parser.add_argument("--attacks", type=int, default=500, help="Attaques du flux évalué")
+    parser.add_argument("--drift", type=int, default=8192, help="Lignes du flux dérivé")
+    parser.add_argument("--window", type=int, default=2048, help="Fenêtre du modèle en ligne")
+    parser.add_argument("--batch", type=int, default=100, help="Lignes par lot")
+    parser.add_argument("-o", "--output", help="Fichier JSON (défaut: stdout)")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    print_summary(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""
+Corpus de benchmark déterministe : même graine -> mêmes lignes, octet pour octet.
+Construit à partir des payloads du générateur d'attaques et des générateurs de ml/train.py
+"""
+
+import os
+import re
+import sys
+import random
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+# Certaines payloads comportementales sont tirées au hasard à l'import du générateur :
+# on fixe la graine avant de (re)charger le module
+PAYLOAD_SEED = 0
+random.seed(PAYLOAD_SEED)
+if "attacks_generator" in sys.modules:
+    import importlib
+    importlib.reload(sys.modules["attacks_generator"])
+from attacks_generator import generate_log_entry, SIGNATURE_PAYLOADS, BEHAVIORAL_PAYLOADS
+from ml.train import generate_normal_logs, generate_attack_logs
+
+# generate_log_entry() horodate avec datetime.now() : on remplace par une horloge fixe
+LEADING_TIME_RE = re.compile(r"^\d{4}-\d{2}-\d{2}T\S+")
+EPOCH = datetime(2026, 2, 4, 12, 0, 0, tzinfo=timezone.utc)
+
+
+def _fixed_time(i: int) -> str:
+    return (EPOCH + timedelta(seconds=i)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def payload_logs(rng_seed: int, rounds: int = 1) -> list:
+    """Toutes les payloads signatures + comportementales, `rounds` fois (IP/URL tirées au hasard)"""
+    random.seed(rng_seed)
+    logs = []
+    for _ in range(rounds):
+        for payloads in (SIGNATURE_PAYLOADS, BEHAVIORAL_PAYLOADS):
+            for attack_type, entries in payloads.items():
+                for payload in entries:
+                    line = generate_log_entry(attack_type, payload).rstrip("\n")
+                    logs.append(LEADING_TIME_RE.sub(_fixed_time(len(logs)), line, count=1))
+    return logs
+
+
+def build_corpus(seed: int = 42, normal: int = 4000, attacks: int = 500, payload_rounds: int = 2) -> list:
+    """
+    Corpus mélangé : trafic normal (majoritaire), attaques de ml/train.py
+    et payloads du générateur. Les lignes multi-lignes (payloads contenant '\\n')
+    sont aplaties pour que chaque entrée soit une ligne de log
+    """
+    logs = payload_logs(seed, payload_rounds)
+    random.seed(seed + 1)
+    logs += generate_normal_logs(normal)
+    random.seed(seed + 2)
+    logs += generate_attack_logs(attacks)
+    random.Random(seed).shuffle(logs)
+    return [line.replace("\r", " ").replace("\n", " ") for line in logs]
+
+
+def corpus_hash(lines: list) -> str:
+    """Empreinte du corpus, pour vérifier que deux runs comparés portent sur les mêmes données"""
+    h = hashlib.sha256()
+    for line in lines:
+        h.update(line.encode("utf-8", errors="surrogatepass"))
+        h.update(b"\n")
+    return h.hexdigest()[:16]
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Benchmarks du pipeline de détection (débit et latences p50/p99), résultats en JSON
+
+    python benchmarks/run.py                       # tout, résumé + JSON sur stdout
+    python benchmarks/run.py -o results.json       # JSON dans un fichier
+    python benchmarks/run.py --only detector. normalize --compare results.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from benchmarks.corpus import build_corpus, corpus_hash
+from cryptography.fernet import Fernet
+from utils.keyring import KeyRing
+from utils.normalize import normalize
+from utils.log_parser import parse
+from core.database import Database
+from core.alert_manager import AlertManager
+from core.pipeline import DetectionPipeline, DETECTORS
+from core.scheduler import DetectorScheduler, MODES
+from detectors.ip import detect_ip_reputation
+from ml.anomaly_detector import AnomalyDetector
+from ml.train import generate_normal_logs
+
+WARMUP = 50
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Percentile par rang le plus proche (valeurs déjà triées)"""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def summarize(latencies_ns: list, total_ns: int, lines: int) -> dict:
+    latencies_ns.sort()
+    return {
+        "calls": len(latencies_ns),
+        "lines": lines,
+        "total_sec": round(total_ns / 1e9, 4),
+        "lines_per_sec": round(lines / (total_ns / 1e9), 1) if total_ns else 0.0,
+        "mean_us": round(sum(latencies_ns) / len(latencies_ns) / 1e3, 2) if latencies_ns else 0.0,
+        "p50_us": round(percentile(latencies_ns, 50) / 1e3, 2),
+        "p99_us": round(percentile(latencies_ns, 99) / 1e3, 2),
+    }
+
+
+def measure(func, items, repeat: int = 1) -> dict:
+    """Appelle func(item) sur chaque élément et mesure chaque appel"""
+    for item in items[:WARMUP]:
+        func(item)
+    clock = time.perf_counter_ns
+    latencies = []
+    append = latencies.append
+    for _ in range(repeat):
+        for item in items:
+            t0 = clock()
+            func(item)
+            append(clock() - t0)
+    return summarize(latencies, sum(latencies), len(latencies))
+
+
+# ==================== BENCHMARKS ====================
+
+def bench_normalize(ctx):
+    return measure(normalize, ctx["lines"], ctx["repeat"])
+
+
+def bench_parse(ctx):
+    return measure(parse, ctx["lines"], ctx["repeat"])
+
+
+def bench_detectors(ctx):
+    """Chaque détecteur sur des lignes déjà analysées (comme dans le pipeline)"""
+    results = {}
+    for detect in ctx["detectors"]:
+        name = detect.__module__.split(".")[-1]
+        results[f"detector.{name}"] = measure(detect, ctx["records"], ctx["repeat"])
+    return results
+
+
+def bench_match(ctx):
+    """Ensemble des détecteurs selon chaque mode d'ordonnancement (match.fixed, match.adaptive, match.all)"""
+    results = {}
+    for mode in MODES:
+        scheduler = DetectorScheduler(ctx["detectors"], mode)
+        results[f"match.{mode}"] = measure(scheduler.match, ctx["records"], ctx["repeat"])
+    return results
+
+
+def bench_ml_predict(ctx):
+    detector = ctx["ml"]
+    results = {"ml.predict": measure(detector.predict, ctx["records"][:ctx["ml_lines"]])}
+    # Lot unique : latence rapportée par ligne
+    lines = ctx["records"][:ctx["ml_lines"]]
+    detector.predict_batch(lines[:WARMUP])
+    t0 = time.perf_counter_ns()
+    detector.predict_batch(lines)
+    total = time.perf_counter_ns() - t0
+    results["ml.predict_batch"] = summarize([total / len(lines)] * len(lines), total, len(lines))
+    return results
+
+
+def bench_fernet(ctx):
+    keyring = ctx["keyring"]
+    encoded = [line.encode("utf-8", errors="ignore") for line in ctx["lines"]]
+    return {
+        "fernet.encrypt": measure(keyring.encrypt, encoded, ctx["repeat"]),
+        "fernet.decrypt": measure(keyring.decrypt, ctx["encrypted"], ctx["repeat"]),
+    }
+
+
+def bench_insert_alert(ctx):
+    db = Database(os.path.join(ctx["tmpdir"], "bench_insert.db"))
+    alerts = ctx["alerts"][:ctx["db_lines"]]
+    return measure(lambda alert: db.insert_alert(**alert), alerts)
+
+
+def bench_end_to_end(ctx):
+    """
+    Même chemin que SIEMEngine.process_batch : déchiffrement -> analyse (ML + détecteurs)
+    par ligne, puis alertes du lot persistées en une transaction. La latence par ligne
+    inclut sa part de l'écriture du lot
+    """
+    db = Database(os.path.join(ctx["tmpdir"], "bench_e2e.db"))
+    pipeline = DetectionPipeline(AlertManager(db), ctx["ml"], ctx["detectors"])
+    keyring = ctx["keyring"]
+    records = ctx["encrypted"][:ctx["ml_lines"]]
+    batch_size = 500
+    clock = time.perf_counter_ns
+    latencies = []
+    for start in range(0, len(records), batch_size):
+        batch = records[start:start + batch_size]
+        batch_latencies = []
+        prepared = []
+        for raw in batch:
+            t0 = clock()
+            result = pipeline.analyze(keyring.decrypt(raw).decode("utf-8", errors="ignore"))
+            if result["prepared"]:
+                prepared.append(result["prepared"])
+            batch_latencies.append(clock() - t0)
+        t0 = clock()
+        db.insert_alerts(prepared)
+        share = (clock() - t0) / len(batch)
+        latencies.extend(l + share for l in batch_latencies)
+    return summarize(latencies, sum(latencies), len(latencies))
+
+
+BENCHMARKS = [
+    ("normalize", bench_normalize),
+    ("parse", bench_parse),
+    ("detector.", bench_detectors),
+    ("match.", bench_match),
+    ("ml.", bench_ml_predict),
+    ("fernet.", bench_fernet),
+    ("db.insert_alert", bench_insert_alert),
+    ("end_to_end", bench_end_to_end),
+]
+
+
+# ==================== CONTEXTE ====================
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def build_context(args, tmpdir: str) -> dict:
+    lines = build_corpus(args.seed, args.normal, args.attacks)
+    records = [parse(line) for line in lines]
+    keyring = KeyRing(Fernet.generate_key())
+
+    # Modèle entraîné en mémoire (random_state fixe) : indépendant du .pkl installé
+    ml = AnomalyDetector(os.path.join(tmpdir, "model.pkl"), os.path.join(tmpdir, "scaler.pkl"))
+    random.seed(args.seed)
+    ml.train(generate_normal_logs(args.train), contamination=0.01)
+
+    alert_manager = AlertManager(Database(os.path.join(tmpdir, "prepare.db")))
+    alerts = [alert_manager.prepare_alert("Benchmark", "pattern", record, geo_data={"country": "Unknown", "city": "Unknown"})
+              for record in records[:args.db_lines]]
+
+    return {
+        "lines": lines,
+        "records": records,
+        "encrypted": [keyring.encrypt(line.encode("utf-8", errors="ignore")) for line in lines],
+        "keyring": keyring,
+        "ml": ml,
+        "alerts": alerts,
+        # Réputation IP exclue : appel réseau AbuseIPDB, non reproductible
+        "detectors": [d for d in DETECTORS if d is not detect_ip_reputation],
+        "repeat": args.repeat,
+        "ml_lines": min(args.ml_lines, len(lines)),
+        "db_lines": args.db_lines,
+        "tmpdir": tmpdir,
+    }
+
+
+def selected(prefix: str, only: list) -> bool:
+    return not only or any(prefix.startswith(o) or o.startswith(prefix) for o in only)
+
+
+def run(args) -> dict:
+    tmpdir = tempfile.mkdtemp(prefix="siem_bench_")
+    try:
+        ctx = build_context(args, tmpdir)
+        results = {}
+        for prefix, bench in BENCHMARKS:
+            if not selected(prefix, args.only):
+                continue
+            out = bench(ctx)
+            if "calls" in out:
+                results[prefix] = out
+            else:
+                results.update({k: v for k, v in out.items() if selected(k, args.only)})
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "corpus_lines": len(ctx["lines"]),
+            "corpus_hash": corpus_hash(ctx["lines"]),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+
+def print_summary(report: dict, baseline: dict = None):
+    base = (baseline or {}).get("results", {})
+    print(f"{'Benchmark':<26}{'lignes/s':>12}{'p50 µs':>10}{'p99 µs':>10}" + (f"{'vs base':>10}" if base else ""), file=sys.stderr)
+    for name, r in report["results"].items():
+        row = f"{name:<26}{r['lines_per_sec']:>12.1f}{r['p50_us']:>10.2f}{r['p99_us']:>10.2f}"
+        if name in base and base[name]["lines_per_sec"]:
+            row += f"{r['lines_per_sec'] / base[name]['lines_per_sec']:>9.2f}x"
+        print(row, file=sys.stderr)
+    if baseline and baseline["meta"].get("corpus_hash") != report["meta"]["corpus_hash"]:
+        print("[Bench] Attention : corpus différent de celui de la référence", file=sys.stderr)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks du pipeline de détection SIEM")
+    parser.add_argument("--seed", type=int, default=42, help="Graine du corpus")
+    parser.add_argument("--normal", type=int, default=4000, help="Lignes de trafic normal")
+    parser.add_argument("--attacks", type=int, default=500, help="Lignes d'attaque (ml/train.py)")
+    parser.add_argument("--train", type=int, default=2000, help="Lignes d'entraînement du modèle")
+    parser.add_argument("--repeat", type=int, default=1, help="Passages sur le corpus (benchmarks rapides)")
+    parser.add_argument("--ml-lines", type=int, default=1000, help="Lignes pour le ML et le bout-en-bout")
+    parser.add_argument("--db-lines", type=int, default=500, help="Insertions unitaires en base")
+    parser.add_argument("--only", nargs="*", default=[], help="Préfixes des benchmarks à lancer")
+    parser.add_argument("-o", "--output", help="Fichier JSON de sortie (défaut: stdout)")
+    parser.add_argument("--compare", help="JSON d'un run précédent à comparer")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_summary(report, baseline)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
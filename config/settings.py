@@ -13,6 +13,82 @@ class Settings:
     )
     SLEEP_INTERVAL = float(os.environ.get("SLEEP_INTERVAL", 0.5))
     FERNET_KEY = os.getenv("FERNET_KEY") 
+    # Anciennes clés (séparées par des virgules) conservées pour relire les segments non rechiffrés
+    FERNET_OLD_KEYS = os.getenv("FERNET_OLD_KEYS", "")
     API_KEY = os.getenv("API_KEY")
     CHIFFRED_PATH = os.getenv("CHIFFRED_PATH", "chiffred.enc")
+    # Segments archivés (rotation) à rechiffrer en tâche de fond avec la clé courante
+    REENCRYPT_GLOB = os.getenv("REENCRYPT_GLOB", CHIFFRED_PATH + ".*")
+    REENCRYPT_INTERVAL = float(os.environ.get("REENCRYPT_INTERVAL", 300))
+    # Sources suivies : "nom,glob,encrypted|plain,unified|clf" séparées par ';'
+    LOG_SOURCES = os.getenv("LOG_SOURCES", f"chiffred,{CHIFFRED_PATH},encrypted,unified")
+    DISCOVERY_INTERVAL = float(os.environ.get("DISCOVERY_INTERVAL", 5))
+    # Réception réseau ("hôte:port", vide = désactivé)
+    SYSLOG_UDP = os.getenv("SYSLOG_UDP", "")
+    SYSLOG_TCP = os.getenv("SYSLOG_TCP", "")
+    LINES_TCP = os.getenv("LINES_TCP", "")
+    TLS_CERT = os.getenv("TLS_CERT", "")
+    TLS_KEY = os.getenv("TLS_KEY", "")
+    # Files bornées entre étapes (en lots) et politiques de délestage en cas de surcharge
+    ENRICH_QUEUE_SIZE = int(os.environ.get("ENRICH_QUEUE_SIZE", 16))
+    PERSIST_QUEUE_SIZE = int(os.environ.get("PERSIST_QUEUE_SIZE", 16))
+    OVERLOAD_POLICIES = os.getenv("OVERLOAD_POLICIES", "skip_ml,defer_geo,skip_reputation")
+    SAMPLE_BENIGN_RATE = int(os.environ.get("SAMPLE_BENIGN_RATE", 10))  # 1 ligne bénigne analysée sur N
+    OVERLOAD_LATENCY = float(os.environ.get("OVERLOAD_LATENCY", 2.0))   # Attente max d'un lot (s) avant délestage
+    # Ordonnancement des détecteurs : fixed (ordre de la liste), adaptive (coût / taux mesurés), all (tous les résultats)
+    DETECTOR_MODE = os.getenv("DETECTOR_MODE", "fixed")
+    # Cache LRU des verdicts (signatures sans état) des requêtes répétées, 0 = désactivé
+    VERDICT_CACHE_SIZE = int(os.environ.get("VERDICT_CACHE_SIZE", 50000))
+    # Instrumentation (histogrammes par étape) et point d'accès HTTP local /metrics, /stats
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0").lower() in ("1", "true", "yes")
+    METRICS_ADDR = os.getenv("METRICS_ADDR", "127.0.0.1:9464")
+    # Dashboard : alertes gardées en mémoire dans la table (les plus anciennes restent en base)
+    GUI_TABLE_ROWS = int(os.environ.get("GUI_TABLE_ROWS", 5000))
+    # Dashboard : période de rafraîchissement (ms) et lignes gardées dans le panneau de logs
+    GUI_TICK_MS = int(os.environ.get("GUI_TICK_MS", 100))
+    GUI_LOG_LINES = int(os.environ.get("GUI_LOG_LINES", 1000))
+    # Top pays / IP du dashboard : compteurs gardés (mémoire bornée) et fenêtre "récente" (s)
+    TOPK_CAPACITY = int(os.environ.get("TOPK_CAPACITY", 200))
+    TOPK_WINDOW_S = int(os.environ.get("TOPK_WINDOW_S", 900))
+    # Dashboard : jours d'historique (aujourd'hui compris) chargés au démarrage, 0 = depuis le lancement
+    GUI_HISTORY_DAYS = int(os.environ.get("GUI_HISTORY_DAYS", 1))
+    # Carte des menaces : taille des cellules d'agrégation (degrés) et intervalle d'envoi à la page (ms)
+    MAP_CELL_DEG = float(os.environ.get("MAP_CELL_DEG", 2.0))
+    MAP_REFRESH_MS = int(os.environ.get("MAP_REFRESH_MS", 1000))
+    # Corpus d'entraînement échantillonné du trafic sans signature (chiffré) : lignes gardées
+    # (0 = désactivé), strates endpoint/statut max, période d'enregistrement (s)
+    CORPUS_PATH = os.getenv("CORPUS_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "ml", "data", "corpus.enc"))
+    CORPUS_SIZE = int(os.environ.get("CORPUS_SIZE", 20000))
+    CORPUS_STRATA = int(os.environ.get("CORPUS_STRATA", 500))
+    CORPUS_INTERVAL = float(os.environ.get("CORPUS_INTERVAL", 300))
+    # Ré-entraînement du modèle ML : période (s, 0 = à la demande seulement), modèles candidats,
+    # lignes d'entraînement (corpus .enc ou texte, vide = données synthétiques de ml/train.py),
+    # durée max d'un entraînement (s)
+    RETRAIN_INTERVAL = float(os.environ.get("RETRAIN_INTERVAL", 0))
+    RETRAIN_DIR = os.getenv("RETRAIN_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "ml", "models"))
+    RETRAIN_DATA = os.getenv("RETRAIN_DATA", "")
+    RETRAIN_TIMEOUT = float(os.environ.get("RETRAIN_TIMEOUT", 1800))
+    # Validation du candidat sur le jeu mis de côté : taux de faux positifs max, taux de détection min
+    # (garde-fous, pas d'objectifs). Aucun modèle n'est livré : ces bornes viennent de candidats neufs
+    # (ml.retrain.train_candidate, 5000 lignes synthétiques, contamination 0.01, graines 0 à 5),
+    # mesurés entre 20 et 22 % de faux positifs et 63 et 72 % de détection. Marge de 3 points sur les
+    # faux positifs, de plus de 13 points sur la détection : un ré-entraînement normal n'est pas rejeté par hasard
+    RETRAIN_MAX_FP = float(os.environ.get("RETRAIN_MAX_FP", 0.25))
+    RETRAIN_MIN_TP = float(os.environ.get("RETRAIN_MIN_TP", 0.50))
+    # Probation en direct : lignes scorées avant adoption ; retour arrière si le taux d'alertes ML
+    # augmente de plus de RETRAIN_MAX_ALERT_DELTA ou si la distribution des scores change trop (PSI)
+    RETRAIN_PROBATION_LINES = int(os.environ.get("RETRAIN_PROBATION_LINES", 5000))
+    RETRAIN_MAX_ALERT_DELTA = float(os.environ.get("RETRAIN_MAX_ALERT_DELTA", 0.02))
+    RETRAIN_MAX_PSI = float(os.environ.get("RETRAIN_MAX_PSI", 0.25))
+    # Détecteur ML : iforest (forêt d'isolement), hst (Half-Space Trees, appris en continu) ou both.
+    # HST : état enregistré, nombre d'arbres, profondeur, lignes par fenêtre (profil de référence)
+    ML_MODEL = os.getenv("ML_MODEL", "iforest")
+    HST_PATH = os.getenv("HST_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "ml", "data", "hst.npz"))
+    HST_TREES = int(os.environ.get("HST_TREES", 50))
+    HST_DEPTH = int(os.environ.get("HST_DEPTH", 10))
+    HST_WINDOW = int(os.environ.get("HST_WINDOW", 2048))
+    # Portique des lignes manifestement normales (ml/gate.py) : ces lignes ne passent pas par la forêt.
+    # Une ligne admise sur ML_GATE_AUDIT est quand même scorée par la forêt (désaccords), 0 = aucune
+    ML_GATE = os.getenv("ML_GATE", "1").lower() in ("1", "true", "yes")
+    ML_GATE_AUDIT = int(os.environ.get("ML_GATE_AUDIT", 100))
 settings = Settings()
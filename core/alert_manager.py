@@ -1,17 +1,17 @@
 import os
 import datetime
-import re
 from config.settings import settings
 from core.database import Database
 from geo_finder import get_ip_info
 from utils.chiffrer import chiffrer_donnees
+from utils.log_parser import as_record
 
 class AlertManager:
     """Gestionnaire d'alertes avec base de données et géolocalisation"""
     
-    def __init__(self):
+    def __init__(self, db: Database = None):
         self.alert_log_path = settings.ALERTS_LOG_PATH
-        self.db = Database()
+        self.db = db or Database()
         # On utilise maintenant geo_finder (local mmdb)
         
         # Créer le fichier de log si nécessaire
@@ -41,66 +41,71 @@ class AlertManager:
         return severity_map.get(attack_type, 'medium')
     
     def extract_ip(self, line: str) -> str:
-        """Extrait l'IP source d'une ligne de log"""
-        # Format Node.js unifié: 2026-01-31T...  ::1  METHOD ...
-        parts = re.split(r'\s+', line.strip())
-        if len(parts) >= 2:
-            return parts[1]
-            
-        # Fallback Apache: IP - - [timestamp] ...
-        match = re.match(r'^(\d+\.\d+\.\d+\.\d+)', line)
-        if match:
-            return match.group(1)
-        
-        return 'unknown'
+        """Extrait l'IP source d'une ligne de log (format unifié Node.js ou Apache CLF)"""
+        return as_record(line).ip or 'unknown'
     
-    def log_alert(self, attack_type: str, pattern: str, line: str, 
-                  ml_score: float = None, confidence: float = 1.0):
+    def prepare_alert(self, attack_type: str, pattern: str, line: str,
+                      ml_score: float = None, confidence: float = 1.0,
+                      geo_data: dict = None, model_version: str = None) -> dict:
         """
-        Enregistre une alerte dans la DB et le fichier de log
+        Prépare une alerte (IP, géolocalisation, sévérité) sans la persister.
+        `line` peut être un LogRecord déjà analysé, `model_version` la version du modèle
+        qui a calculé ml_score.
+        Le dict retourné est accepté tel quel par Database.insert_alerts
         """
         # Convert list of patterns to string if necessary
         if isinstance(pattern, list):
             pattern = ", ".join(str(p) for p in pattern)
-            
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
         # Extraction IP
         source_ip = self.extract_ip(line)
         
-        # Géolocalisation
-        geo_data = None
-        if source_ip != 'unknown':
+        # Géolocalisation (sauf si déjà faite par l'appelant)
+        if geo_data is None and source_ip != 'unknown':
             geo_data = get_ip_info(source_ip)
         
-        # Calcul de sévérité
-        severity = self.calculate_severity(attack_type, pattern)
-        
-        # Insertion en base de données
-        alert_id = self.db.insert_alert(
-            attack_type=attack_type,
-            pattern=pattern,
-            source_ip=source_ip,
-            log_line=line.strip(),
-            severity=severity,
-            ml_score=ml_score,
-            confidence=confidence,
-            geo_data=geo_data
-        )
-        
-        # Log fichier (pour compatibilité)
-        entry = f"[{timestamp}] [{severity.upper()}] {attack_type} | IP: {source_ip}"
-        if geo_data:
-            entry += f" ({geo_data['country']})"
-        entry += f" | Pattern: {pattern} | Line: {line.strip()}\n"
+        return {
+            "attack_type": attack_type,
+            "pattern": pattern,
+            "source_ip": source_ip,
+            "log_line": line.strip(),
+            "severity": self.calculate_severity(attack_type, pattern),
+            "ml_score": ml_score,
+            "model_version": model_version,
+            "confidence": confidence,
+            "geo_data": geo_data,
+        }
+    
+    def log_alerts(self, alerts: list, checkpoint: dict = None) -> list:
+        """
+        Enregistre un lot d'alertes préparées et le point de reprise de la source
+        dans la même transaction SQLite, puis dans le fichier de log
+        """
+        alert_ids = self.db.insert_alerts(alerts, checkpoint)
+        if alerts:
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            with open(self.alert_log_path, "a", encoding="utf-8") as f:
+                for alert in alerts:
+                    f.write(self._format_entry(timestamp, alert))
+        return alert_ids
+    
+    def _format_entry(self, timestamp: str, alert: dict) -> str:
+        entry = f"[{timestamp}] [{alert['severity'].upper()}] {alert['attack_type']} | IP: {alert['source_ip']}"
+        if alert['geo_data']:
+            entry += f" ({alert['geo_data']['country']})"
+        entry += f" | Pattern: {alert['pattern']} | Line: {alert['log_line']}\n"
+        return entry
+    
+    def log_alert(self, attack_type: str, pattern: str, line: str, 
+                  ml_score: float = None, confidence: float = 1.0):
+        """
+        Enregistre une alerte dans la DB et le fichier de log
+        """
+        alert = self.prepare_alert(attack_type, pattern, line, ml_score, confidence)
         
-        with open(self.alert_log_path, "a", encoding="utf-8") as f:
-            f.write(entry)
-            
         # Note: On ne rechiffre pas l'alerte ici pour éviter une boucle infinie 
         # car le watcher lit déjà depuis chiffred.enc
-            
-        return alert_id
+        return self.log_alerts([alert])[0]
     
     def print_alert(self, attack_type: str, pattern: str, line: str):
         """Affiche une alerte (pour debug)"""
@@ -4,6 +4,17 @@ from datetime import datetime
 from typing import List, Dict, Optional, Tuple
 from config.settings import settings
 
+def _geo_columns(geo_data: Optional[Dict]) -> Tuple:
+    """(country, city, latitude, longitude) depuis le dict de geo_finder (coords = [lat, lon])"""
+    if not geo_data:
+        return None, None, None, None
+    latitude, longitude = geo_data.get('latitude'), geo_data.get('longitude')
+    coords = geo_data.get('coords')
+    if latitude is None and coords and any(coords):
+        latitude, longitude = coords[0], coords[1]
+    return geo_data.get('country'), geo_data.get('city'), latitude, longitude
+
+
 class Database:
     """Gestionnaire de base de données SQLite pour le SIEM"""
     
@@ -39,9 +50,14 @@ class Database:
                 longitude REAL,
                 log_line TEXT,
                 ml_score REAL,
-                confidence REAL DEFAULT 1.0
+                confidence REAL DEFAULT 1.0,
+                model_version TEXT
             )
         ''')
+        # Bases créées avant le versionnage des modèles
+        columns = {row["name"] for row in cursor.execute("PRAGMA table_info(alerts)")}
+        if "model_version" not in columns:
+            cursor.execute("ALTER TABLE alerts ADD COLUMN model_version TEXT")
         
         # Table des logs honeypot
         cursor.execute('''
@@ -70,6 +86,17 @@ class Database:
             )
         ''')
         
+        # Table des points de reprise d'ingestion (un par source)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+                source TEXT PRIMARY KEY,
+                inode INTEGER,
+                offset INTEGER NOT NULL DEFAULT 0,
+                line_hash TEXT,
+                updated_at TEXT NOT NULL
+            )
+        ''')
+        
         # Index pour performances
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_timestamp ON alerts(timestamp)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_type ON alerts(attack_type)')
@@ -80,42 +107,84 @@ class Database:
     
     # ==================== ALERTS ====================
     
-    def insert_alert(self, attack_type: str, pattern: str, source_ip: str, 
-                    log_line: str, severity: str = 'medium', 
-                    ml_score: float = None, confidence: float = 1.0,
-                    geo_data: Dict = None) -> int:
-        """Insère une nouvelle alerte"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        country = geo_data.get('country') if geo_data else None
-        city = geo_data.get('city') if geo_data else None
-        latitude = geo_data.get('latitude') if geo_data else None
-        longitude = geo_data.get('longitude') if geo_data else None
+    def _insert_alert_row(self, cursor, attack_type: str, pattern: str, source_ip: str,
+                          log_line: str, severity: str = 'medium',
+                          ml_score: float = None, confidence: float = 1.0,
+                          geo_data: Dict = None, timestamp: str = None,
+                          model_version: str = None) -> int:
+        """Insère une alerte et met à jour les statistiques (sans commit)"""
+        now = datetime.now()
+        if timestamp is None:
+            timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
+        
+        country, city, latitude, longitude = _geo_columns(geo_data)
         
         cursor.execute('''
             INSERT INTO alerts (timestamp, attack_type, severity, pattern, source_ip, 
-                              country, city, latitude, longitude, log_line, ml_score, confidence)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                              country, city, latitude, longitude, log_line, ml_score, confidence,
+                              model_version)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (timestamp, attack_type, severity, pattern, source_ip, 
-              country, city, latitude, longitude, log_line, ml_score, confidence))
+              country, city, latitude, longitude, log_line, ml_score, confidence, model_version))
         
         alert_id = cursor.lastrowid
         
-        # Mettre à jour les statistiques
-        date = datetime.now().strftime("%Y-%m-%d")
+        # Mettre à jour les statistiques (jour de l'alerte, pas forcément aujourd'hui en rejeu)
+        date = timestamp[:10]
         cursor.execute('''
             INSERT INTO statistics (date, attack_type, count)
             VALUES (?, ?, 1)
             ON CONFLICT(date, attack_type) DO UPDATE SET count = count + 1
         ''', (date, attack_type))
         
+        return alert_id
+    
+    def insert_alert(self, attack_type: str, pattern: str, source_ip: str, 
+                    log_line: str, severity: str = 'medium', 
+                    ml_score: float = None, confidence: float = 1.0,
+                    geo_data: Dict = None, model_version: str = None) -> int:
+        """Insère une nouvelle alerte"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        alert_id = self._insert_alert_row(cursor, attack_type, pattern, source_ip, log_line,
+                                          severity, ml_score, confidence, geo_data,
+                                          model_version=model_version)
+        
         conn.commit()
         conn.close()
         return alert_id
     
+    def insert_alerts(self, alerts: List[Dict], checkpoint: Dict = None) -> List[int]:
+        """
+        Insère un lot d'alertes et, le cas échéant, le point de reprise de la source
+        dans une seule transaction : soit tout est persisté, soit rien.
+        Chaque alerte est un dict avec les mêmes clés que les paramètres de insert_alert.
+        """
+        conn = self.get_connection()
+        try:
+            with conn:
+                cursor = conn.cursor()
+                ids = [self._insert_alert_row(cursor, **alert) for alert in alerts]
+                # Un point de reprise, ou plusieurs (lots de sources différentes regroupés)
+                if checkpoint is not None:
+                    for cp in (checkpoint if isinstance(checkpoint, list) else [checkpoint]):
+                        self._save_checkpoint(cursor, **cp)
+        finally:
+            conn.close()
+        return ids
+    
+    def update_alerts_geo(self, rows: List[Tuple[int, Dict]]):
+        """Complète la géolocalisation d'alertes déjà insérées (enrichissement différé) : [(id, geo_data)]"""
+        conn = self.get_connection()
+        try:
+            with conn:
+                conn.executemany('''
+                    UPDATE alerts SET country = ?, city = ?, latitude = ?, longitude = ? WHERE id = ?
+                ''', [(*_geo_columns(geo), alert_id) for alert_id, geo in rows])
+        finally:
+            conn.close()
+    
     def get_recent_alerts(self, limit: int = 100, attack_type: str = None) -> List[Dict]:
         """Récupère les alertes récentes"""
         conn = self.get_connection()
@@ -138,6 +207,20 @@ class Database:
         
         return [dict(row) for row in rows]
     
+    def get_alerts_before(self, before_id: int = None, limit: int = 200) -> List[Dict]:
+        """Page d'alertes plus anciennes que `before_id` (toutes si None), de la plus récente à la plus ancienne"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, timestamp, attack_type, pattern, source_ip, country, city, ml_score
+            FROM alerts
+            WHERE (? IS NULL OR id < ?)
+            ORDER BY id DESC LIMIT ?
+        ''', (before_id, before_id, limit))
+        rows = cursor.fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+
     def get_alerts_count(self) -> int:
         """Compte total des alertes"""
         conn = self.get_connection()
@@ -147,6 +230,29 @@ class Database:
         conn.close()
         return count
     
+    def get_max_alert_id(self) -> int:
+        """Id de la dernière alerte enregistrée (0 si aucune)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM alerts')
+        max_id = cursor.fetchone()[0]
+        conn.close()
+        return max_id
+
+    def count_alerts_by_type(self, since: str = None, until: str = None, after_id: int = None) -> Dict[str, int]:
+        """Nombre d'alertes par type, éventuellement sur une plage [since, until) de timestamps et d'id > after_id"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT attack_type, COUNT(*) as total
+            FROM alerts
+            WHERE (? IS NULL OR timestamp >= ?) AND (? IS NULL OR timestamp < ?) AND id > ?
+            GROUP BY attack_type
+        ''', (since, since, until, until, after_id or 0))
+        rows = cursor.fetchall()
+        conn.close()
+        return {row['attack_type']: row['total'] for row in rows}
+    
     def get_stats_by_type(self, days: int = 7) -> Dict[str, int]:
         """Statistiques par type d'attaque sur N jours"""
         conn = self.get_connection()
@@ -163,6 +269,41 @@ class Database:
         conn.close()
         
         return {row['attack_type']: row['total'] for row in rows}
+
+    def get_daily_stats(self, since_date: str) -> Dict[str, int]:
+        """Total par type depuis la date `since_date` (AAAA-MM-JJ incluse), lu dans la table agrégée"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT attack_type, SUM(count) as total
+            FROM statistics
+            WHERE date >= ?
+            GROUP BY attack_type
+        ''', (since_date,))
+        rows = cursor.fetchall()
+        conn.close()
+        return {row['attack_type']: row['total'] for row in rows}
+    
+    # ==================== CHECKPOINTS ====================
+    
+    def _save_checkpoint(self, cursor, source: str, offset: int,
+                         inode: int = None, line_hash: str = None):
+        cursor.execute('''
+            INSERT INTO ingest_checkpoints (source, inode, offset, line_hash, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(source) DO UPDATE SET
+                inode = excluded.inode, offset = excluded.offset,
+                line_hash = excluded.line_hash, updated_at = excluded.updated_at
+        ''', (source, inode, offset, line_hash, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    
+    def get_checkpoint(self, source: str) -> Optional[Dict]:
+        """Point de reprise (inode, offset, line_hash) d'une source, ou None"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM ingest_checkpoints WHERE source = ?', (source,))
+        row = cursor.fetchone()
+        conn.close()
+        return dict(row) if row else None
     
     # ==================== HONEYPOT ====================
     
@@ -213,25 +354,60 @@ class Database:
     
     # ==================== ANALYTICS ====================
     
-    def get_top_attackers(self, limit: int = 10) -> List[Tuple[str, int]]:
-        """Top IPs attaquantes"""
+    def get_top_attackers(self, limit: int = 10, since: str = None, max_id: int = None) -> List[Tuple[str, int]]:
+        """Top IPs attaquantes (alertes depuis `since` et d'id ≤ max_id si précisés)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
             SELECT source_ip, COUNT(*) as count
             FROM alerts
-            WHERE source_ip IS NOT NULL
+            WHERE source_ip IS NOT NULL AND (? IS NULL OR timestamp >= ?) AND (? IS NULL OR id <= ?)
             GROUP BY source_ip
             ORDER BY count DESC
             LIMIT ?
-        ''', (limit,))
+        ''', (since, since, max_id, max_id, limit))
         
         rows = cursor.fetchall()
         conn.close()
         
         return [(row['source_ip'], row['count']) for row in rows]
+
+    def get_top_countries(self, limit: int = 10, since: str = None, max_id: int = None) -> List[Tuple[str, int]]:
+        """Top pays attaquants (mêmes filtres que get_top_attackers)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT COALESCE(country, 'Unknown') as country, COUNT(*) as count
+            FROM alerts
+            WHERE (? IS NULL OR timestamp >= ?) AND (? IS NULL OR id <= ?)
+            GROUP BY 1
+            ORDER BY count DESC
+            LIMIT ?
+        ''', (since, since, max_id, max_id, limit))
+        rows = cursor.fetchall()
+        conn.close()
+        return [(row['country'], row['count']) for row in rows]
     
+    def get_minute_counts(self, column: str, since: str, max_id: int = None) -> List[Tuple[str, str, int]]:
+        """
+        Alertes par minute et par IP source (column="ip") ou pays ("country") depuis `since`
+        (id ≤ max_id si précisé) : [(minute "AAAA-MM-JJ HH:MM", valeur, nombre), ...] par minute croissante
+        """
+        expr = {"ip": "source_ip", "country": "COALESCE(country, 'Unknown')"}[column]
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT substr(timestamp, 1, 16) as minute, {expr} as value, COUNT(*) as count
+            FROM alerts
+            WHERE {expr} IS NOT NULL AND timestamp >= ? AND (? IS NULL OR id <= ?)
+            GROUP BY 1, 2
+            ORDER BY 1
+        ''', (since, max_id, max_id))
+        rows = cursor.fetchall()
+        conn.close()
+        return [(row['minute'], row['value'], row['count']) for row in rows]
+
     def get_attack_timeline(self, hours: int = 24) -> List[Dict]:
         """Timeline des attaques"""
         conn = self.get_connection()
@@ -253,8 +429,8 @@ class Database:
         
         return [dict(row) for row in rows]
     
-    def get_geo_data(self) -> List[Dict]:
-        """Données géographiques pour la carte"""
+    def get_geo_data(self, since: str = None, max_id: int = None) -> List[Dict]:
+        """Données géographiques pour la carte (alertes depuis `since` et d'id ≤ max_id si précisés)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
@@ -262,8 +438,9 @@ class Database:
             SELECT country, city, latitude, longitude, COUNT(*) as count
             FROM alerts
             WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+              AND (? IS NULL OR timestamp >= ?) AND (? IS NULL OR id <= ?)
             GROUP BY country, city, latitude, longitude
-        ''')
+        ''', (since, since, max_id, max_id))
         
         rows = cursor.fetchall()
         conn.close()
@@ -0,0 +1,410 @@
+import re
+import time
+import queue
+import threading
+from collections import Counter, deque
+from typing import Callable, List, Optional
+
+from core.alert_manager import AlertManager
+from core.pipeline import DetectionPipeline
+from core.sources import SourceRegistry
+from core.network import NetworkListener
+from core.metrics import metrics, MetricsServer, parse_metrics_address
+from config.settings import settings
+from ml.corpus import CorpusSampler
+from ml.retrain import RetrainService
+
+POLICIES = ("skip_ml", "sample_benign", "defer_geo", "skip_reputation")
+
+# Surcharge d'une étape : file d'entrée remplie à 75 % ou lot en attente depuis plus de
+# OVERLOAD_LATENCY ; fin de surcharge sous 25 % et sous le quart de ce délai (hystérésis)
+HIGH_WATERMARK = 0.75
+LOW_WATERMARK = 0.25
+# Lots regroupés dans une même transaction SQLite par l'étape de persistance
+MAX_GROUP = 8
+# Alertes en attente de géolocalisation différée
+GEO_BACKLOG = 10000
+
+# Caractères suspects : une ligne qui en contient n'est jamais considérée comme bénigne
+SUSPICIOUS_RE = re.compile(r"""[<>'%;|`$\\()]|\.\.""")
+UNKNOWN_GEO = {"country": "Unknown", "city": "Unknown", "coords": [0, 0], "iso": "?", "isp": "N/A"}
+
+
+def parse_policies(value) -> set:
+    policies = {p.strip() for p in (value.split(",") if isinstance(value, str) else value) if p.strip()}
+    unknown = policies - set(POLICIES)
+    if unknown:
+        raise ValueError(f"Politique de délestage inconnue: {', '.join(sorted(unknown))}")
+    return policies
+
+
+def looks_benign(record) -> bool:
+    """Requête de lecture ordinaire : GET/HEAD réussi, hors login, sans caractère suspect"""
+    if record.method not in ("GET", "HEAD") or record.status is None or record.status >= 400:
+        return False
+    target = record.target or ""
+    if "login" in target.lower():
+        return False
+    return not SUSPICIOUS_RE.search(target) and not SUSPICIOUS_RE.search(record.body or "")
+
+
+class _Pressure:
+    """Détection de surcharge d'une étape (remplissage de sa file, âge du lot) avec hystérésis"""
+
+    def __init__(self, q: "queue.Queue", max_age: float):
+        self.queue = q
+        self.max_age = max_age
+        self.active = False
+
+    def check(self, batch) -> bool:
+        capacity = self.queue.maxsize
+        fill = self.queue.qsize() / capacity if capacity > 0 else 0.0
+        # Attente du lot devant l'étape (pour la détection : depuis la lecture,
+        # ce qui inclut le temps passé par un lecteur bloqué sur la file pleine)
+        age = time.time() - batch.queued_at
+        if self.active:
+            self.active = fill > LOW_WATERMARK or age > self.max_age / 4
+        else:
+            self.active = fill >= HIGH_WATERMARK or age >= self.max_age
+        return self.active
+
+
+class _Item:
+    """Ligne entre détection et enrichissement"""
+    __slots__ = ("record", "hits", "verdict", "ml", "ml_version")
+
+    def __init__(self, record, hits, verdict):
+        self.record = record
+        self.hits = hits
+        self.verdict = verdict
+        self.ml = (False, 0.0)
+        self.ml_version = None
+
+
+class SIEMEngine:
+    """
+    Moteur d'ingestion sans interface, en étapes reliées par des files bornées :
+      sources (lecture) -> détection (parse, signatures, ML par lot)
+      -> enrichissement (réputation IP, géolocalisation) -> persistance (alertes + point de reprise)
+    Une étape lente bloque la précédente (contre-pression) ; quand sa file d'entrée
+    dépasse HIGH_WATERMARK, l'étape applique les politiques de délestage configurées
+    et compte chaque événement délesté.
+    Le modèle ML peut être ré-entraîné et remplacé à chaud (self.retrain, voir ml/retrain.py),
+    ou être remplacé / complété par un modèle appris en continu (ML_MODEL, voir ml/streaming.py).
+    Le dashboard s'y abonne via les callbacks on_log / on_alert.
+    """
+
+    def __init__(self, alert_manager: AlertManager = None, ml_detector=None,
+                 registry: SourceRegistry = None, listener: NetworkListener = None,
+                 on_log: Callable[[str], None] = None,
+                 on_alert: Callable[[dict], None] = None,
+                 policies=None, sample_rate: int = None):
+        self.alert_manager = alert_manager or AlertManager()
+        if ml_detector is None:
+            from ml.streaming import create_detector
+            ml_detector = create_detector(background=True)  # Chargé pendant le démarrage de l'ingestion
+        self.ml_detector = ml_detector
+        self.pipeline = DetectionPipeline(self.alert_manager, self.ml_detector)
+        self.on_log = on_log or (lambda text: None)
+        # Ré-entraînement de la forêt d'isolement ; aucun avec ML_MODEL=hst (le modèle en ligne s'adapte seul)
+        self.forest = getattr(self.ml_detector, "forest", self.ml_detector)
+        self.retrain = RetrainService(self.forest, notify=self.on_log) if self.forest is not None else None
+        if self.retrain:
+            self.pipeline.monitor = self.retrain.monitor
+        # Lignes sans signature échantillonnées pour le ré-entraînement (corpus réel)
+        self.corpus = CorpusSampler(notify=self.on_log) if settings.CORPUS_SIZE > 0 else None
+        self.on_alert = on_alert or (lambda alert: None)
+        self.registry = registry or SourceRegistry(self.alert_manager.db, notify=self.on_log)
+        # Réception réseau (optionnelle) : mêmes lots, même file que les fichiers
+        self.listener = listener or NetworkListener.from_settings(self.registry.queue, notify=self.on_log)
+
+        self.enrich_queue: "queue.Queue" = queue.Queue(maxsize=settings.ENRICH_QUEUE_SIZE)
+        self.persist_queue: "queue.Queue" = queue.Queue(maxsize=settings.PERSIST_QUEUE_SIZE)
+        self.detect_pressure = _Pressure(self.registry.queue, settings.OVERLOAD_LATENCY)
+        self.enrich_pressure = _Pressure(self.enrich_queue, settings.OVERLOAD_LATENCY)
+        self.policies = parse_policies(settings.OVERLOAD_POLICIES if policies is None else policies)
+        self.sample_rate = max(1, sample_rate or settings.SAMPLE_BENIGN_RATE)
+        self.shed: Counter = Counter()
+        self._sample_seq = 0
+        self.geo_backlog: deque = deque()
+
+        self.running = False
+        self.threads: List[threading.Thread] = []
+        self.metrics_server: Optional[MetricsServer] = None
+
+    def start(self):
+        if self.running: return
+        self.running = True
+        self.registry.start()
+        if self.listener:
+            self.listener.start()
+        if metrics.enabled:
+            self._start_metrics()
+        if self.retrain:
+            self.retrain.start()
+        if self.corpus:
+            self.corpus.start()
+        self.threads = [
+            threading.Thread(target=self._run_stage, args=("detect", self.registry.queue, self.detect_batch),
+                             name="detection", daemon=True),
+            threading.Thread(target=self._run_stage, args=("enrich", self.enrich_queue, self.enrich_batch),
+                             name="enrichment", daemon=True),
+            threading.Thread(target=self._run_stage, args=("persist", self.persist_queue, self.persist_batch),
+                             name="persistence", daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        if not self.running: return
+        self.running = False
+        self.registry.stop()
+        if self.listener:
+            self.listener.stop()
+        if self.retrain:
+            self.retrain.stop()
+        for thread in self.threads:
+            thread.join(timeout=2)
+        if hasattr(self.ml_detector, "close"):
+            self.ml_detector.close()  # État du modèle en ligne
+        if self.corpus:
+            self.corpus.stop()
+        if self.metrics_server:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        metrics.remove_collector(self.collect_gauges)
+
+    def _start_metrics(self):
+        metrics.add_collector(self.collect_gauges)
+        try:
+            self.metrics_server = MetricsServer(metrics, parse_metrics_address(settings.METRICS_ADDR))
+            self.metrics_server.start()
+            host, port = self.metrics_server.address
+            self.on_log(f"[SYSTEM] Métriques sur http://{host}:{port}/metrics")
+        except OSError as e:
+            print(f"[Metrics] Erreur démarrage serveur: {e}")
+
+    # ==================== ÉTAPES ====================
+
+    def _run_stage(self, name: str, inbox: "queue.Queue", handler: Callable):
+        while self.running:
+            try:
+                batch = inbox.get(timeout=0.5)
+            except queue.Empty:
+                if name == "enrich":
+                    self._drain_geo_backlog()
+                continue
+            try:
+                handler(batch)
+            except Exception as e:
+                print(f"[Engine] Erreur {name} lot {batch.source.name}: {e}")
+                batch.source.metrics.errors += 1
+                metrics.inc("errors", stage=name)
+                if batch.checkpoint is not None:
+                    batch.source.batch_done(batch, persisted=False)
+
+    def _forward(self, outbox: "queue.Queue", batch):
+        """File bornée : si l'étape suivante prend du retard, on attend (contre-pression)"""
+        batch.queued_at = time.time()
+        while self.running:
+            try:
+                outbox.put(batch, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _shed(self, policy: str, count: int = 1):
+        if count:
+            self.shed[policy] += count
+            if metrics.enabled:
+                metrics.inc("shed", count, policy=policy)
+
+    def detect_batch(self, batch, forward: bool = True):
+        """Parse + signatures pour chaque ligne, puis score ML du lot en un seul appel"""
+        overloaded = self.detect_pressure.check(batch)
+        sample = overloaded and "sample_benign" in self.policies
+        skip_ml = overloaded and "skip_ml" in self.policies
+        name = batch.source.name
+        # Modèle lu une fois pour tout le lot : un remplacement à chaud s'applique au lot suivant
+        state = self.ml_detector.current
+        items = []
+        for log_line in batch.lines:
+            if log_line is None:
+                batch.source.metrics.errors += 1
+                metrics.inc("errors", stage="decrypt")
+                self.on_log(f"[CRYPTO] Echec déchiffrement ({name})")
+                continue
+            if not log_line.strip():
+                continue
+            try:
+                record = self.pipeline.parse(log_line, batch.source.fmt)
+                if sample and looks_benign(record):
+                    self._sample_seq += 1
+                    if self._sample_seq % self.sample_rate:
+                        self._shed("sample_benign")
+                        continue
+                verdict = self.pipeline.lookup(record)
+                items.append(_Item(record, self.pipeline.match_signatures(record, verdict), verdict))
+            except Exception as e:
+                print(f"[Engine] Erreur analyse: {e}")
+                metrics.inc("errors", stage="analyze")
+
+        if self.corpus:
+            self.corpus.add_batch([item.record for item in items if not item.hits])
+        # Surcharge : le ML est réservé aux lignes déjà signalées par une signature
+        scored = [item for item in items if item.hits] if skip_ml else items
+        self._shed("skip_ml", len(items) - len(scored))
+        version = state.version if state.model is not None else None
+        for item, ml in zip(scored, self.pipeline.score_batch([item.record for item in scored], state)):
+            item.ml = ml
+            item.ml_version = version
+        batch.items = items
+        if forward:
+            self._forward(self.enrich_queue, batch)
+
+    def enrich_batch(self, batch, forward: bool = True):
+        """Réputation IP et géolocalisation des alertes, puis préparation pour la base"""
+        overloaded = self.enrich_pressure.check(batch)
+        defer_geo = overloaded and "defer_geo" in self.policies
+        skip_reputation = overloaded and "skip_reputation" in self.policies
+        results = []
+        for item in batch.items:
+            ml_is_anomaly, ml_score = item.ml
+            hits = item.hits
+            if not hits and self.pipeline.needs_reputation(ml_is_anomaly, ml_score):
+                if skip_reputation:
+                    self._shed("skip_reputation")
+                else:
+                    reputation = self.pipeline.check_reputation(item.record, ml_is_anomaly, ml_score)
+                    hits = [reputation] if reputation else []
+            result = self.pipeline.build_result(item.record, hits, ml_is_anomaly, ml_score,
+                                                dict(UNKNOWN_GEO) if defer_geo else None, item.ml_version)
+            # Afficher le log déchiffré + Score ML
+            self.on_log(result["line"] + f" [ML:{ml_score:.2f}]")
+            if result["alert"]:
+                result["deferred_geo"] = defer_geo
+                results.append(result)
+        batch.items = None
+        batch.results = results
+        if not overloaded:
+            self._drain_geo_backlog(50)
+        if forward:
+            self._forward(self.persist_queue, batch)
+
+    def persist_batch(self, batch):
+        """
+        Alertes + points de reprise des lots disponibles dans une seule transaction :
+        après un redémarrage, rien n'est ni perdu ni inséré deux fois
+        """
+        group = [batch]
+        while len(group) < MAX_GROUP:
+            try:
+                group.append(self.persist_queue.get_nowait())
+            except queue.Empty:
+                break
+        results = [r for b in group for r in b.results]
+        checkpoints = [b.checkpoint for b in group if b.checkpoint is not None]
+
+        t0 = time.perf_counter()
+        try:
+            ids = self.alert_manager.log_alerts([r["prepared"] for r in results], checkpoints or None)
+        except Exception:
+            for b in group[1:]:
+                if b.checkpoint is not None:
+                    b.source.batch_done(b, persisted=False)
+            raise
+        if metrics.enabled:
+            metrics.observe("db_write", time.perf_counter() - t0)
+
+        for alert_id, r in zip(ids, results):
+            r["alert"]["id"] = alert_id
+            if r["deferred_geo"]:
+                if len(self.geo_backlog) >= GEO_BACKLOG:
+                    self.geo_backlog.popleft()
+                    self._shed("geo_dropped")
+                self.geo_backlog.append((alert_id, r["alert"]["ip"]))
+        for b in group:
+            b.source.metrics.alerts += len(b.results)
+            if metrics.enabled:
+                metrics.inc("lines_in", len(b.lines), source=b.source.name)
+            if b.checkpoint is not None:
+                b.source.batch_done(b)
+        for r in results:
+            if metrics.enabled:
+                metrics.inc("alerts_out", type=r["alert"]["type"])
+            self.on_alert(r["alert"])
+
+    def process_batch(self, batch):
+        """Les trois étapes à la suite, dans le thread appelant (sans file ni délestage)"""
+        self.detect_batch(batch, forward=False)
+        self.enrich_batch(batch, forward=False)
+        self.persist_batch(batch)
+
+    def _drain_geo_backlog(self, limit: int = 500):
+        """Géolocalisation différée : complète en base les alertes insérées sans géo"""
+        rows = []
+        while self.geo_backlog and len(rows) < limit:
+            alert_id, ip_addr = self.geo_backlog.popleft()
+            rows.append((alert_id, self.pipeline.geolocate(ip_addr)))
+        if rows:
+            try:
+                self.alert_manager.db.update_alerts_geo(rows)
+            except Exception as e:
+                print(f"[Engine] Erreur géolocalisation différée: {e}")
+
+    def set_detector_mode(self, mode: str):
+        """Change à chaud l'ordonnancement des détecteurs : fixed, adaptive ou all"""
+        self.pipeline.scheduler.set_mode(mode)
+        self.on_log(f"[SYSTEM] Mode de détection: {mode}")
+
+    # ==================== ÉTAT ====================
+
+    def collect_gauges(self) -> dict:
+        """Jauges lues à chaque scrape : retard d'ingestion par source, files et délestage"""
+        lag_bytes, lag_sec = [], []
+        for source in list(self.registry.sources.values()):
+            behind, seconds = source.lag()
+            lag_bytes.append(({"source": source.name}, behind))
+            lag_sec.append(({"source": source.name}, round(seconds, 3)))
+        gauges = {
+            "ingest_lag_bytes": lag_bytes,
+            "ingest_lag_seconds": lag_sec,
+            "queue_depth": [({"stage": stage}, q.qsize()) for stage, q in self._queues()],
+            "overloaded": [({"stage": "detect"}, int(self.detect_pressure.active)),
+                           ({"stage": "enrich"}, int(self.enrich_pressure.active))],
+            "geo_backlog": [({}, len(self.geo_backlog))],
+            "verdict_cache_size": [({}, len(self.pipeline.cache.entries))],
+            "detector_rank": [({"detector": name}, rank)
+                              for rank, name in enumerate(self.pipeline.scheduler.stats()["order"])],
+        }
+        if self.listener:
+            gauges["network_dropped"] = [({"source": name}, s["dropped"])
+                                         for name, s in self.listener.stats().items()]
+        return gauges
+
+    def _queues(self):
+        return (("detect", self.registry.queue), ("enrich", self.enrich_queue), ("persist", self.persist_queue))
+
+    def stats(self) -> dict:
+        stats = {
+            "sources": self.registry.stats(),
+            "queues": {stage: q.qsize() for stage, q in self._queues()},
+            "overloaded": {"detect": self.detect_pressure.active, "enrich": self.enrich_pressure.active},
+            "policies": sorted(self.policies),
+            "shed": dict(self.shed),
+            "geo_backlog": len(self.geo_backlog),
+            "detectors": self.pipeline.scheduler.stats(),
+            "verdict_cache": self.pipeline.cache.stats(),
+            "model": self.retrain.stats() if self.retrain else {"version": self.ml_detector.current.version},
+        }
+        if hasattr(self.ml_detector, "stats"):
+            stats["online_model"] = self.ml_detector.stats()
+        if self.forest is not None:
+            stats["ml_gate"] = self.forest.gate_stats()
+        if self.corpus:
+            stats["corpus"] = self.corpus.stats()
+        if self.listener:
+            stats["network"] = self.listener.stats()
+        if metrics.enabled:
+            stats["metrics"] = metrics.snapshot()
+        return stats
@@ -0,0 +1,224 @@
+import json
+import math
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config.settings import settings
+
+# Histogrammes "HDR" log-linéaires : 16 sous-intervalles par puissance de 2,
+# soit une erreur relative < 6,25 % quelle que soit l'échelle (ns -> heures)
+SUB_BITS = 4
+SUB_COUNT = 1 << SUB_BITS
+BUCKETS = 64 * SUB_COUNT
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+def bucket_index(value: int) -> int:
+    if value < 2 * SUB_COUNT:
+        return value
+    shift = value.bit_length() - SUB_BITS - 1
+    return (shift + 1) * SUB_COUNT + (value >> shift) - SUB_COUNT
+
+
+def bucket_bounds(index: int) -> Tuple[int, int]:
+    """Bornes [basse, haute) des valeurs d'un intervalle"""
+    if index < 2 * SUB_COUNT:
+        return index, index + 1
+    shift = index // SUB_COUNT - 1
+    mantissa = index % SUB_COUNT + SUB_COUNT
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class Histogram:
+    """Histogramme de latences en nanosecondes (enregistrement O(1), mémoire fixe)"""
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        ns = int(seconds * 1e9)
+        if ns < 0:
+            ns = 0
+        index = min(bucket_index(ns), BUCKETS - 1)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if ns > self.max:
+                self.max = ns
+
+    def quantile(self, q: float) -> float:
+        """Valeur (secondes) au quantile q, milieu de l'intervalle correspondant"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = max(1, math.ceil(q * self.count))
+            seen = 0
+            for index, n in enumerate(self.counts):
+                seen += n
+                if seen >= rank:
+                    low, high = bucket_bounds(index)
+                    return min((low + high - 1) / 2, self.max) / 1e9
+        return self.max / 1e9
+
+    def as_dict(self) -> dict:
+        data = {"count": self.count, "sum_sec": round(self.total, 6),
+                "max_ms": round(self.max / 1e6, 3)}
+        for q in QUANTILES:
+            data[f"p{q * 100:g}_ms"] = round(self.quantile(q) * 1e3, 4)
+        return data
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+class Metrics:
+    """
+    Registre de métriques du moteur : histogrammes par étape, compteurs étiquetés
+    et collecteurs (fonctions appelées à la lecture, ex: retard d'ingestion).
+    Désactivé, chaque point d'instrumentation se réduit à un test de `enabled`.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.started = time.time()
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[Tuple[str, Tuple], float] = {}
+        self.collectors: List[Callable[[], dict]] = []
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(stage, Histogram())
+        histogram.record(seconds)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def add_collector(self, collector: Callable[[], dict]):
+        """collector() -> {nom: [(labels dict, valeur), ...]} (jauges lues à la demande)"""
+        self.collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], dict]):
+        if collector in self.collectors:
+            self.collectors.remove(collector)
+
+    def _collect(self) -> Dict[str, list]:
+        gauges: Dict[str, list] = {}
+        for collector in list(self.collectors):
+            try:
+                for name, samples in collector().items():
+                    gauges.setdefault(name, []).extend(samples)
+            except Exception as e:
+                print(f"[Metrics] Erreur collecteur: {e}")
+        return gauges
+
+    def snapshot(self) -> dict:
+        counters: Dict[str, list] = {}
+        with self._lock:
+            items = list(self.counters.items())
+        for (name, labels), value in items:
+            counters.setdefault(name, []).append({"labels": dict(labels), "value": value})
+        return {
+            "enabled": self.enabled,
+            "uptime_sec": round(time.time() - self.started, 1),
+            "stages": {name: h.as_dict() for name, h in sorted(self.histograms.items())},
+            "counters": counters,
+            "gauges": {name: [{"labels": l, "value": v} for l, v in samples]
+                       for name, samples in self._collect().items()},
+        }
+
+    def render_prometheus(self) -> str:
+        """Format texte d'exposition Prometheus (version 0.0.4)"""
+        out = ["# HELP siem_stage_latency_seconds Latence par étape du pipeline",
+               "# TYPE siem_stage_latency_seconds summary"]
+        for name, h in sorted(self.histograms.items()):
+            for q in QUANTILES:
+                out.append(f"siem_stage_latency_seconds{_labels((('stage', name), ('quantile', f'{q:g}')))} {h.quantile(q):.9f}")
+            out.append(f"siem_stage_latency_seconds_sum{_labels((('stage', name),))} {h.total:.6f}")
+            out.append(f"siem_stage_latency_seconds_count{_labels((('stage', name),))} {h.count}")
+
+        with self._lock:
+            items = sorted(self.counters.items())
+        declared = set()
+        for (name, labels), value in items:
+            if name not in declared:
+                out.append(f"# TYPE siem_{name}_total counter")
+                declared.add(name)
+            out.append(f"siem_{name}_total{_labels(labels)} {value:g}")
+
+        for name, samples in sorted(self._collect().items()):
+            out.append(f"# TYPE siem_{name} gauge")
+            for labels, value in samples:
+                out.append(f"siem_{name}{_labels(tuple(sorted(labels.items())))} {value:g}")
+
+        out.append("# TYPE siem_uptime_seconds gauge")
+        out.append(f"siem_uptime_seconds {time.time() - self.started:.1f}")
+        return "\n".join(out) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry: Metrics = None
+
+    def do_GET(self):
+        if self.path.startswith("/metrics"):
+            body, ctype = self.registry.render_prometheus(), "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path.startswith("/stats"):
+            body, ctype = json.dumps(self.registry.snapshot(), ensure_ascii=False), "application/json"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # Pas de log par requête de scrape
+
+
+class MetricsServer:
+    """Point d'accès HTTP local : /metrics (Prometheus) et /stats (JSON)"""
+
+    def __init__(self, registry: Metrics, address: Tuple[str, int]):
+        handler = type("MetricsHandler", (_Handler,), {"registry": registry})
+        self.httpd = ThreadingHTTPServer(address, handler)
+        self.httpd.daemon_threads = True
+        self.address = self.httpd.server_address[:2]
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="metrics", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def parse_metrics_address(value: str) -> Tuple[str, int]:
+    """'port' ou 'hôte:port' ; l'hôte par défaut est 127.0.0.1 (jamais exposé par défaut)"""
+    host, _, port = value.rpartition(":")
+    return (host or "127.0.0.1", int(port))
+
+
+metrics = Metrics(enabled=settings.METRICS_ENABLED)
@@ -0,0 +1,298 @@
+import re
+import ssl
+import time
+import queue
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import settings
+from core.sources import Batch, SourceMetrics
+
+# <PRI>Mmm dd hh:mm:ss HOST TAG: MSG
+RFC3164_RE = re.compile(
+    rb"^<(?P<pri>\d{1,3})>(?P<ts>[A-Z][a-z]{2}\s+\d{1,2} \d{2}:\d{2}:\d{2}) (?P<host>\S+) (?P<msg>.*)$", re.S
+)
+# <PRI>VERSION TIMESTAMP HOST APP PROCID MSGID STRUCTURED-DATA [MSG]
+RFC5424_RE = re.compile(
+    rb"^<(?P<pri>\d{1,3})>\d{1,2} (?P<ts>\S+) (?P<host>\S+) (?P<app>\S+) (?P<procid>\S+) (?P<msgid>\S+) "
+    rb"(?P<sd>-|(?:\[(?:[^\]\\]|\\.)*\])+)(?: (?P<msg>.*))?$", re.S
+)
+# TAG: ou TAG[PID]: en tête du message RFC 3164
+TAG_RE = re.compile(rb"^[\w\-./]{1,48}(?:\[\d+\])?: ?")
+OCTET_COUNT_RE = re.compile(rb"^(\d{1,7}) ")
+
+MAX_MESSAGE = 64 * 1024
+
+
+def parse_syslog(data: bytes) -> bytes:
+    """Extrait le message d'une trame syslog RFC 5424 ou RFC 3164 (sinon la trame brute)"""
+    data = data.rstrip(b"\r\n\0")
+    m = RFC5424_RE.match(data)
+    if m:
+        msg = m.group("msg") or b""
+        return msg[3:] if msg.startswith(b"\xef\xbb\xbf") else msg   # BOM UTF-8
+    m = RFC3164_RE.match(data)
+    if m:
+        return TAG_RE.sub(b"", m.group("msg"), count=1)
+    return data
+
+
+class PeerStats:
+    __slots__ = ("messages", "bytes", "dropped", "rate", "last_seen")
+
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+        self.dropped = 0
+        self.rate = 0.0
+        self.last_seen = time.monotonic()
+
+    def record(self, size: int):
+        now = time.monotonic()
+        elapsed = max(now - self.last_seen, 1e-3)
+        # Moyenne glissante exponentielle du débit instantané (messages/s)
+        self.rate = 0.9 * self.rate + 0.1 * min(1.0 / elapsed, 1e6)
+        self.last_seen = now
+        self.messages += 1
+        self.bytes += size
+
+    def as_dict(self) -> dict:
+        return {"messages": self.messages, "bytes": self.bytes,
+                "dropped": self.dropped, "msg_per_sec": round(self.rate, 1)}
+
+
+class NetworkSource:
+    """
+    Source réseau : agrège les messages reçus en lots pour la file de détection.
+    Le tampon est borné : en cas de saturation les messages les plus anciens
+    sont abandonnés et comptés (par pair et globalement)
+    """
+
+    def __init__(self, name: str, out: "queue.Queue", fmt: str = "unified",
+                 batch_size: int = 500, max_buffer: int = 50000, max_peers: int = 10000):
+        self.name = name
+        self.fmt = fmt
+        self.out = out
+        self.batch_size = batch_size
+        self.metrics = SourceMetrics()
+        self.dropped = 0
+        self._buffer: deque = deque()
+        self._pending: List[Batch] = []
+        self.max_buffer = max_buffer
+        self.max_peers = max_peers
+        self.peers: "OrderedDict[str, PeerStats]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _peer(self, peer: str) -> PeerStats:
+        with self._lock:
+            stats = self.peers.get(peer)
+            if stats is None:
+                stats = self.peers[peer] = PeerStats()
+                if len(self.peers) > self.max_peers:
+                    self.peers.popitem(last=False)
+            else:
+                self.peers.move_to_end(peer)
+        return stats
+
+    def submit(self, peer: str, message: bytes):
+        stats = self._peer(peer)
+        stats.record(len(message))
+        if len(self._buffer) >= self.max_buffer:
+            self._buffer.popleft()
+            self.dropped += 1
+            stats.dropped += 1
+        self._buffer.append(message.decode("utf-8", errors="ignore"))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Pousse les lots prêts dans la file partagée sans jamais bloquer la boucle asyncio"""
+        while self._buffer:
+            n = min(self.batch_size, len(self._buffer))
+            lines = [self._buffer.popleft() for _ in range(n)]
+            self.metrics.record_batch(len(lines), sum(len(l) + 1 for l in lines))
+            self._pending.append(Batch(self, lines, None))
+        while self._pending:
+            try:
+                self.out.put_nowait(self._pending[0])
+            except queue.Full:
+                # Détection saturée : on garde les lots, bornés par max_buffer
+                while sum(len(b.lines) for b in self._pending) > self.max_buffer:
+                    self.dropped += len(self._pending.pop(0).lines)
+                return
+            self._pending.pop(0)
+
+    def stats(self) -> dict:
+        data = self.metrics.as_dict()
+        data["dropped"] = self.dropped
+        data["buffered"] = len(self._buffer) + sum(len(b.lines) for b in self._pending)
+        with self._lock:
+            data["peers"] = {p: s.as_dict() for p, s in self.peers.items()}
+        return data
+
+
+class _SyslogUDP(asyncio.DatagramProtocol):
+    def __init__(self, source: NetworkSource):
+        self.source = source
+
+    def datagram_received(self, data: bytes, addr):
+        self.source.submit(addr[0], parse_syslog(data[:MAX_MESSAGE]))
+
+
+def parse_address(value: str) -> Optional[Tuple[str, int]]:
+    """'hôte:port' -> (hôte, port) ; chaîne vide -> None"""
+    if not value:
+        return None
+    host, _, port = value.rpartition(":")
+    return (host or "0.0.0.0", int(port))
+
+
+class NetworkListener:
+    """
+    Réception réseau asyncio (dans son propre thread) :
+    - syslog UDP (RFC 3164 / 5424)
+    - syslog TCP (trames délimitées par '\\n' ou préfixées par leur longueur, RFC 6587)
+    - lignes brutes sur TCP (une ligne de log par '\\n'), TLS optionnel
+    Les messages sont regroupés en lots dans la même file que les sources fichiers
+    """
+
+    def __init__(self, out: "queue.Queue", syslog_udp: Tuple[str, int] = None,
+                 syslog_tcp: Tuple[str, int] = None, lines_tcp: Tuple[str, int] = None,
+                 ssl_context: ssl.SSLContext = None, flush_interval: float = 0.05,
+                 notify=None):
+        self.syslog_udp = syslog_udp
+        self.syslog_tcp = syslog_tcp
+        self.lines_tcp = lines_tcp
+        self.ssl_context = ssl_context
+        self.flush_interval = flush_interval
+        self.notify = notify or (lambda msg: None)
+        self.sources: Dict[str, NetworkSource] = {
+            "syslog": NetworkSource("syslog", out),
+            "tcp": NetworkSource("tcp", out),
+        }
+        self.bound: Dict[str, Tuple[str, int]] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._stopping: Optional[asyncio.Event] = None
+
+    @classmethod
+    def from_settings(cls, out: "queue.Queue", notify=None) -> Optional["NetworkListener"]:
+        """Construit le listener à partir de settings, ou None si aucun port n'est configuré"""
+        udp = parse_address(settings.SYSLOG_UDP)
+        tcp = parse_address(settings.SYSLOG_TCP)
+        lines = parse_address(settings.LINES_TCP)
+        if not (udp or tcp or lines):
+            return None
+        context = None
+        if settings.TLS_CERT:
+            context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            context.load_cert_chain(settings.TLS_CERT, settings.TLS_KEY or None)
+        return cls(out, udp, tcp, lines, context, notify=notify)
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="network", daemon=True)
+        self.thread.start()
+        self._ready.wait(timeout=5)
+
+    def stop(self):
+        if self.loop and self._stopping:
+            self.loop.call_soon_threadsafe(self._stopping.set)
+        if self.thread:
+            self.thread.join(timeout=2)
+
+    def _run(self):
+        try:
+            asyncio.run(self._serve())
+        except Exception as e:
+            print(f"[Network] Erreur: {e}")
+        finally:
+            self._ready.set()
+
+    async def _serve(self):
+        self.loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        closers = []
+
+        if self.syslog_udp:
+            transport, _ = await self.loop.create_datagram_endpoint(
+                lambda: _SyslogUDP(self.sources["syslog"]), local_addr=self.syslog_udp)
+            self.bound["syslog_udp"] = transport.get_extra_info("sockname")[:2]
+            closers.append(transport.close)
+        for key, addr, handler in (("syslog_tcp", self.syslog_tcp, self._handle_syslog),
+                                   ("lines_tcp", self.lines_tcp, self._handle_lines)):
+            if addr:
+                server = await asyncio.start_server(handler, addr[0], addr[1],
+                                                    ssl=self.ssl_context, limit=MAX_MESSAGE)
+                self.bound[key] = server.sockets[0].getsockname()[:2]
+                closers.append(server.close)
+
+        for key, addr in self.bound.items():
+            self.notify(f"[SYSTEM] Écoute {key} sur {addr[0]}:{addr[1]}{' (TLS)' if self.ssl_context and key != 'syslog_udp' else ''}")
+        self._ready.set()
+
+        # Vidage périodique des tampons : latence bornée même à faible débit
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            for source in self.sources.values():
+                source.flush()
+
+        for close in closers:
+            close()
+
+    async def _handle_lines(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info("peername")[0]
+        source = self.sources["tcp"]
+        try:
+            while True:
+                try:
+                    line = await reader.readuntil(b"\n")
+                except asyncio.IncompleteReadError as e:
+                    if e.partial.strip():
+                        source.submit(peer, e.partial)
+                    break
+                except asyncio.LimitOverrunError as e:
+                    # Ligne trop longue : on l'abandonne
+                    await reader.readexactly(e.consumed)
+                    source._peer(peer).dropped += 1
+                    continue
+                if line.strip():
+                    source.submit(peer, line.rstrip(b"\r\n"))
+        finally:
+            writer.close()
+
+    async def _handle_syslog(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info("peername")[0]
+        source = self.sources["syslog"]
+        try:
+            while True:
+                head = await reader.read(1)
+                if not head:
+                    break
+                if head.isdigit():
+                    # Octet counting (RFC 6587) : "LONGUEUR MESSAGE"
+                    digits = head + await reader.readuntil(b" ")
+                    m = OCTET_COUNT_RE.match(digits)
+                    if not m:
+                        break
+                    frame = await reader.readexactly(int(m.group(1)))
+                else:
+                    # Non-transparent framing : trame terminée par '\n'
+                    try:
+                        frame = head + await reader.readuntil(b"\n")
+                    except asyncio.IncompleteReadError as e:
+                        frame = head + e.partial
+                if frame.strip():
+                    source.submit(peer, parse_syslog(frame[:MAX_MESSAGE]))
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def stats(self) -> Dict[str, dict]:
+        return {name: s.stats() for name, s in self.sources.items()}
@@ -0,0 +1,226 @@
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+# Detecteurs
+from detectors.sqli import detect as detect_sqli
+from detectors.xss import detect as detect_xss
+from detectors.bruteforce import detect as detect_bruteforce
+from detectors.csrf import detect as detect_csrf
+from detectors.file_upload import detect as detect_file_upload
+from detectors.os_injection import detect as detect_os_injection
+from detectors.traversal import detect as detect_traversal
+from detectors.nosql import detect as detect_nosql
+from detectors.crlf import detect as detect_crlf
+from detectors.HTTP import detect as detect_http
+from detectors.ip import detect_ip_reputation, API_KEY as REPUTATION_API_KEY
+
+from geo_finder import get_ip_info
+from utils.log_parser import parse
+from core.metrics import metrics
+from core.scheduler import DetectorScheduler
+from core.verdict_cache import Verdict, VerdictCache, verdict_key
+from config.settings import settings
+
+DETECTORS = [
+    detect_sqli, detect_xss, detect_bruteforce, detect_csrf,
+    detect_file_upload, detect_os_injection, detect_crlf,
+    detect_http, detect_traversal, detect_nosql, detect_ip_reputation
+]
+
+
+class DetectionPipeline:
+    """
+    Étape de détection partagée par toutes les sources :
+    score ML, géolocalisation, détecteurs à signatures et préparation de l'alerte
+    """
+
+    def __init__(self, alert_manager, ml_detector, detectors: list = None, mode: str = None,
+                 cache_size: int = None):
+        self.alert_manager = alert_manager
+        self.ml_detector = ml_detector
+        self.detectors = detectors if detectors is not None else DETECTORS
+        # Nom d'étape de chaque détecteur pour les histogrammes (detector.sqli, ...)
+        self.stage_names = {d: "detector." + d.__module__.split(".")[-1] for d in self.detectors}
+        # Détecteurs locaux ; la réputation IP (appel réseau) reste décidée après le score ML
+        self.scheduler = DetectorScheduler([d for d in self.detectors if d is not detect_ip_reputation],
+                                           mode or settings.DETECTOR_MODE)
+        # Verdicts des requêtes répétées (scanners, brute force) : détecteurs sans état
+        self.cache = VerdictCache(settings.VERDICT_CACHE_SIZE if cache_size is None else cache_size)
+        # Suivi des scores en direct par version de modèle (ScoreMonitor du ré-entraînement), optionnel
+        self.monitor = None
+
+    def parse(self, log_line: str, fmt: str = None):
+        if not metrics.enabled:
+            return parse(log_line, fmt)
+        t0 = time.perf_counter()
+        record = parse(log_line, fmt)
+        metrics.observe("parse", time.perf_counter() - t0)
+        return record
+
+    def lookup(self, record) -> Optional[Verdict]:
+        """
+        Verdict partagé par toutes les copies de la même requête (None si le cache est désactivé).
+        Un verdict nouvellement créé est vide : match_signatures le complète
+        """
+        if not self.cache.enabled:
+            return None
+        key = verdict_key(record)
+        mode = self.scheduler.mode
+        verdict = self.cache.get(key, mode)
+        if metrics.enabled:
+            metrics.inc("verdict_cache", result="miss" if verdict is None else "hit")
+        if verdict is None:
+            verdict = Verdict(mode)
+            self.cache.put(key, verdict)
+        return verdict
+
+    def match_signatures(self, record, verdict: Verdict = None) -> List[Tuple[str, str]]:
+        """
+        Détecteurs locaux (sans la réputation IP) : [(type, pattern), ...], vide si aucun ne répond.
+        Un seul résultat, sauf en mode `all` où le premier est celui de l'ordre fixe.
+        Avec un verdict déjà complet, seuls les détecteurs à état sont évalués
+        """
+        if verdict is None:
+            hits = self.scheduler.match(record)
+        else:
+            if verdict.hits is None:
+                verdict.hits = self.scheduler.match_stateless(record)
+            else:
+                self.cache.saved["signatures"] += 1
+            hits = self.scheduler.combine(verdict.hits, self.scheduler.match_stateful(record))
+        return [(a_type, _pattern(details)) for a_type, details in hits]
+
+    def score(self, record, state=None) -> Tuple[bool, float]:
+        """
+        Score ML d'une ligne (False, 0.0 si le modèle n'est pas entraîné).
+        Jamais mis en cache : longueur et entropie dépendent de l'IP et de la durée de chaque copie
+        """
+        if not self.ml_detector.is_trained:
+            return False, 0.0
+        state = state or self.ml_detector.current
+        t0 = time.perf_counter()
+        result = self.ml_detector.predict(record, state)
+        if metrics.enabled:
+            metrics.observe("ml", time.perf_counter() - t0)
+        if self.monitor is not None:
+            self.monitor.observe(state.version, [result])
+        return result
+
+    def score_batch(self, records: list, state=None) -> List[Tuple[bool, float]]:
+        """
+        Scores ML d'un lot, ligne par ligne comme score().
+        `state` : ModelState lu par l'appelant en début de lot, sinon le modèle actif
+        """
+        if not records or not self.ml_detector.is_trained:
+            return [(False, 0.0)] * len(records)
+        state = state or self.ml_detector.current
+        results = self._predict_batch(records, state)
+        if self.monitor is not None:
+            self.monitor.observe(state.version, results)
+        return results
+
+    def _predict_batch(self, records: list, state) -> List[Tuple[bool, float]]:
+        t0 = time.perf_counter()
+        results = self.ml_detector.predict_batch(records, state)
+        if metrics.enabled:
+            metrics.observe("ml_batch", time.perf_counter() - t0)
+        return results
+
+    def needs_reputation(self, ml_is_anomaly: bool, ml_score: float) -> bool:
+        """Vrai si la réputation IP (appel AbuseIPDB) doit être vérifiée pour cette ligne"""
+        if detect_ip_reputation not in self.stage_names or not REPUTATION_API_KEY:
+            return False
+        # Optimisation: On ne vérifie l'IP via l'API que si le trafic semble un minimum suspect
+        # (skip AbuseIPDB pour le trafic extrêmement propre)
+        return ml_is_anomaly or ml_score >= 0.02
+
+    def check_reputation(self, record, ml_is_anomaly: bool, ml_score: float) -> Optional[Tuple[str, str]]:
+        """Réputation IP (AbuseIPDB), seulement si le détecteur est actif et le trafic un minimum suspect"""
+        if not self.needs_reputation(ml_is_anomaly, ml_score):
+            return None
+        t0 = time.perf_counter()
+        found, details, a_type = detect_ip_reputation(record)
+        if metrics.enabled:
+            metrics.observe(self.stage_names[detect_ip_reputation], time.perf_counter() - t0)
+        return (a_type, _pattern(details)) if found else None
+
+    def geolocate(self, ip_addr: str) -> dict:
+        if not metrics.enabled:
+            return get_ip_info(ip_addr)
+        t0 = time.perf_counter()
+        geo_info = get_ip_info(ip_addr)
+        metrics.observe("geo", time.perf_counter() - t0)
+        return geo_info
+
+    def build_result(self, record, hits: List[Tuple[str, str]], ml_is_anomaly: bool,
+                     ml_score: float, geo_info: Optional[dict] = None,
+                     ml_version: Optional[str] = None) -> dict:
+        """
+        Résultat d'une ligne : alerte si une signature a répondu ou anomalie ML (> 0.50).
+        Le premier résultat donne le type de l'alerte, les suivants (mode `all`) sont
+        ajoutés dans "findings" et à la fin du pattern enregistré.
+        geo_info None = géolocalisation faite ici (uniquement pour les alertes).
+        ml_version : version du modèle qui a produit ml_score, enregistrée avec l'alerte
+        """
+        stripped = str(record)
+        result = {"line": stripped, "record": record, "ml_score": ml_score, "alert": None, "prepared": None}
+        if not hits and not (ml_is_anomaly and ml_score > 0.50):
+            return result
+
+        ip_addr = record.ip or "127.0.0.1"
+        if geo_info is None:
+            geo_info = self.geolocate(ip_addr)
+        if hits:
+            attack_type, pattern = hits[0]
+            others = sorted({a_type for a_type, _ in hits[1:]} - {attack_type})
+            stored = f"{pattern} (+ {', '.join(others)})" if others else pattern
+            prepared = self.alert_manager.prepare_alert(attack_type, stored, record, ml_score, geo_data=geo_info,
+                                                        model_version=ml_version)
+        else:
+            attack_type, pattern = "ML Anomaly", f"Score: {ml_score:.2f}"
+            prepared = self.alert_manager.prepare_alert("ML Anomaly", f"score:{ml_score:.2f}", record, ml_score,
+                                                        geo_data=geo_info, model_version=ml_version)
+        result["alert"] = {
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "type": attack_type,
+            "pattern": pattern,
+            "line": stripped,
+            "ip": ip_addr,
+            "ml_score": ml_score,
+            "model_version": ml_version,
+            "country": geo_info["country"],
+            "city": geo_info["city"],
+            "coords": geo_info["coords"],
+            "findings": [{"type": a_type, "pattern": p} for a_type, p in hits[1:]]
+        }
+        result["prepared"] = prepared
+        return result
+
+    def analyze(self, log_line: str, fmt: str = None, ml_result: tuple = None,
+                verdict: Verdict = None, state=None) -> dict:
+        """
+        Analyse complète et synchrone d'une ligne déchiffrée (format attendu `fmt` : unified / clf).
+        La ligne est analysée une seule fois ; le LogRecord obtenu est passé au modèle ML,
+        à chaque détecteur puis, pour les alertes, à la géolocalisation.
+        `ml_result` (is_anomaly, score) permet de fournir un score déjà calculé par lot
+        (par le modèle `state`), `verdict` le résultat de lookup() (sinon recherché ici dans le cache).
+        Retourne {"line", "ml_score", "alert", "prepared"} ; alert/prepared valent None si rien n'est détecté
+        """
+        state = state or self.ml_detector.current
+        record = self.parse(log_line, fmt)
+        if verdict is None:
+            verdict = self.lookup(record)
+        ml_is_anomaly, ml_score = ml_result if ml_result is not None else self.score(record, state)
+        hits = self.match_signatures(record, verdict)
+        if not hits:
+            reputation = self.check_reputation(record, ml_is_anomaly, ml_score)
+            hits = [reputation] if reputation else []
+        return self.build_result(record, hits, ml_is_anomaly, ml_score,
+                                 ml_version=state.version if state.model is not None else None)
+
+
+def _pattern(details) -> str:
+    if isinstance(details, str):
+        return details
+    return str(details[0]) if details else "Pattern inconnu"
@@ -0,0 +1,216 @@
+import os
+import glob
+import gzip
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, List, Optional
+
+from core.alert_manager import AlertManager
+from core.database import Database
+from core.pipeline import DetectionPipeline, DETECTORS
+from core.sources import resolve_path
+from detectors.ip import detect_ip_reputation
+from utils.log_parser import parse
+
+TIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d")
+
+
+def parse_time(value: str) -> Optional[float]:
+    """
+    '2026-02-18', '2026-02-18 11:58[:30]' ou ISO 8601 -> epoch. Sans fuseau, l'heure est
+    en UTC, comme les horodatages des logs (LogRecord.epoch) ; lève ValueError si illisible
+    """
+    if not value:
+        return None
+    for fmt in TIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            pass
+    # ISO 8601, avec ou sans fuseau (ex: 2026-02-18T11:58:30Z, 2026-02-18T12:58:30+01:00)
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"date invalide: {value!r} (ex: 2026-02-18, '2026-02-18 11:58', 2026-02-18T11:58:30Z)")
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def format_time(epoch: float) -> str:
+    """Même format (heure locale) que les timestamps de la table alerts"""
+    return datetime.fromtimestamp(epoch).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _open(path: str):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def is_encrypted(path: str) -> bool:
+    """Détecte une archive chiffrée d'après son premier enregistrement (jeton Fernet, préfixé ou non de l'ID de clé)"""
+    with _open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                token = line.partition(b":")[2] if b":" in line[:9] else line
+                return token.startswith(b"gAAAAA")
+    return False
+
+
+def iter_archive(path: str, encrypted: bool = None) -> Iterator[Optional[str]]:
+    """
+    Lit une archive (chiffrée ou en clair, éventuellement .gz) ligne par ligne.
+    Produit None pour un enregistrement impossible à déchiffrer
+    """
+    if encrypted is None:
+        encrypted = is_encrypted(path)
+    if encrypted:
+        from utils.dechiffrer import dechiffrer_donnees
+    with _open(path) as f:
+        for raw in f:
+            if not raw.strip():
+                continue
+            if encrypted:
+                yield dechiffrer_donnees(raw) or None
+            else:
+                yield raw.decode("utf-8", errors="ignore")
+
+
+class Replayer:
+    """
+    Rejeu à haut débit d'archives de logs (rattrapage après ajout d'une règle, audit...).
+    Pas d'interface ni de fichier alerts.log : déchiffrement -> analyse -> score ML par lot
+    -> détecteurs -> insertion en masse (une transaction par lot).
+    Les alertes sont horodatées à l'heure de l'événement, pas à l'heure du rejeu.
+    Les résultats vont dans une base séparée (`db_path`) : rejouer dans la base principale
+    des archives déjà analysées par le moteur y dupliquerait chaque alerte. Sans `db_path`,
+    seul dry_run est accepté (rien n'est écrit)
+    """
+
+    def __init__(self, db_path: str = None, since: float = None, until: float = None,
+                 batch_size: int = 2000, fmt: str = None, ml_detector=None,
+                 reputation: bool = False, dry_run: bool = False, notify=None,
+                 detector_mode: str = None):
+        if not db_path and not dry_run:
+            raise ValueError("base de résultats requise (db_path), ou dry_run")
+        self.db = Database(resolve_path(db_path) if db_path else None)
+        # Référence pour les écarts : la base principale, même si les résultats vont ailleurs
+        self.baseline_db = Database() if db_path else self.db
+        self.since = since
+        self.until = until
+        self.batch_size = batch_size
+        self.fmt = fmt
+        self.dry_run = dry_run
+        self.notify = notify or (lambda msg: None)
+        if ml_detector is None:
+            from ml.streaming import create_detector
+            # Chargé pendant la lecture des premiers fichiers ; l'état du modèle en ligne (ML_MODEL=hst/both)
+            # évolue pendant le rejeu sans être enregistré
+            ml_detector = create_detector(background=True, persist=False)
+        self.ml_detector = ml_detector
+        # La réputation IP reflète l'état actuel d'AbuseIPDB, pas celui de l'époque : désactivée par défaut
+        detectors = DETECTORS if reputation else [d for d in DETECTORS if d is not detect_ip_reputation]
+        self.pipeline = DetectionPipeline(AlertManager(self.db), ml_detector, detectors, detector_mode)
+        self.counters = Counter()
+        self.by_type = Counter()
+
+    def in_range(self, epoch: Optional[float]) -> bool:
+        if self.since is None and self.until is None:
+            return True
+        if epoch is None:
+            return False
+        if self.since is not None and epoch < self.since:
+            return False
+        return self.until is None or epoch < self.until
+
+    def _records(self, paths: Iterable[str], encrypted: bool = None):
+        for path in paths:
+            self.counters["files"] += 1
+            self.notify(f"[Replay] {path}")
+            for line in iter_archive(path, encrypted):
+                self.counters["lines"] += 1
+                if line is None:
+                    self.counters["decrypt_errors"] += 1
+                    continue
+                record = parse(line, self.fmt)
+                if not self.in_range(record.epoch):
+                    self.counters["out_of_range"] += 1
+                    continue
+                yield record
+
+    def process_batch(self, records: List[str]):
+        state = self.ml_detector.current
+        verdicts = [self.pipeline.lookup(record) for record in records]
+        ml_results = self.ml_detector.predict_batch(records, state)
+        alerts = []
+        for record, ml_result, verdict in zip(records, ml_results, verdicts):
+            try:
+                result = self.pipeline.analyze(record, self.fmt, ml_result, verdict, state)
+            except Exception as e:
+                print(f"[Replay] Erreur analyse: {e}")
+                self.counters["errors"] += 1
+                continue
+            prepared = result["prepared"]
+            if prepared:
+                prepared["timestamp"] = format_time(record.epoch) if record.epoch else None
+                self.by_type[prepared["attack_type"]] += 1
+                alerts.append(prepared)
+        self.counters["analyzed"] += len(records)
+        if alerts and not self.dry_run:
+            self.db.insert_alerts(alerts)
+
+    def run(self, paths: Iterable[str], encrypted: bool = None) -> dict:
+        since = format_time(self.since) if self.since is not None else None
+        until = format_time(self.until) if self.until is not None else None
+        # Alertes déjà connues sur la plage, comptées avant toute insertion
+        baseline = self.baseline_db.count_alerts_by_type(since, until)
+
+        start = time.perf_counter()
+        batch = []
+        for record in self._records(paths, encrypted):
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                self.process_batch(batch)
+                batch = []
+        if batch:
+            self.process_batch(batch)
+        elapsed = time.perf_counter() - start
+
+        types = sorted(set(baseline) | set(self.by_type))
+        return {
+            "db": self.db.db_path,
+            "dry_run": self.dry_run,
+            "since": since,
+            "until": until,
+            "files": self.counters["files"],
+            "lines": self.counters["lines"],
+            "analyzed": self.counters["analyzed"],
+            "out_of_range": self.counters["out_of_range"],
+            "decrypt_errors": self.counters["decrypt_errors"],
+            "errors": self.counters["errors"],
+            "elapsed_sec": round(elapsed, 3),
+            "lines_per_sec": round(self.counters["lines"] / elapsed, 1) if elapsed > 0 else 0.0,
+            "alerts": sum(self.by_type.values()),
+            "by_type": dict(self.by_type),
+            "baseline": baseline,
+            "delta": {t: self.by_type.get(t, 0) - baseline.get(t, 0) for t in types},
+            "detectors": self.pipeline.scheduler.stats(),
+            "verdict_cache": self.pipeline.cache.stats(),
+            "ml_gate": self._gate_stats(),
+        }
+
+    def _gate_stats(self) -> Optional[dict]:
+        """Portique de la forêt (ml/gate.py) ; None sans forêt (ML_MODEL=hst)"""
+        forest = getattr(self.ml_detector, "forest", self.ml_detector)
+        return forest.gate_stats() if forest is not None else None
+
+
+def expand_paths(patterns: Iterable[str]) -> List[str]:
+    """Développe les motifs glob (ordre trié, archives les plus anciennes en premier si nommées ainsi)"""
+    paths = []
+    for pattern in patterns:
+        pattern = resolve_path(pattern)
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        paths.extend(p for p in matches if os.path.isfile(p))
+    return paths
@@ -0,0 +1,181 @@
+import time
+from typing import List, Tuple
+
+from detectors.bruteforce import detect as detect_bruteforce
+from core.metrics import metrics
+
+MODES = ("fixed", "adaptive", "all")
+
+# Détecteurs à état (compteurs de tentatives) : toujours évalués, même après un premier
+# résultat, pour que leur état ne dépende ni du mode ni de l'ordre d'évaluation
+STATEFUL = (detect_bruteforce,)
+
+
+class _DetectorStats:
+    __slots__ = ("name", "calls", "hits", "sampled", "sampled_hits", "cost_ns")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0          # Évaluations (toutes lignes)
+        self.hits = 0
+        self.sampled = 0        # Lignes échantillonnées : tous les détecteurs évalués et chronométrés
+        self.sampled_hits = 0
+        self.cost_ns = 0.0      # Coût moyen glissant (ns)
+
+    @property
+    def hit_rate(self) -> float:
+        # Lissage de Laplace : un détecteur jamais échantillonné n'a pas un taux nul
+        return (self.sampled_hits + 1) / (self.sampled + 2)
+
+    @property
+    def rank_score(self) -> float:
+        """Coût attendu par détection : on évalue d'abord les détecteurs au plus petit rapport coût / taux"""
+        return self.cost_ns / self.hit_rate
+
+
+class DetectorScheduler:
+    """
+    Ordonnanceur des détecteurs à signatures, sur des LogRecord déjà analysés.
+      fixed    : ordre de la liste, arrêt au premier résultat (comportement historique)
+      adaptive : arrêt au premier résultat, l'ordre est recalculé toutes les `reorder_every`
+                 lignes selon le coût et le taux de détection mesurés
+      all      : tous les détecteurs, tous les résultats (le premier dans l'ordre fixe en tête)
+    Une ligne sur `sample_every` évalue tous les détecteurs en les chronométrant : les
+    statistiques ne sont pas biaisées par l'ordre courant. Les détecteurs STATEFUL sont
+    évalués sur chaque ligne quel que soit le mode. Le mode se change à chaud (set_mode).
+    """
+
+    def __init__(self, detectors: list, mode: str = "fixed",
+                 reorder_every: int = 1024, sample_every: int = 64):
+        self.detectors = list(detectors)
+        self.stats_by_detector = {d: _DetectorStats(d.__module__.split(".")[-1]) for d in self.detectors}
+        self.stage_names = {d: "detector." + s.name for d, s in self.stats_by_detector.items()}
+        self.order = list(self.detectors)
+        self.priority = {d: i for i, d in enumerate(self.detectors)}
+        self.stateless = [d for d in self.detectors if d not in STATEFUL]
+        self.stateful = [d for d in self.detectors if d in STATEFUL]
+        self.reorder_every = max(1, reorder_every)
+        self.sample_every = max(1, sample_every)
+        self.lines = 0
+        self.stateful_lines = 0
+        self.reorders = 0
+        self.mode = "fixed"
+        self.set_mode(mode)
+
+    def set_mode(self, mode: str):
+        if mode not in MODES:
+            raise ValueError(f"Mode de détection inconnu: {mode} (attendu: {', '.join(MODES)})")
+        self.mode = mode
+
+    def match(self, record) -> List[Tuple[str, object]]:
+        """Résultats (type, détails) des détecteurs qui répondent ; au plus un hors mode `all`"""
+        return self.combine(self.match_stateless(record), self.match_stateful(record))
+
+    def match_stateless(self, record) -> list:
+        """
+        Détecteurs sans état : [(type, détails, détecteur), ...] (premier résultat dans l'ordre
+        courant, ou tous en mode `all`). Ne dépend que de la ligne : peut être mis en cache
+        """
+        self.lines += 1
+        mode = self.mode
+        sampled = self.lines % self.sample_every == 0
+        if mode == "all" or sampled:
+            found = self._run_all(self.stateless, record, sampled)
+            if mode == "fixed":
+                found = found[:1]
+            elif mode == "adaptive":
+                rank = {d: i for i, d in enumerate(self.order)}
+                found = [min(found, key=lambda h: rank[h[2]])] if found else []
+        else:
+            found = self._run_first(self.order if mode == "adaptive" else self.stateless, record)
+        if mode == "adaptive" and self.lines % self.reorder_every == 0:
+            self.reorder()
+        return found
+
+    def match_stateful(self, record) -> list:
+        """Détecteurs à état, évalués sur chaque ligne : tous leurs résultats"""
+        self.stateful_lines += 1
+        return self._run_all(self.stateful, record, self.stateful_lines % self.sample_every == 0)
+
+    def combine(self, stateless: list, stateful: list) -> List[Tuple[str, object]]:
+        """
+        Hors mode `all`, un seul résultat : celui qui vient en premier dans l'ordre fixe
+        (un détecteur à état l'emporte s'il précède, ex: Brute Force sur HTTP Scanner)
+        """
+        found = stateless + stateful
+        if not found:
+            return []
+        if self.mode == "all":
+            found = sorted(found, key=lambda h: self.priority[h[2]])
+        else:
+            found = [min(found, key=lambda h: self.priority[h[2]])]
+        return [(a_type, details) for a_type, details, _ in found]
+
+    def _evaluate(self, detect, record, timed: bool):
+        stats = self.stats_by_detector[detect]
+        stats.calls += 1
+        if timed:
+            t0 = time.perf_counter_ns()
+            found, details, a_type = detect(record)
+            elapsed = time.perf_counter_ns() - t0
+            if metrics.enabled:
+                metrics.observe(self.stage_names[detect], elapsed / 1e9)
+        else:
+            found, details, a_type = detect(record)
+            elapsed = None
+        if found:
+            stats.hits += 1
+        return found, details, a_type, elapsed
+
+    def _run_first(self, order: list, record) -> list:
+        timed = metrics.enabled
+        for detect in order:
+            if detect in STATEFUL:
+                continue
+            found, details, a_type, _ = self._evaluate(detect, record, timed)
+            if found:
+                return [(a_type, details, detect)]
+        return []
+
+    def _run_all(self, detectors: list, record, sampled: bool) -> list:
+        """Tous les `detectors` dans l'ordre fixe : [(type, détails, détecteur), ...]"""
+        # Précalcul partagé : champs et texte normalisé du LogRecord, calculés une fois
+        record.normalized
+        timed = sampled or metrics.enabled
+        hits = []
+        for detect in detectors:
+            found, details, a_type, elapsed = self._evaluate(detect, record, timed)
+            if found:
+                hits.append((a_type, details, detect))
+            if sampled:
+                stats = self.stats_by_detector[detect]
+                stats.sampled += 1
+                stats.sampled_hits += bool(found)
+                # Moyenne glissante : suit les changements de trafic
+                stats.cost_ns = elapsed if stats.sampled == 1 else stats.cost_ns * 0.9 + elapsed * 0.1
+        return hits
+
+    def reorder(self):
+        """Trie les détecteurs par coût attendu par détection (les non mesurés gardent leur rang)"""
+        measured = [d for d in self.detectors if self.stats_by_detector[d].sampled]
+        if not measured:
+            return
+        ranked = sorted(measured, key=lambda d: self.stats_by_detector[d].rank_score)
+        ranked += [d for d in self.detectors if d not in ranked]
+        if ranked != self.order:
+            self.order = ranked
+            self.reorders += 1
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "lines": self.lines,
+            "reorders": self.reorders,
+            "order": [self.stats_by_detector[d].name for d in self.order],
+            "detectors": {
+                s.name: {"calls": s.calls, "hits": s.hits, "sampled": s.sampled,
+                         "hit_rate": round(s.hit_rate, 4), "cost_us": round(s.cost_ns / 1e3, 2),
+                         "rank_score": round(s.rank_score / 1e3, 2)}
+                for s in self.stats_by_detector.values()
+            },
+        }
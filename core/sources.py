@@ -0,0 +1,255 @@
+import os
+import glob
+import time
+import queue
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import settings
+from core.tailer import LogTailer, CHUNK_SIZE
+from core.metrics import metrics
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FORMATS = ("unified", "clf")
+
+
+def resolve_path(path: str) -> str:
+    """Chemin absolu, relatif au dossier du projet si nécessaire"""
+    if not os.path.isabs(path):
+        path = os.path.join(BASE_DIR, path)
+    return os.path.abspath(path)
+
+
+def parse_source_specs(spec: str) -> List[dict]:
+    """
+    Parse LOG_SOURCES : sources séparées par ';', champs par ','
+    `nom,glob,encrypted|plain,unified|clf`  ex: "web,/var/log/web*/access.log,plain,clf"
+    """
+    specs = []
+    for entry in spec.split(";"):
+        fields = [f.strip() for f in entry.split(",")]
+        if not fields or not fields[0]:
+            continue
+        name, pattern = fields[0], fields[1] if len(fields) > 1 else fields[0]
+        mode = fields[2].lower() if len(fields) > 2 and fields[2] else "encrypted"
+        fmt = fields[3].lower() if len(fields) > 3 and fields[3] else "unified"
+        if fmt not in FORMATS:
+            raise ValueError(f"Format inconnu pour la source {name}: {fmt}")
+        specs.append({"name": name, "pattern": pattern, "encrypted": mode != "plain", "fmt": fmt})
+    return specs
+
+
+class Batch:
+    """Lot de lignes lues sur un fichier, avec le point de reprise correspondant"""
+    __slots__ = ("source", "lines", "checkpoint", "read_at", "queued_at", "items", "results")
+
+    def __init__(self, source, lines, checkpoint):
+        self.source = source
+        self.lines = lines          # Lignes décodées (None si déchiffrement impossible)
+        self.checkpoint = checkpoint
+        self.read_at = time.time()
+        self.queued_at = self.read_at   # Entrée dans la file de l'étape courante
+        self.items = None           # Étape détection -> enrichissement
+        self.results = None         # Étape enrichissement -> persistance
+
+
+class SourceMetrics:
+    """Compteurs et débit (moyenne glissante exponentielle) d'une source"""
+
+    def __init__(self):
+        self.lines = 0
+        self.bytes = 0
+        self.alerts = 0
+        self.errors = 0
+        self.lines_per_sec = 0.0
+        self.last_batch = None
+        self._lock = threading.Lock()
+
+    def record_batch(self, lines: int, size: int):
+        now = time.monotonic()
+        with self._lock:
+            if self.last_batch is not None:
+                elapsed = max(now - self.last_batch, 1e-3)
+                self.lines_per_sec = 0.8 * self.lines_per_sec + 0.2 * (lines / elapsed)
+            self.last_batch = now
+            self.lines += lines
+            self.bytes += size
+
+    def as_dict(self) -> dict:
+        return {
+            "lines": self.lines, "bytes": self.bytes, "alerts": self.alerts,
+            "errors": self.errors, "lines_per_sec": round(self.lines_per_sec, 1)
+        }
+
+
+class LogSource:
+    """Un fichier suivi : son tailer, son décodeur, son point de reprise et ses métriques"""
+
+    def __init__(self, name: str, path: str, encrypted: bool = True, fmt: str = "unified"):
+        self.name = name
+        self.path = resolve_path(path)
+        self.encrypted = encrypted
+        self.fmt = fmt
+        self.metrics = SourceMetrics()
+        self.tailer: Optional[LogTailer] = None
+        self.thread: Optional[threading.Thread] = None
+        # Dernier point de reprise persisté et heure de lecture des lots en attente
+        self.processed: Optional[dict] = None
+        self._in_flight: deque = deque()
+
+    @property
+    def checkpoint_key(self) -> str:
+        return self.path
+
+    def batch_done(self, batch: "Batch", persisted: bool = True):
+        """Appelé par l'étape de détection après chaque lot (les lots sont traités dans l'ordre)"""
+        if self._in_flight:
+            self._in_flight.popleft()
+        if persisted:
+            self.processed = batch.checkpoint
+
+    def lag(self) -> Tuple[int, float]:
+        """
+        Retard d'ingestion : octets entre le dernier point persisté et la fin du fichier,
+        et âge (secondes) du plus ancien lot lu mais pas encore persisté
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return 0, 0.0
+        if self.processed is None or self.processed["inode"] != st.st_ino:
+            # Rien de persisté pour ce fichier (nouveau fichier ou rotation) : tout reste à lire
+            behind = st.st_size
+        else:
+            behind = max(0, st.st_size - self.processed["offset"])
+        pending = self._in_flight[0] if self._in_flight else None
+        return behind, (time.time() - pending) if pending is not None else 0.0
+
+    def decode(self, raw: bytes) -> Optional[str]:
+        """Déchiffre ou décode une ligne brute ; None si l'enregistrement est illisible"""
+        if self.encrypted:
+            from utils.dechiffrer import dechiffrer_donnees
+            return dechiffrer_donnees(raw) or None
+        return raw.decode("utf-8", errors="ignore")
+
+    def run(self, out: "queue.Queue", db, stop: threading.Event, notify=None):
+        """Boucle du thread de lecture : tail -> décodage -> file partagée"""
+        prefix = f"[{self.name}] "
+        checkpoint = db.get_checkpoint(self.checkpoint_key)
+        self.processed = checkpoint
+        self.tailer = LogTailer.from_checkpoint(
+            self.path, checkpoint,
+            notify=(lambda msg: notify(prefix + msg)) if notify else None
+        )
+        try:
+            for raw_lines in self.tailer.follow(stop, max_bytes=CHUNK_SIZE):
+                size = sum(len(l) + 1 for l in raw_lines)
+                if metrics.enabled:
+                    lines = self._decode_timed(raw_lines)
+                else:
+                    lines = [self.decode(l) if l.strip() else "" for l in raw_lines]
+                self.metrics.record_batch(len(raw_lines), size)
+                batch = Batch(self, lines, self.tailer.checkpoint(self.checkpoint_key, raw_lines[-1]))
+                self._in_flight.append(batch.read_at)
+                # File bornée : si la détection prend du retard, la lecture attend
+                while not stop.is_set():
+                    try:
+                        out.put(batch, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+        finally:
+            self.tailer.close()
+
+
+    def _decode_timed(self, raw_lines: List[bytes]) -> List[Optional[str]]:
+        clock = time.perf_counter
+        lines = []
+        for raw in raw_lines:
+            if not raw.strip():
+                lines.append("")
+                continue
+            t0 = clock()
+            lines.append(self.decode(raw))
+            metrics.observe("decrypt" if self.encrypted else "decode", clock() - t0)
+        return lines
+
+
+class SourceRegistry:
+    """
+    Registre des sources de logs : chaque motif glob est réévalué périodiquement,
+    chaque fichier trouvé est suivi par son propre thread, et tous les lots
+    alimentent une file unique consommée par l'étape de détection
+    """
+
+    def __init__(self, db, specs: List[dict] = None, queue_size: int = 64,
+                 discovery_interval: float = None, notify=None):
+        self.db = db
+        self.specs = specs if specs is not None else parse_source_specs(settings.LOG_SOURCES)
+        self.queue: "queue.Queue[Batch]" = queue.Queue(maxsize=queue_size)
+        self.discovery_interval = settings.DISCOVERY_INTERVAL if discovery_interval is None else discovery_interval
+        self.notify = notify
+        self.sources: Dict[str, LogSource] = {}
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._discovery_thread = None
+
+    def register(self, name: str, pattern: str, encrypted: bool = True, fmt: str = "unified"):
+        self.specs.append({"name": name, "pattern": pattern, "encrypted": encrypted, "fmt": fmt})
+        if self._discovery_thread:
+            self.discover()
+
+    def discover(self) -> List[LogSource]:
+        """Démarre le suivi des nouveaux fichiers correspondant aux motifs"""
+        started = []
+        for spec in self.specs:
+            pattern = resolve_path(spec["pattern"])
+            magic = glob.has_magic(pattern)
+            paths = glob.glob(pattern) if magic else [pattern]
+            # Partie fixe du motif, pour nommer chaque fichier de façon unique
+            static_dir = os.path.dirname(pattern[:min(pattern.find(c) for c in "*?[" if c in pattern)]) if magic else None
+            for path in sorted(paths):
+                with self._lock:
+                    if path in self.sources:
+                        continue
+                    name = f"{spec['name']}:{os.path.relpath(path, static_dir)}" if magic else spec["name"]
+                    source = LogSource(name, path, spec["encrypted"], spec["fmt"])
+                    self.sources[path] = source
+                source.thread = threading.Thread(
+                    target=source.run, args=(self.queue, self.db, self._stop, self.notify),
+                    name=f"source-{name}", daemon=True
+                )
+                source.thread.start()
+                started.append(source)
+                if self.notify:
+                    self.notify(f"[SYSTEM] Surveillance: {path} ({'chiffré' if source.encrypted else 'clair'}, {source.fmt})")
+        return started
+
+    def start(self):
+        self._stop.clear()
+        self.discover()
+        self._discovery_thread = threading.Thread(target=self._discovery_loop, daemon=True)
+        self._discovery_thread.start()
+
+    def stop(self):
+        self._stop.set()
+        for source in list(self.sources.values()):
+            if source.thread:
+                source.thread.join(timeout=2)
+
+    def _discovery_loop(self):
+        while not self._stop.wait(self.discovery_interval):
+            try:
+                self.discover()
+            except Exception as e:
+                print(f"[Sources] Erreur découverte: {e}")
+
+    def stats(self) -> Dict[str, dict]:
+        stats = {}
+        for source in list(self.sources.values()):
+            data = stats[source.name] = source.metrics.as_dict()
+            data["lag_bytes"], lag_seconds = source.lag()
+            data["lag_sec"] = round(lag_seconds, 3)
+        return stats
@@ -0,0 +1,281 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import hashlib
+from typing import Callable, List, Optional
+
+from config.settings import settings
+from core.metrics import metrics
+
+# Constantes inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct("iIII")
+_WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+               | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+CHUNK_SIZE = 1 << 20   # Lecture par blocs de 1 Mo
+
+
+def line_hash(line: bytes) -> str:
+    """Empreinte d'une ligne brute (sans '\\n'), utilisée pour valider un point de reprise"""
+    return hashlib.blake2b(line, digest_size=16).hexdigest()
+
+
+def _last_line_before(fd: int, offset: int, window: int = 64 * 1024) -> Optional[bytes]:
+    """Retourne la ligne qui se termine juste avant `offset` (le '\\n' à offset-1 exclu)"""
+    start = max(0, offset - window)
+    os.lseek(fd, start, os.SEEK_SET)
+    data = os.read(fd, offset - start)
+    if not data.endswith(b"\n"):
+        return None
+    data = data[:-1]
+    nl = data.rfind(b"\n")
+    if nl < 0 and start > 0:
+        return None
+    return data[nl + 1:]
+
+
+class _Inotify:
+    """Surveillance d'un dossier via inotify (Linux uniquement, via ctypes)"""
+
+    def __init__(self, directory: str, filename: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        # On surveille le dossier (et non le fichier) pour suivre les renommages et recréations
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, "inotify_add_watch")
+        self.filename = os.fsencode(filename)
+
+    def wait(self, timeout: float) -> bool:
+        """Attend un événement concernant le fichier suivi. Retourne True si un événement est arrivé"""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if not ready:
+                return False
+            if self._drain():
+                return True
+
+    def _drain(self) -> bool:
+        relevant = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return relevant
+                raise
+            if not data:
+                return relevant
+            pos = 0
+            while pos < len(data):
+                _wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, pos)
+                pos += _EVENT_HEADER.size
+                name = data[pos:pos + length].rstrip(b"\0")
+                pos += length
+                # Événements sur le dossier lui-même (name vide) ou sur notre fichier
+                if not name or name == self.filename:
+                    relevant = True
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class LogTailer:
+    """
+    Suivi d'un fichier de logs en continu (équivalent de `tail -F`).
+    - Réveil immédiat via inotify, sinon repli sur un polling périodique
+    - Suivi par inode : les rotations par renommage et les recréations sont détectées,
+      l'ancien fichier est lu jusqu'au bout avant de passer au nouveau
+    - Troncature détectée (taille < position) : relecture depuis le début
+    - Lecture par gros blocs, seules les lignes complètes sont retournées
+    """
+
+    def __init__(self, path: str, offset: int = 0, inode: int = None, last_hash: str = None,
+                 chunk_size: int = CHUNK_SIZE, poll_interval: float = None,
+                 use_inotify: bool = True, notify: Callable[[str], None] = None):
+        self.path = os.path.abspath(path)
+        self.chunk_size = chunk_size
+        self.poll_interval = settings.SLEEP_INTERVAL if poll_interval is None else poll_interval
+        self.notify = notify or (lambda msg: None)
+
+        self._fd = None
+        self.inode = None
+        self.offset = 0          # Octets lus dans le fichier courant
+        self._partial = b""      # Fin de ligne incomplète en attente
+        self._resume = (inode, offset, last_hash)
+
+        self._watcher = None
+        if use_inotify and sys.platform.startswith("linux"):
+            try:
+                self._watcher = _Inotify(os.path.dirname(self.path), os.path.basename(self.path))
+            except (OSError, AttributeError) as e:
+                print(f"[Tailer] inotify indisponible ({e}), polling toutes les {self.poll_interval}s")
+
+    @classmethod
+    def from_checkpoint(cls, path: str, checkpoint: Optional[dict], **kwargs) -> "LogTailer":
+        """Crée un tailer qui reprend au point enregistré par Database (ou au début si None)"""
+        if not checkpoint:
+            return cls(path, **kwargs)
+        return cls(path, offset=checkpoint["offset"], inode=checkpoint["inode"],
+                   last_hash=checkpoint["line_hash"], **kwargs)
+
+    def checkpoint(self, source: str, last_line: Optional[bytes]) -> dict:
+        """Point de reprise correspondant à `position` (à persister avec les alertes du lot)"""
+        return {
+            "source": source,
+            "inode": self.inode,
+            "offset": self.position,
+            "line_hash": line_hash(last_line) if last_line is not None and self.position else None,
+        }
+
+    @property
+    def mode(self) -> str:
+        return "inotify" if self._watcher else "polling"
+
+    @property
+    def position(self) -> int:
+        """Offset de la fin de la dernière ligne complète retournée"""
+        return self.offset - len(self._partial)
+
+    # ------------------------------------------------------------------
+    def _open(self) -> bool:
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return False
+        self._fd = fd
+        self.inode = os.fstat(fd).st_ino
+        self._partial = b""
+        self.offset = 0
+
+        # Reprise éventuelle : même inode, et la dernière ligne traitée doit être intacte
+        inode, offset, expected = self._resume
+        self._resume = (None, 0, None)
+        if offset:
+            if self._can_resume(fd, inode, offset, expected):
+                os.lseek(fd, offset, os.SEEK_SET)
+                self.offset = offset
+                self.notify(f"[SYSTEM] Reprise à l'offset {offset}")
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                self.notify("[SYSTEM] Point de reprise invalide (fichier remplacé), lecture depuis le début")
+        return True
+
+    def _can_resume(self, fd: int, inode: int, offset: int, expected: Optional[str]) -> bool:
+        if inode is not None and inode != self.inode:
+            return False
+        if offset > os.fstat(fd).st_size:
+            return False
+        if expected is None:
+            return True
+        last = _last_line_before(fd, offset)
+        return last is not None and line_hash(last) == expected
+
+    def _close_fd(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _path_inode(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return None
+
+    def read_lines(self, max_bytes: int = None) -> List[bytes]:
+        """
+        Lecture non bloquante : retourne les lignes complètes disponibles (sans '\\n').
+        max_bytes limite le volume lu en un appel (None = jusqu'à EOF).
+        """
+        if self._fd is None and not self._open():
+            return []
+
+        # Troncature : le fichier est plus petit que ce qu'on a déjà lu
+        if os.fstat(self._fd).st_size < self.offset:
+            self.notify("[SYSTEM] Fichier réinitialisé, relecture...")
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            self.offset = 0
+            self._partial = b""
+
+        lines = []
+        budget = max_bytes
+        while budget is None or budget > 0:
+            size = self.chunk_size if budget is None else min(self.chunk_size, budget)
+            data = os.read(self._fd, size)
+            if not data:
+                break
+            self.offset += len(data)
+            if budget is not None:
+                budget -= len(data)
+            chunk = self._partial + data
+            parts = chunk.split(b"\n")
+            self._partial = parts.pop()
+            lines.extend(parts)
+        else:
+            return lines
+
+        # EOF atteint sur le descripteur courant : le chemin pointe-t-il encore vers le même fichier ?
+        current = self._path_inode()
+        if current is not None and current != self.inode:
+            if self._partial:
+                lines.append(self._partial)
+                self._partial = b""
+            self.notify("[SYSTEM] Rotation détectée, suivi du nouveau fichier")
+            self._close_fd()
+            if self._open():
+                lines.extend(self.read_lines(max_bytes))
+        return lines
+
+    def wait(self, timeout: float = None):
+        """Bloque jusqu'à une modification du fichier (inotify) ou l'expiration du délai de polling"""
+        timeout = self.poll_interval if timeout is None else timeout
+        if self._watcher:
+            self._watcher.wait(timeout)
+        else:
+            time.sleep(timeout)
+
+    def follow(self, stop_event=None, max_bytes: int = None):
+        """Générateur de lots de lignes ; s'arrête quand stop_event est positionné"""
+        while stop_event is None or not stop_event.is_set():
+            t0 = time.perf_counter()
+            lines = self.read_lines(max_bytes)
+            if lines:
+                if metrics.enabled:
+                    metrics.observe("read", time.perf_counter() - t0)
+                yield lines
+            else:
+                # Avec inotify, un délai long suffit : on est réveillé dès qu'une écriture arrive
+                self.wait(1.0 if self._watcher else None)
+
+    def close(self):
+        self._close_fd()
+        if self._watcher:
+            self._watcher.close()
+            self._watcher = None
@@ -0,0 +1,147 @@
+import time
+import heapq
+from collections import deque
+from typing import Hashable, Iterable, List, Optional, Tuple
+
+
+class SpaceSaving:
+    """
+    Éléments les plus fréquents d'un flux en mémoire bornée (algorithme Space-Saving).
+    Au plus `capacity` compteurs : un nouvel élément remplace celui de plus petit compte
+    et en hérite (+1). Le compte estimé d'un élément surestime le vrai d'au plus
+    son `error`, lui-même ≤ total / capacity ; tout élément plus fréquent que ce seuil est suivi.
+    Les compteurs sont rangés par valeur (comme un cache LFU) : add() est en O(1).
+    Pas de verrou : à n'utiliser que depuis un seul thread
+    """
+
+    def __init__(self, capacity: int = 200):
+        self.capacity = max(1, capacity)
+        self.counts = {}    # élément -> compte estimé
+        self.errors = {}    # élément -> surestimation possible
+        self.buckets = {}   # compte -> {élément: None} (ordre d'arrivée dans le compte)
+        self.min_count = 0
+        self.total = 0
+
+    def __len__(self):
+        return len(self.counts)
+
+    def _move(self, item, old: int, new: int):
+        bucket = self.buckets[old]
+        del bucket[item]
+        if not bucket:
+            del self.buckets[old]
+            if self.min_count == old:
+                self.min_count = new
+        self.counts[item] = new
+        self.buckets.setdefault(new, {})[item] = None
+
+    def add(self, item: Hashable):
+        self.total += 1
+        count = self.counts.get(item)
+        if count is not None:
+            self._move(item, count, count + 1)
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[item] = 1
+            self.errors[item] = 0
+            self.buckets.setdefault(1, {})[item] = None
+            self.min_count = 1
+            return
+        # Remplace le plus ancien des éléments de plus petit compte
+        floor = self.min_count
+        victim = next(iter(self.buckets[floor]))
+        del self.counts[victim], self.errors[victim]
+        self.counts[item] = floor
+        self.errors[item] = floor
+        self.buckets[floor][item] = None
+        del self.buckets[floor][victim]
+        self._move(item, floor, floor + 1)
+
+    def top(self, k: int) -> List[Tuple[Hashable, int]]:
+        """Les k éléments de plus grand compte estimé, du plus fréquent au moins fréquent"""
+        return heapq.nlargest(k, self.counts.items(), key=lambda kv: kv[1])
+
+    def update(self, pairs: Iterable[Tuple[Hashable, int]]):
+        """
+        Ajoute des comptes déjà agrégés (ex. lus en base) : les comptes sont additionnés,
+        puis seuls les `capacity` plus grands sont gardés. O(n log n), pour un chargement ponctuel
+        """
+        merged = dict(self.counts)
+        errors = dict(self.errors)
+        for item, count in pairs:
+            if count > 0:
+                merged[item] = merged.get(item, 0) + count
+                self.total += count
+        kept = heapq.nlargest(self.capacity, merged.items(), key=lambda kv: kv[1])
+        self.counts = dict(kept)
+        self.errors = {item: errors.get(item, 0) for item in self.counts}
+        self.buckets = {}
+        for item, count in sorted(kept, key=lambda kv: kv[1]):
+            self.buckets.setdefault(count, {})[item] = None
+        self.min_count = kept[-1][1] if kept else 0
+
+    def clear(self):
+        self.counts.clear()
+        self.errors.clear()
+        self.buckets.clear()
+        self.min_count = 0
+        self.total = 0
+
+
+class WindowedTopK:
+    """
+    Top-k sur une fenêtre glissante (ex. 15 dernières minutes) : un SpaceSaving par tranche
+    de `slot_s` secondes, les tranches sorties de la fenêtre sont abandonnées.
+    top() additionne les comptes des tranches encore dans la fenêtre
+    """
+
+    def __init__(self, window_s: float = 900, slot_s: float = 60, capacity: int = 200):
+        self.window_s = window_s
+        self.slot_s = slot_s
+        self.capacity = capacity
+        self.slots: deque = deque()   # (début de tranche, SpaceSaving)
+
+    def _expire(self, now: float):
+        while self.slots and self.slots[0][0] <= now - self.window_s:
+            self.slots.popleft()
+
+    def _current(self, now: Optional[float]) -> SpaceSaving:
+        now = time.time() if now is None else now
+        start = now - now % self.slot_s
+        if not self.slots or self.slots[-1][0] < start:
+            self.slots.append((start, SpaceSaving(self.capacity)))
+            self._expire(now)
+        return self.slots[-1][1]
+
+    def add(self, item: Hashable, now: Optional[float] = None):
+        self._current(now).add(item)
+
+    def update(self, pairs: Iterable[Tuple[Hashable, int]], now: Optional[float] = None):
+        """
+        Comptes agrégés (ex. lus en base) rangés dans la tranche de l'instant `now` (défaut : maintenant),
+        créée à sa place si des tranches plus récentes existent déjà (historique reçu après le direct)
+        """
+        now = time.time() if now is None else now
+        start = now - now % self.slot_s
+        index = len(self.slots)
+        while index and self.slots[index - 1][0] > start:
+            index -= 1
+        if index and self.slots[index - 1][0] == start:
+            sketch = self.slots[index - 1][1]
+        else:
+            sketch = SpaceSaving(self.capacity)
+            self.slots.insert(index, (start, sketch))
+        sketch.update(pairs)
+
+    def top(self, k: int, now: Optional[float] = None) -> List[Tuple[Hashable, int]]:
+        self._expire(time.time() if now is None else now)
+        if len(self.slots) == 1:
+            return self.slots[0][1].top(k)
+        merged = {}
+        for _, sketch in self.slots:
+            for item, count in sketch.counts.items():
+                merged[item] = merged.get(item, 0) + count
+        return heapq.nlargest(k, merged.items(), key=lambda kv: kv[1])
+
+    def clear(self):
+        self.slots.clear()
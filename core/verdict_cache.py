@@ -0,0 +1,95 @@
+import re
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from typing import Optional
+
+# Partie variable d'une même requête rejouée : préfixe "[HH:MM:SS] " et durée finale (format unifié)
+CLOCK_PREFIX_RE = re.compile(r"^\[\d{2}:\d{2}:\d{2}\]\s+")
+DURATION_RE = re.compile(r"\s\d+ms\s*$")
+
+
+def verdict_key(record) -> bytes:
+    """
+    Empreinte de la partie "requête" d'une ligne analysée : la ligne sans horodatage,
+    IP source ni durée. Deux copies d'une requête de scanner ont la même empreinte
+    (les détecteurs sans état n'examinent pas ces champs ; le score ML, qui en dépend, n'est pas caché).
+    Une ligne non reconnue n'est regroupée qu'avec ses copies exactes
+    """
+    text = str(record)
+    if record.parsed:
+        if record.fmt == "unified":
+            text = DURATION_RE.sub("", CLOCK_PREFIX_RE.sub("", text, count=1), count=1)
+        if record.event_time:
+            text = text.replace(record.event_time, "", 1)
+        if record.ip:
+            text = text.replace(record.ip, "", 1)
+        text = f"{record.fmt}\x00{text}"
+    return hashlib.blake2b(text.encode("utf-8", errors="surrogatepass"), digest_size=16).digest()
+
+
+class Verdict:
+    """Résultats réutilisables d'une requête : détecteurs sans état (None = pas encore calculés)"""
+    __slots__ = ("mode", "hits")
+
+    def __init__(self, mode: str, hits: Optional[list] = None):
+        self.mode = mode
+        self.hits = hits
+
+
+class VerdictCache:
+    """
+    Cache LRU borné des verdicts, indexé par verdict_key().
+    Les détecteurs à état (brute force), le score ML et la réputation IP n'y sont jamais stockés :
+    ils restent évalués sur chaque ligne
+    """
+
+    def __init__(self, capacity: int = 50000):
+        self.capacity = capacity
+        self.entries: "OrderedDict[bytes, Verdict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Travail évité grâce au cache : évaluations des détecteurs sans état
+        self.saved: Counter = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def get(self, key: bytes, mode: str) -> Optional[Verdict]:
+        """Verdict en cache pour ce mode d'ordonnancement, sinon None (compté comme un échec)"""
+        with self._lock:
+            verdict = self.entries.get(key)
+            if verdict is None or verdict.mode != mode:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return verdict
+
+    def put(self, key: bytes, verdict: Verdict):
+        with self._lock:
+            self.entries[key] = verdict
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """À appeler quand les verdicts ne sont plus valides (détecteurs modifiés...)"""
+        with self._lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "capacity": self.capacity,
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "saved": dict(self.saved),
+        }
@@ -3,48 +3,31 @@
 import sys
 import os
 import time
-import threading
 from datetime import datetime
 
 from PySide6 import QtCore, QtWidgets, QtGui
-from PySide6.QtCore import Signal, Slot, Qt
+from PySide6.QtCore import Slot, Qt
 from PySide6.QtWidgets import QScrollArea
 
 from config.settings import settings
 from core.alert_manager import AlertManager
+from core.engine import SIEMEngine
+from gui.alert_table import AlertTableModel, AlertFilterProxy
+from gui.threat_map import ThreatMap
+from gui.coalescer import GuiCoalescer
+from gui.history import HistoryLoader
+from core.topk import SpaceSaving, WindowedTopK
 
 # Import attack generator
 from attacks_generator import AttackGenerator
-
-# Detecteurs
-from detectors.sqli import detect as detect_sqli
-from detectors.xss import detect as detect_xss
-
-from detectors.bruteforce import detect as detect_bruteforce
-from detectors.csrf import detect as detect_csrf
-from detectors.file_upload import detect as detect_file_upload
-from detectors.os_injection import detect as detect_os_injection
-from detectors.traversal import detect as detect_traversal
-from detectors.nosql import detect as detect_nosql
-from detectors.crlf import detect as detect_crlf
-from detectors.HTTP import detect as detect_http
-from detectors.ip import detect_ip_reputation
+from utils.rechiffrer import Rechiffreur
 
 # ML Anomaly Detector
-from ml.anomaly_detector import AnomalyDetector
+from ml.streaming import create_detector
 
 from PySide6.QtWebEngineWidgets import QWebEngineView
-import folium
-import io
-from geo_finder import get_ip_info
 from PySide6.QtCharts import QChart, QChartView, QPieSeries, QPieSlice
 
-DETECTORS = [
-    detect_sqli, detect_xss, detect_bruteforce, detect_csrf, 
-    detect_file_upload, detect_os_injection, detect_crlf, 
-    detect_http, detect_traversal, detect_nosql, detect_ip_reputation
-]
-
 
 # =====================================================================
 #   MODERN DARK THEME STYLESHEET
@@ -353,16 +336,6 @@ QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
 """
 
 
-# =====================================================================
-#   Signals
-# =====================================================================
-class AlertSignals(QtCore.QObject):
-    new_alert = Signal(dict)
-    stats_changed = Signal(dict)
-    log_message = Signal(str)
-    refresh_map = Signal()
-
-
 # =====================================================================
 #   MODERN SIEM WINDOW
 # =====================================================================
@@ -377,7 +350,8 @@ class ModernSIEM(QtWidgets.QMainWindow):
         self.setStyleSheet(DARK_STYLESHEET)
 
         self.alert_manager = AlertManager()
-        self.signals = AlertSignals()
+        # Mises à jour des threads de travail, appliquées par lots à chaque tick du timer GUI
+        self.updates = GuiCoalescer(settings.GUI_TICK_MS, settings.GUI_LOG_LINES)
 
         self.stats = {
             "SQL Injection": 0,
@@ -395,27 +369,45 @@ class ModernSIEM(QtWidgets.QMainWindow):
             "Total": 0
         }
         
-        self.country_counts = {}
-        self.ip_counts = {}
+        # Top pays / IP en mémoire bornée : depuis le démarrage et sur la fenêtre récente
+        self.top_countries = SpaceSaving(settings.TOPK_CAPACITY)
+        self.top_ips = SpaceSaving(settings.TOPK_CAPACITY)
+        self.recent_countries = WindowedTopK(settings.TOPK_WINDOW_S, capacity=settings.TOPK_CAPACITY)
+        self.recent_ips = WindowedTopK(settings.TOPK_WINDOW_S, capacity=settings.TOPK_CAPACITY)
+        self.shown_countries = None   # Dernier top affiché : pas de redessin s'il n'a pas changé
+        self.shown_ips = None
+        self.ip_count_labels = []
 
         # ML Detector avec chemin absolu
         base_dir = os.path.dirname(os.path.abspath(__file__))
         model_path = os.path.join(base_dir, 'ml', 'anomaly_model.pkl')
-        self.ml_detector = AnomalyDetector(model_path=model_path)
-        self.ml_scores = []  # Store recent ML scores for average
+        self.ml_detector = create_detector(model_path=model_path, background=True)
 
-        self.all_alerts = []
-        self.alert_coords = [] # Liste des coordonnées pour la map
+        # Table des alertes : modèle borné (historique lu en base à la demande) + filtre par type
+        self.alert_model = AlertTableModel(self.alert_manager.db, capacity=settings.GUI_TABLE_ROWS)
+        self.alert_proxy = AlertFilterProxy()
+        self.alert_proxy.setSourceModel(self.alert_model)
 
         self.build_ui()
 
-        self.signals.new_alert.connect(self.add_alert_to_table)
-        self.signals.stats_changed.connect(self.update_stats_cards)
-        self.signals.log_message.connect(self.append_log)
-        self.signals.refresh_map.connect(self.update_map)
+        self.updates.alerts.connect(self.add_alerts)
+        self.updates.logs.connect(self.append_logs)
+        self.top_timer = QtCore.QTimer(self)
+        self.top_timer.timeout.connect(self.refresh_top_lists)
+        self.top_timer.start(10000)
+
+        # Compteurs, tops et carte complétés par l'historique en base (lu en arrière-plan)
+        self.history = HistoryLoader(self.alert_manager.db, settings.GUI_HISTORY_DAYS,
+                                     settings.TOPK_WINDOW_S, settings.TOPK_CAPACITY)
+        self.history.loaded.connect(self.apply_history)
+        self.history.start()
         
         self.attack_generator = AttackGenerator(sleep_interval=2)
 
+        # Rechiffrement des segments archivés avec la clé courante (tâche de fond)
+        self.rechiffreur = Rechiffreur()
+        self.rechiffreur.start()
+
         self.start_watcher()
 
     # -----------------------------------------------------------
@@ -491,8 +483,21 @@ class ModernSIEM(QtWidgets.QMainWindow):
         self.filter_box.addItems(["Toutes", "SQL Injection", "XSS", "Brute Force", "ML Anomaly", "Malicious IP", "CSRF", "File Upload", "OS Injection", "CRLF", "HTTP Scanner"])
         self.filter_box.currentTextChanged.connect(self.apply_filter)
         control_layout.addWidget(self.filter_box)
+
+        self.period_box = QtWidgets.QComboBox()
+        days = settings.GUI_HISTORY_DAYS
+        period = "Depuis le démarrage" if days <= 0 else "Aujourd'hui" if days == 1 else f"{days} derniers jours"
+        self.period_box.addItems([period, f"{settings.TOPK_WINDOW_S // 60} dernières min"])
+        self.period_box.currentIndexChanged.connect(self.refresh_top_lists)
+        control_layout.addWidget(self.period_box)
         
         control_layout.addStretch()
+
+        self.retrain_btn = QtWidgets.QPushButton("Ré-entraîner le modèle")
+        self.retrain_btn.setCursor(Qt.PointingHandCursor)
+        self.retrain_btn.setToolTip("Entraîne un nouveau modèle ML en arrière-plan et le met en service s'il est validé")
+        self.retrain_btn.clicked.connect(self.request_retrain)
+        control_layout.addWidget(self.retrain_btn)
         
         self.generator_status_label = QtWidgets.QLabel("Arrêté")
         self.generator_status_label.setObjectName("StatusStopped")
@@ -563,8 +568,8 @@ class ModernSIEM(QtWidgets.QMainWindow):
         alerts_header.setObjectName("SectionLabel")
         layout.addWidget(alerts_header)
 
-        self.table = QtWidgets.QTableWidget(0, 6)
-        self.table.setHorizontalHeaderLabels(["Timestamp", "Type", "Score ML", "Pays", "Ville", "Pattern"])
+        self.table = QtWidgets.QTableView()
+        self.table.setModel(self.alert_proxy)
         self.table.horizontalHeader().setStretchLastSection(True)
         self.table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.ResizeToContents)
         self.table.horizontalHeader().setSectionResizeMode(1, QtWidgets.QHeaderView.ResizeToContents)
@@ -575,6 +580,7 @@ class ModernSIEM(QtWidgets.QMainWindow):
         self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
         self.table.setShowGrid(False)
         self.table.verticalHeader().setVisible(False)
+        self.table.verticalHeader().setDefaultSectionSize(28)
         self.table.setMinimumHeight(300)
         layout.addWidget(self.table)
 
@@ -586,7 +592,8 @@ class ModernSIEM(QtWidgets.QMainWindow):
         self.web_view = QWebEngineView()
         self.web_view.setMinimumHeight(400)
         layout.addWidget(self.web_view)
-        self.update_map() # Initial map
+        # Carte chargée une seule fois ; les alertes y sont agrégées par cellule et envoyées par lots
+        self.threat_map = ThreatMap(self.web_view, settings.MAP_CELL_DEG, settings.MAP_REFRESH_MS)
 
         # ============ LIVE LOG VIEW =============
         log_header = QtWidgets.QLabel("Logs")
@@ -598,6 +605,8 @@ class ModernSIEM(QtWidgets.QMainWindow):
         self.log_view.setMinimumHeight(120)
         self.log_view.setMaximumHeight(150)
         self.log_view.setPlaceholderText("En attente...")
+        # Les plus anciennes lignes sont retirées au-delà de GUI_LOG_LINES
+        self.log_view.setMaximumBlockCount(settings.GUI_LOG_LINES)
         layout.addWidget(self.log_view)
 
         # Add some bottom spacing
@@ -672,37 +681,84 @@ class ModernSIEM(QtWidgets.QMainWindow):
     # -----------------------------------------------------------
     #   TABLE ALERT
     # -----------------------------------------------------------
+    @Slot(list)
+    def add_alerts(self, alerts):
+        """Lot d'alertes du tick : compteurs, table et carte mis à jour, puis un seul rafraîchissement"""
+        now = time.time()
+        for alert in alerts:
+            if alert["type"] in self.stats: self.stats[alert["type"]] += 1
+            else: self.stats["Others"] += 1
+            self.stats["Total"] += 1
+
+            self.threat_map.add_point(alert.get("coords"))
+
+            # Update Country stats
+            country = alert.get("country", "Unknown")
+            self.top_countries.add(country)
+            self.recent_countries.add(country, now)
+
+            # Update IP stats
+            ip_addr = alert.get("ip", "127.0.0.1")
+            if ip_addr != "127.0.0.1":
+                self.top_ips.add(ip_addr)
+                self.recent_ips.add(ip_addr, now)
+
+        # Insertion du lot en tête du modèle (rien n'est reconstruit)
+        self.alert_model.add_alerts(alerts)
+        self.update_stats_cards(self.stats)
+        self.refresh_top_lists()
+
     @Slot(dict)
-    def add_alert_to_table(self, alert):
-        self.all_alerts.append(alert)
-        
-        # Update Country stats
-        country = alert.get("country", "Unknown")
-        self.country_counts[country] = self.country_counts.get(country, 0) + 1
-        self.update_country_chart()
-
-        # Update IP stats
-        parts = alert["line"].split()
-        ip_addr = parts[1] if len(parts) > 1 else "127.0.0.1"
-        
-        if ip_addr != "127.0.0.1":
-            self.ip_counts[ip_addr] = self.ip_counts.get(ip_addr, 0) + 1
-            self.update_ip_list()
+    def apply_history(self, history):
+        """Agrégats de l'historique (HistoryLoader) ajoutés aux compteurs du direct"""
+        for attack_type, count in history["stats"].items():
+            if attack_type in self.stats: self.stats[attack_type] += count
+            else: self.stats["Others"] += count
+            self.stats["Total"] += count
+
+        local = lambda pairs: [(ip, n) for ip, n in pairs if ip != "127.0.0.1"]
+        self.top_countries.update(history["countries"])
+        self.top_ips.update(local(history["ips"]))
+        # Chaque minute de la fenêtre récente dans sa tranche : elle en sort à son heure, pas 15 min après le chargement
+        for minute, pairs in history["recent_countries"]:
+            self.recent_countries.update(pairs, minute)
+        for minute, pairs in history["recent_ips"]:
+            self.recent_ips.update(local(pairs), minute)
+        for coords, count in history["geo"]:
+            self.threat_map.add_point(coords, count)
+
+        self.update_stats_cards(self.stats)
+        self.refresh_top_lists()
+        self.append_logs([f"[SYSTEM] Historique chargé: {sum(history['stats'].values())} alertes"])
 
-        self.apply_filter()
-        # Scroll to last row (newest alert)
-        if self.table.rowCount() > 0:
-            self.table.scrollToBottom()
+    @Slot()
+    def refresh_top_lists(self):
+        """Redessine le camembert et la liste d'IP seulement si leur top a changé"""
+        if self.period_box.currentIndex() == 0:
+            countries, ips = self.top_countries.top(5), self.top_ips.top(10)
+        else:
+            countries, ips = self.recent_countries.top(5), self.recent_ips.top(10)
+        if countries != self.shown_countries:
+            self.update_country_chart(countries)
+        if ips != self.shown_ips:
+            self.update_ip_list(ips)
+
+    def update_country_chart(self, top_countries):
+        same_order = self.shown_countries is not None and \
+            [c for c, _ in top_countries] == [c for c, _ in self.shown_countries]
+        self.shown_countries = top_countries
+        if same_order:
+            # Mêmes pays dans le même ordre : seules les valeurs des parts changent
+            for slice, (country, count) in zip(self.pie_series.slices(), top_countries):
+                slice.setValue(count)
+                slice.setLabel(f"{country} ({count})")
+            return
 
-    def update_country_chart(self):
         self.pie_series.clear()
         self.pie_series.setPieSize(0.65) # Laisse de la place pour les labels externes
-        # Sort and take top 5
-        sorted_countries = sorted(self.country_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-        
         colors = ["#ef4444", "#3b82f6", "#10b981", "#f59e0b", "#8b5cf6"]
         
-        for i, (country, count) in enumerate(sorted_countries):
+        for i, (country, count) in enumerate(top_countries):
             slice = self.pie_series.append(f"{country} ({count})", count)
             if i < len(colors):
                 slice.setBrush(QtGui.QColor(colors[i]))
@@ -710,12 +766,19 @@ class ModernSIEM(QtWidgets.QMainWindow):
             slice.setLabelPosition(QPieSlice.LabelOutside)
             slice.setLabelColor(QtGui.QColor("#f1f5f9"))
 
-    def update_ip_list(self):
+    def update_ip_list(self, top_ips):
+        same_order = self.shown_ips is not None and [ip for ip, _ in top_ips] == [ip for ip, _ in self.shown_ips]
+        self.shown_ips = top_ips
+        if same_order:
+            # Mêmes IP dans le même ordre : seuls les compteurs sont réécrits
+            for label, (ip, count) in zip(self.ip_count_labels, top_ips):
+                label.setText(f"{count} attaques")
+            return
+
         self.ip_list_widget.clear()
-        # Sort and take top 10
-        sorted_ips = sorted(self.ip_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+        self.ip_count_labels = []
 
-        for ip, count in sorted_ips:
+        for ip, count in top_ips:
             item = QtWidgets.QListWidgetItem()
             item.setSizeHint(QtCore.QSize(0, 45))  # Fixe la hauteur pour éviter l'écrasement
             self.ip_list_widget.addItem(item)
@@ -730,6 +793,7 @@ class ModernSIEM(QtWidgets.QMainWindow):
             
             count_label = QtWidgets.QLabel(f"{count} attaques")
             count_label.setStyleSheet("color: #94a3b8; font-size: 12px; font-weight: 600;")
+            self.ip_count_labels.append(count_label)
             
             badge = QtWidgets.QLabel("DANGER")
             badge.setStyleSheet("""
@@ -750,116 +814,16 @@ class ModernSIEM(QtWidgets.QMainWindow):
             self.ip_list_widget.setItemWidget(item, widget)
 
     def apply_filter(self):
-        selected = self.filter_box.currentText()
-        self.table.setRowCount(0)
-
-        for a in self.all_alerts:
-            if selected != "Toutes" and a["type"] != selected:
-                continue
-
-            row = self.table.rowCount()
-            self.table.insertRow(row)
-
-            ts_item = QtWidgets.QTableWidgetItem(a["timestamp"])
-            ts_item.setForeground(QtGui.QColor("#9ca3af"))
-            self.table.setItem(row, 0, ts_item)
-            
-            type_item = QtWidgets.QTableWidgetItem(a["type"])
-            if a["type"] == "SQL Injection":
-                type_item.setForeground(QtGui.QColor("#ef4444"))
-            elif a["type"] == "XSS":
-                type_item.setForeground(QtGui.QColor("#f59e0b"))
-            elif a["type"] == "Brute Force":
-                type_item.setForeground(QtGui.QColor("#3b82f6"))
-            elif a["type"] == "ML Anomaly":
-                type_item.setForeground(QtGui.QColor("#8b5cf6"))
-            elif a["type"] == "Malicious IP":
-                type_item.setForeground(QtGui.QColor("#ec4899"))
-            elif a["type"] in ["CSRF Attack", "Cross-Site Request Forgery"]:
-                type_item.setForeground(QtGui.QColor("#10b981")) # Vert émeraude
-            elif a["type"] == "Path Traversal":
-                type_item.setForeground(QtGui.QColor("#8b5cf6")) # Violet
-            elif a["type"] == "NoSQL Injection":
-                type_item.setForeground(QtGui.QColor("#fbbf24")) # Ambre
-            elif a["type"] == "CRLF Injection":
-                type_item.setForeground(QtGui.QColor("#6366f1")) # Indigo
-            elif a["type"] == "HTTP Scanner":
-                type_item.setForeground(QtGui.QColor("#14b8a6")) # Teal
-            else:
-                type_item.setForeground(QtGui.QColor("#6b7280"))
-            self.table.setItem(row, 1, type_item)
-            
-            # Score ML avec couleur
-            ml_score = a.get("ml_score", 0)
-            score_text = f"{int(ml_score * 100)}%"
-            score_item = QtWidgets.QTableWidgetItem(score_text)
-            if ml_score >= 0.7:
-                score_item.setForeground(QtGui.QColor("#ef4444"))  # Rouge
-            elif ml_score >= 0.4:
-                score_item.setForeground(QtGui.QColor("#f59e0b"))  # Orange
-            else:
-                score_item.setForeground(QtGui.QColor("#22c55e"))  # Vert
-            self.table.setItem(row, 2, score_item)
-            
-            # Pays
-            country = a.get("country", "-")
-            country_item = QtWidgets.QTableWidgetItem(country)
-            country_item.setForeground(QtGui.QColor("#e5e7eb"))
-            self.table.setItem(row, 3, country_item)
-            
-            # Ville
-            city = a.get("city", "-")
-            if city == "Unknown": city = "-"
-            city_item = QtWidgets.QTableWidgetItem(city)
-            city_item.setForeground(QtGui.QColor("#9ca3af"))
-            self.table.setItem(row, 4, city_item)
-            
-            pattern_item = QtWidgets.QTableWidgetItem(a["pattern"])
-            pattern_item.setForeground(QtGui.QColor("#fbbf24"))
-            self.table.setItem(row, 5, pattern_item)
-
-    # -----------------------------------------------------------
-    #   MAP UPDATE
-    # -----------------------------------------------------------
-    @Slot()
-    def update_map(self):
-        """Met à jour la carte avec les marqueurs d'alertes."""
-        try:
-            m = folium.Map(
-                location=[20, 0], 
-                zoom_start=2, 
-                tiles="CartoDB dark_matter",
-                no_wrap=True,
-                min_zoom=2
-            )
-            
-            for coord in self.alert_coords:
-                if coord != [0, 0]:
-                    folium.CircleMarker(
-                        location=coord,
-                        radius=6,
-                        color="#ef4444",
-                        weight=2,
-                        fill=True,
-                        fill_color="#ef4444",
-                        fill_opacity=0.7
-                    ).add_to(m)
-
-            data = io.BytesIO()
-            m.save(data, close_file=False)
-            html_content = data.getvalue().decode()
-            self.web_view.setHtml(html_content)
-            # print(f\"[MAP] Mise à jour effectuée avec {len(self.alert_coords)} marqueurs\")
-        except Exception as e:
-            print(f"[MAP ERROR] {e}")
+        self.alert_proxy.set_type_filter(self.filter_box.currentText())
 
     # -----------------------------------------------------------
     #   LOG APPEND
     # -----------------------------------------------------------
-    @Slot(str)
-    def append_log(self, text):
+    @Slot(list)
+    def append_logs(self, lines):
+        # Un seul ajout (et un seul défilement) par tick, quel que soit le nombre de lignes
         timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_view.appendPlainText(f"[{timestamp}] {text}")
+        self.log_view.appendPlainText("\n".join(f"[{timestamp}] {text}" for text in lines))
         scrollbar = self.log_view.verticalScrollBar()
         scrollbar.setValue(scrollbar.maximum())
 
@@ -867,137 +831,23 @@ class ModernSIEM(QtWidgets.QMainWindow):
     #   WATCH LOG FILE
     # -----------------------------------------------------------
     def start_watcher(self):
-        thread = threading.Thread(target=self.watcher_loop, daemon=True)
-        thread.start()
+        # Moteur d'ingestion multi-sources (settings.LOG_SOURCES), détection dans son propre thread
+        self.engine = SIEMEngine(
+            alert_manager=self.alert_manager,
+            ml_detector=self.ml_detector,
+            on_log=self.updates.post_log,
+            on_alert=self.updates.post_alert
+        )
+        self.engine.start()
+
+    def request_retrain(self):
+        # Progression et résultat (probation, adoption, retour arrière) dans le panneau de logs
+        if self.engine.retrain is None:
+            self.updates.post_log("[SYSTEM] Pas de ré-entraînement avec ML_MODEL=hst : le modèle s'adapte en continu")
+            return
+        self.engine.retrain.request()
+        self.updates.post_log("[SYSTEM] Ré-entraînement du modèle ML demandé")
 
-    def watcher_loop(self):
-        # Chemin absolu pour le fichier chiffré
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        log_path = settings.CHIFFRED_PATH or "chiffred.enc"
-        
-        # Si le chemin n'est pas absolu, le rendre relatif au dossier du projet
-        if not os.path.isabs(log_path):
-            log_path = os.path.join(base_dir, log_path)
-        
-        last_pos = 0
-        last_size = 0
-        
-        self.signals.log_message.emit(f"[SYSTEM] Surveillance: {log_path}")
-
-        while True:
-            try:
-                if not os.path.exists(log_path):
-                    time.sleep(1)
-                    continue
-                
-                # Vérifier si le fichier a changé
-                current_size = os.path.getsize(log_path)
-                
-                # Si le fichier a été tronqué/réinitialisé, recommencer du début
-                if current_size < last_size:
-                    last_pos = 0
-                    self.signals.log_message.emit("[SYSTEM] Fichier réinitialisé, relecture...")
-                
-                last_size = current_size
-
-                with open(log_path, "rb") as f:
-                    f.seek(last_pos)
-                    for line in f:
-                        if not line.strip(): 
-                            continue
-                        
-                        # Importer ici pour éviter les problèmes de cache
-                        from utils.dechiffrer import dechiffrer_donnees
-                        
-                        try:
-                            log_line = dechiffrer_donnees(line)
-                            
-                            if not log_line:
-                                # Log brut si déchiffrement échoue
-                                self.signals.log_message.emit(f"[CRYPTO] Echec déchiffrement")
-                                continue
-                            
-                            stripped = log_line.strip()
-                            
-                            # Calculer le score ML pour ce log
-                            ml_score = 0.0
-                            ml_is_anomaly = False
-                            if self.ml_detector.is_trained:
-                                ml_is_anomaly, ml_score = self.ml_detector.predict(log_line)
-                            
-                            # Afficher le log déchiffré + Score ML
-                            ml_text = f" [ML:{ml_score:.2f}]"
-                            self.signals.log_message.emit(stripped + ml_text)
-                            # Extraction de l'IP (TIMESTAMP IP METHOD ...)
-                            parts = stripped.split()
-                            ip_addr = parts[1] if len(parts) > 1 else "127.0.0.1"
-
-                            # Geolocation (une seule fois par ligne)
-                            geo_info = get_ip_info(ip_addr)
-                            city_str = f" ({geo_info['city']})" if geo_info['city'] != "Unknown" else ""
-
-                            # Analyse avec les détecteurs
-                            attack_found = False
-                            attack_type = ""
-                            pattern = ""
-                            
-                            for detect in DETECTORS:
-                                # Optimisation: On ne vérifie l'IP via l'API que si le trafic semble 
-                                # un minimum suspect (ou si c'est un détecteur local gratuit)
-                                if detect == detect_ip_reputation:
-                                    if not ml_is_anomaly and ml_score < 0.02:
-                                        continue  # Skip AbuseIPDB pour le trafic extrêmement propre
-                                
-                                found, details, a_type = detect(log_line)
-                                if found:
-                                    attack_found = True
-                                    attack_type = a_type
-                                    pattern = str(details[0]) if details else "Pattern inconnu"
-                                    break
-                            
-                            # Si attaque détectée ou anomalie ML (> 0.50)
-                            if attack_found or (ml_is_anomaly and ml_score > 0.50):
-                                alert = {
-                                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                                    "type": attack_type if attack_found else "ML Anomaly",
-                                    "pattern": pattern if attack_found else f"Score: {ml_score:.2f}",
-                                    "line": stripped,
-                                    "ml_score": ml_score,
-                                    "country": geo_info["country"],
-                                    "city": geo_info["city"]
-                                }
-                                
-                                if attack_found:
-                                    self.alert_manager.log_alert(attack_type, pattern, log_line)
-                                    if attack_type in self.stats: self.stats[attack_type] += 1
-                                    else: self.stats["Others"] += 1
-                                else:
-                                    self.alert_manager.log_alert("ML Anomaly", f"score:{ml_score:.2f}", log_line)
-                                    self.stats["ML Anomaly"] += 1
-                                    
-                                self.stats["Total"] += 1
-                                
-                                # Mise à jour coordonnées pour la carte
-                                if geo_info["coords"] != [0, 0]:
-                                    self.alert_coords.append(geo_info["coords"])
-                                    self.signals.refresh_map.emit()
-                                
-                                self.signals.new_alert.emit(alert)
-                                self.signals.stats_changed.emit(self.stats)
-                                
-                                # print(f\"[GEO] Alerte: {alert['type']} depuis {geo_info['country']}{city_str} ({ip_addr}) bloquée\")
-                                    
-                        except Exception as e:
-                            print(f"[Watcher] Erreur déchiffrement: {e}")
-
-                    last_pos = f.tell()
-
-                time.sleep(settings.SLEEP_INTERVAL)
-
-            except Exception as e:
-                print(f"[Watcher] Erreur globale: {e}")
-                time.sleep(1)
-    
     # -----------------------------------------------------------
     #   ATTACK GENERATOR CONTROLS
     # -----------------------------------------------------------
@@ -1008,7 +858,7 @@ class ModernSIEM(QtWidgets.QMainWindow):
         self.generator_status_label.setStyle(self.generator_status_label.style())
         self.start_generator_btn.setEnabled(False)
         self.stop_generator_btn.setEnabled(True)
-        self.signals.log_message.emit("[SYSTEM] Générateur démarré")
+        self.updates.post_log("[SYSTEM] Générateur démarré")
     
     def stop_attack_generator(self):
         self.attack_generator.stop()
@@ -1017,11 +867,15 @@ class ModernSIEM(QtWidgets.QMainWindow):
         self.generator_status_label.setStyle(self.generator_status_label.style())
         self.start_generator_btn.setEnabled(True)
         self.stop_generator_btn.setEnabled(False)
-        self.signals.log_message.emit("[SYSTEM] Générateur arrêté")
+        self.updates.post_log("[SYSTEM] Générateur arrêté")
     
     def closeEvent(self, event):
         if self.attack_generator.is_running():
             self.attack_generator.stop()
+        self.threat_map.stop()
+        self.updates.stop()
+        self.engine.stop()
+        self.rechiffreur.stop()
         
         # Fermer proprement le reader de geo_finder
         from geo_finder import close_reader
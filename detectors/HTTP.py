@@ -1,4 +1,4 @@
-from utils.normalize import normalize
+from utils.log_parser import as_record
 import re
 
 class HTTPDetector:
@@ -29,13 +29,13 @@ class HTTPDetector:
         ]
 
     def detect(self, log_line):
-        text = normalize(log_line)
+        record = as_record(log_line)
+        text = record.normalized
         matches = []
         
-        # Check for suspicious methods
-        for method in self.suspicious_methods:
-            if re.search(rf"\b{method}\b", text, re.IGNORECASE):
-                matches.append(f"suspicious_method:{method}")
+        # Check for suspicious methods (méthode de la requête analysée)
+        if record.method in self.suspicious_methods:
+            matches.append(f"suspicious_method:{record.method}")
         
         # Check for scanner signatures
         for sig in self.scanner_signatures:
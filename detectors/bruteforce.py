@@ -1,7 +1,7 @@
 import time
-import re
 from datetime import datetime
 from config.settings import settings
+from utils.log_parser import as_record
 
 failed_logins = {}
 
@@ -11,15 +11,17 @@ TIME_WINDOW = 10
 
 def detect(line):
 
-    ip = extract_ip(line)
-    method, url = parse_log_line(line)
+    record = as_record(line)
+    ip = record.ip or "unknown"
+    method, url = record.method, record.target
 
     if not method or not url:
         return False, None, None
 
 
     if "/login" in url.lower():
-        now = time.time()
+        # Heure de l'événement si disponible (indispensable en rejeu d'archives)
+        now = record.epoch or time.time()
 
         if ip not in failed_logins:
             failed_logins[ip] = []
@@ -35,10 +37,11 @@ def detect(line):
             pattern = f"more_than_{MAX_ATTEMPTS}_requests_in_{TIME_WINDOW}s_from_{ip}"
             return True, pattern, "Brute Force"
 
-    if "404" in line:
+    # Code de statut analysé (et non "500" n'importe où, ex: une durée de 500ms)
+    if record.status == 404:
         return True, "404_error", "HTTP Error"
 
-    if "500" in line:
+    if record.status == 500:
         return True, "500_error", "HTTP Error"
 
     return False, None, None
@@ -46,16 +49,10 @@ def detect(line):
 
 
 def extract_ip(line):
-    match = re.search(r"-\s*([0-9a-fA-F\:\.]+)\s*-\s*", line)
-    if match:
-        return match.group(1)
-    return "unknown"
+    return as_record(line).ip or "unknown"
 
 
 
 def parse_log_line(line):
-    match = re.search(r'\b(GET|POST|PUT|DELETE|PATCH|OPTIONS|HEAD)\b\s+([^\s]+)', line)
-    if match:
-        method, url = match.groups()
-        return method, url
-    return None, None
+    record = as_record(line)
+    return record.method, record.target
@@ -1,5 +1,5 @@
 
-from utils.normalize import normalize
+from utils.log_parser import as_record
 import re
 from config.settings import settings
 
@@ -33,7 +33,7 @@ PATTERNS = [
 ]
 
 def detect(line):
-    text = normalize(line)
+    text = as_record(line).normalized
     matches = []
     
     for p in PATTERNS:
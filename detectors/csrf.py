@@ -1,15 +1,15 @@
-from utils.normalize import normalize
+from utils.log_parser import as_record
 import re
 
 def detect(log_line):
-    line = normalize(log_line)
+    record = as_record(log_line)
+    line = record.normalized
     sensitive_methods = ["post", "put", "delete"]
     matches = []
 
-    method_match = re.search(r'(?:"?)(post|put|delete)(?:"?)\s+([^\s]+)', line)
-    if method_match:
-        method = method_match.group(1).lower()
-        endpoint = method_match.group(2)
+    method = (record.method or "").lower()
+    if method in sensitive_methods:
+        endpoint = record.path
 
         if "csrf_token=missing" in line or "csrf=absent" in line:
             matches.append(f"missing_token:{method}:{endpoint}")
@@ -1,5 +1,5 @@
 import re
-from utils.normalize import normalize
+from utils.log_parser import as_record
 
 # --- ENDPOINTS typiques d’upload ---
 Upload_Endpoints = [
@@ -35,7 +35,7 @@ Filename_re = re.compile(r'filename="([^"]+)"', re.IGNORECASE)
 
 def detect(line: str):
 
-    text = normalize(line)
+    text = as_record(line).normalized
     matches = []
     
     for e in Upload_Endpoints:
@@ -1,7 +1,6 @@
-import requests
-import re
 import time
 from config.settings import settings
+from utils.log_parser import as_record
 
 # Configuration
 API_KEY = settings.API_KEY
@@ -20,12 +19,10 @@ def detect_ip_reputation(log_line: str):
     if not API_KEY:
         return False, None, None
 
-    # 1. Extraire l'IP (recherche du format standard IPv4)
-    ip_match = re.search(r'(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})', log_line)
-    if not ip_match:
+    # 1. IP source de la ligne analysée
+    ip_address = as_record(log_line).ip
+    if not ip_address:
         return False, None, None
-    
-    ip_address = ip_match.group(1)
 
     # 2. Vérifier le cache
     now = time.time()
@@ -47,6 +44,7 @@ def detect_ip_reputation(log_line: str):
             "Accept": "application/json"
         }
         
+        import requests  # Importé au premier appel API (inutile sans clé AbuseIPDB)
         response = requests.get(URL, headers=headers, params=params, timeout=5)
         if response.status_code == 200:
             data = response.json()
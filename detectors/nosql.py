@@ -1,6 +1,6 @@
 
 import re
-from utils.normalize import normalize
+from utils.log_parser import as_record
 
 PATTERNS = [
     r'\$gt\b', r'\$ne\b', r'\$where\b', r'\$regex\b', r'\$in\b', r'\$nin\b',
@@ -8,7 +8,7 @@ PATTERNS = [
 ]
 
 def detect(line):
-    text = normalize(line)
+    text = as_record(line).normalized
     matches = []
     
     for p in PATTERNS:
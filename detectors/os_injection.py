@@ -1,6 +1,6 @@
 
 import re
-from utils.normalize import normalize
+from utils.log_parser import as_record
 from config.settings import settings
 
 
@@ -37,7 +37,7 @@ PATTERNS = [
 
     
 def detect(line):
-    text = normalize(line)
+    text = as_record(line).normalized
     matches = []
     
     for p in PATTERNS:
@@ -1,6 +1,6 @@
 
 import re
-from utils.normalize import normalize
+from utils.log_parser import as_record
 
 PATTERNS = [
     r'\.\./', r'\.\.\\', r'/etc/passwd', r'/etc/shadow', r'/etc/group',
@@ -9,7 +9,7 @@ PATTERNS = [
 ]
 
 def detect(line):
-    text = normalize(line)
+    text = as_record(line).normalized
     matches = []
     
     for p in PATTERNS:
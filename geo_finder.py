@@ -1,4 +1,3 @@
-import geoip2.database
 import os
 import random
 
@@ -13,6 +12,7 @@ def get_reader():
     global _READER
     if _READER is None and os.path.exists(CITY_DB_PATH):
         try:
+            import geoip2.database  # Importé à la première recherche (démarrage plus rapide)
             _READER = geoip2.database.Reader(CITY_DB_PATH)
         except Exception as e:
             print(f"[!] Erreur ouverture City DB: {e}")
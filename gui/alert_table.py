@@ -0,0 +1,195 @@
+from collections import deque
+from typing import Optional
+
+from PySide6 import QtCore, QtGui
+from PySide6.QtCore import Qt
+
+COLUMNS = ["Timestamp", "Type", "Score ML", "Pays", "Ville", "Pattern"]
+# Lignes chargées depuis la base à chaque fetchMore (défilement vers le bas)
+PAGE_SIZE = 200
+
+TYPE_COLORS = {
+    "SQL Injection": "#ef4444",
+    "XSS": "#f59e0b",
+    "Brute Force": "#3b82f6",
+    "ML Anomaly": "#8b5cf6",
+    "Malicious IP": "#ec4899",
+    "CSRF Attack": "#10b981",                  # Vert émeraude
+    "Cross-Site Request Forgery": "#10b981",
+    "Path Traversal": "#8b5cf6",               # Violet
+    "NoSQL Injection": "#fbbf24",              # Ambre
+    "CRLF Injection": "#6366f1",               # Indigo
+    "HTTP Scanner": "#14b8a6",                 # Teal
+}
+COLUMN_COLORS = {0: "#9ca3af", 3: "#e5e7eb", 4: "#9ca3af", 5: "#fbbf24"}
+
+# Entrées du filtre du dashboard qui regroupent plusieurs types d'alerte
+FILTER_TYPES = {
+    "CSRF": {"CSRF Attack", "CSRF (Missing Referer)", "Cross-Site Request Forgery"},
+    "File Upload": {"FILE_UPLOAD"},
+    "OS Injection": {"OS Command Injection"},
+    "CRLF": {"CRLF Injection"},
+}
+
+
+def alert_from_row(row: dict) -> dict:
+    """Ligne de la table `alerts` -> dict d'alerte au format du moteur (on_alert)"""
+    return {
+        "id": row["id"],
+        "timestamp": row["timestamp"],
+        "type": row["attack_type"],
+        "pattern": row["pattern"] or "",
+        "ip": row["source_ip"],
+        "ml_score": row["ml_score"] or 0.0,
+        "country": row["country"] or "Unknown",
+        "city": row["city"] or "Unknown",
+    }
+
+
+class AlertTableModel(QtCore.QAbstractTableModel):
+    """
+    Alertes du dashboard, les plus récentes en haut.
+    Les alertes en direct sont insérées ligne par ligne ; au plus `capacity` lignes sont
+    gardées en mémoire (les plus anciennes sortent en bas). Les alertes antérieures sont
+    lues dans la base par pages de PAGE_SIZE quand la vue défile jusqu'en bas (fetchMore).
+    """
+
+    def __init__(self, db=None, capacity: int = 5000, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.capacity = max(1, capacity)
+        self.rows: deque = deque()
+        # Plus petit id chargé : les pages suivantes sont lues en dessous
+        self.oldest_id: Optional[int] = None
+        self.exhausted = db is None
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        alert = self.rows[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            return self._text(alert, column)
+        if role == Qt.ForegroundRole:
+            return QtGui.QColor(self._color(alert, column))
+        if role == Qt.UserRole:
+            return alert
+        return None
+
+    @staticmethod
+    def _text(alert: dict, column: int) -> str:
+        if column == 0:
+            return alert.get("timestamp", "")
+        if column == 1:
+            return alert.get("type", "")
+        if column == 2:
+            return f"{int((alert.get('ml_score') or 0) * 100)}%"
+        if column == 3:
+            return alert.get("country", "-")
+        if column == 4:
+            city = alert.get("city", "-")
+            return "-" if city == "Unknown" else city
+        return str(alert.get("pattern", ""))
+
+    @staticmethod
+    def _color(alert: dict, column: int) -> str:
+        if column == 1:
+            return TYPE_COLORS.get(alert.get("type"), "#6b7280")
+        if column == 2:
+            ml_score = alert.get("ml_score") or 0
+            if ml_score >= 0.7:
+                return "#ef4444"  # Rouge
+            if ml_score >= 0.4:
+                return "#f59e0b"  # Orange
+            return "#22c55e"      # Vert
+        return COLUMN_COLORS[column]
+
+    # ==================== DIRECT ====================
+
+    def add_alert(self, alert: dict):
+        """Nouvelle alerte en tête ; au-delà de la capacité, la plus ancienne est retirée"""
+        self.add_alerts([alert])
+
+    def add_alerts(self, alerts: list):
+        """Lot d'alertes (ordre d'arrivée) inséré en une seule fois, la plus récente en tête"""
+        if not alerts:
+            return
+        # Au-delà de la capacité, les plus anciennes du lot ne seraient jamais affichées
+        alerts = alerts[-self.capacity:]
+        self.beginInsertRows(QtCore.QModelIndex(), 0, len(alerts) - 1)
+        self.rows.extendleft(alerts)
+        self.endInsertRows()
+        if self.oldest_id is None:
+            self.oldest_id = next((a["id"] for a in alerts if a.get("id") is not None), None)
+        if len(self.rows) > self.capacity:
+            self._evict(len(self.rows) - self.capacity)
+
+    def _evict(self, count: int):
+        last = len(self.rows) - 1
+        self.beginRemoveRows(QtCore.QModelIndex(), last - count + 1, last)
+        for _ in range(count):
+            self.rows.pop()
+        self.endRemoveRows()
+        # Les lignes retirées restent en base : la prochaine page repart de la dernière ligne gardée
+        self.oldest_id = next((a["id"] for a in reversed(self.rows) if a.get("id") is not None), None)
+        self.exhausted = self.db is None
+
+    # ==================== HISTORIQUE ====================
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        return not parent.isValid() and not self.exhausted and len(self.rows) < self.capacity
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        if parent.isValid() or self.exhausted:
+            return
+        limit = min(PAGE_SIZE, self.capacity - len(self.rows))
+        try:
+            older = self.db.get_alerts_before(self.oldest_id, limit)
+        except Exception as e:
+            print(f"[Dashboard] Erreur lecture historique: {e}")
+            self.exhausted = True
+            return
+        if len(older) < limit:
+            self.exhausted = True
+        if not older:
+            return
+        first = len(self.rows)
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(older) - 1)
+        self.rows.extend(alert_from_row(row) for row in older)
+        self.endInsertRows()
+        self.oldest_id = older[-1]["id"]
+
+
+class AlertFilterProxy(QtCore.QSortFilterProxyModel):
+    """Filtre par type d'alerte (entrée du menu du dashboard) sans reconstruire le modèle"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.types: Optional[set] = None
+
+    def set_type_filter(self, label: str):
+        """'Toutes' = pas de filtre ; sinon le type exact, ou le groupe de FILTER_TYPES"""
+        types = None if label == "Toutes" else FILTER_TYPES.get(label, {label})
+        if hasattr(self, "beginFilterChange"):  # Qt >= 6.9 (invalidateFilter y est dépréciée)
+            self.beginFilterChange()
+            self.types = types
+            self.endFilterChange()
+        else:
+            self.types = types
+            self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if self.types is None:
+            return True
+        return self.sourceModel().rows[source_row].get("type") in self.types
@@ -0,0 +1,69 @@
+from collections import deque
+
+from PySide6 import QtCore
+from PySide6.QtCore import Signal, Slot
+
+# Fréquence de rafraîchissement du dashboard (10 Hz)
+TICK_MS = 100
+
+
+class GuiCoalescer(QtCore.QObject):
+    """
+    Regroupe les mises à jour envoyées par les threads de travail vers le dashboard.
+    post_log() / post_alert() ne font qu'un append sur une deque (atomique sous le GIL,
+    sans verrou ni signal Qt) ; un QTimer du thread GUI vide les tampons à chaque tick
+    et émet un seul signal par lot.
+    Le tampon de logs est borné à `log_lines` : au-delà, seules les lignes les plus
+    récentes sont affichées (les plus anciennes n'auraient été visibles qu'un instant).
+    Les alertes ne sont jamais abandonnées (table, compteurs et carte doivent rester justes).
+    """
+    logs = Signal(list)
+    alerts = Signal(list)
+
+    def __init__(self, interval_ms: int = TICK_MS, log_lines: int = 1000, parent=None):
+        super().__init__(parent)
+        self.log_buffer = deque(maxlen=max(1, log_lines))
+        self.alert_buffer = deque()
+        self.dropped_logs = 0
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.drain)
+        self.timer.start()
+
+    # ==================== THREADS DE TRAVAIL ====================
+
+    def post_log(self, text: str):
+        if len(self.log_buffer) == self.log_buffer.maxlen:
+            self.dropped_logs += 1   # Approximatif entre threads : sert seulement à l'affichage
+        self.log_buffer.append(text)
+
+    def post_alert(self, alert: dict):
+        self.alert_buffer.append(alert)
+
+    # ==================== THREAD GUI ====================
+
+    @staticmethod
+    def _take(buffer: deque) -> list:
+        # popleft jusqu'à vider : sûr même si un thread ajoute pendant la lecture
+        batch = []
+        try:
+            while True:
+                batch.append(buffer.popleft())
+        except IndexError:
+            return batch
+
+    @Slot()
+    def drain(self):
+        alerts = self._take(self.alert_buffer)
+        if alerts:
+            self.alerts.emit(alerts)
+        lines = self._take(self.log_buffer)
+        if self.dropped_logs:
+            dropped, self.dropped_logs = self.dropped_logs, 0
+            lines.insert(0, f"[SYSTEM] {dropped} lignes non affichées (débit trop élevé)")
+        if lines:
+            self.logs.emit(lines)
+
+    def stop(self):
+        self.timer.stop()
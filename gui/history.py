@@ -0,0 +1,75 @@
+import threading
+from datetime import datetime, timedelta
+
+from PySide6 import QtCore
+from PySide6.QtCore import Signal
+
+
+def _by_minute(rows) -> list:
+    """[(début de la minute en secondes epoch, [(valeur, nombre), ...]), ...] depuis Database.get_minute_counts"""
+    minutes = {}
+    for minute, value, count in rows:
+        minutes.setdefault(minute, []).append((value, count))
+    return [(datetime.strptime(minute, "%Y-%m-%d %H:%M").timestamp(), pairs) for minute, pairs in minutes.items()]
+
+
+def load_history(db, max_id: int, days: int, window_s: int, limit: int) -> dict:
+    """
+    Agrégats des alertes déjà en base, pour l'état initial du dashboard :
+    compteurs par type (`days` derniers jours, aujourd'hui compris), top pays / IP
+    sur la même période, comptes par minute de la fenêtre récente (chaque minute
+    rangée dans sa tranche du top-k glissant), points de la carte.
+    Seules les alertes d'id ≤ max_id sont comptées : les suivantes arrivent en direct
+    """
+    now = datetime.now()
+    since_date = (now - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    recent = (now - timedelta(seconds=window_s)).strftime("%Y-%m-%d %H:%M:%S")
+
+    # Table agrégée, moins les alertes déjà enregistrées par ce démarrage (elles seront reçues en direct)
+    stats = db.get_daily_stats(since_date)
+    for attack_type, count in db.count_alerts_by_type(since=since_date, after_id=max_id).items():
+        stats[attack_type] = stats.get(attack_type, 0) - count
+
+    return {
+        "stats": {t: n for t, n in stats.items() if n > 0},
+        "countries": db.get_top_countries(limit, since_date, max_id),
+        "ips": db.get_top_attackers(limit, since_date, max_id),
+        "recent_countries": _by_minute(db.get_minute_counts("country", recent, max_id)),
+        "recent_ips": _by_minute(db.get_minute_counts("ip", recent, max_id)),
+        "geo": [((row["latitude"], row["longitude"]), row["count"])
+                for row in db.get_geo_data(since_date, max_id)],
+    }
+
+
+class HistoryLoader(QtCore.QObject):
+    """
+    Lecture de l'historique dans un thread à part : la fenêtre s'affiche tout de suite,
+    `loaded` est reçu par le thread GUI quand les agrégats sont prêts.
+    L'id de la dernière alerte est lu avant le démarrage du moteur (start() est appelé avant),
+    ce qui sépare sans recouvrement l'historique des alertes reçues en direct
+    """
+    loaded = Signal(dict)
+
+    def __init__(self, db, days: int, window_s: int, limit: int, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.days = days
+        self.window_s = window_s
+        self.limit = limit
+
+    def start(self):
+        if self.days <= 0:
+            return
+        try:
+            max_id = self.db.get_max_alert_id()
+        except Exception as e:
+            print(f"[Dashboard] Erreur lecture historique: {e}")
+            return
+        if max_id:
+            threading.Thread(target=self._run, args=(max_id,), daemon=True).start()
+
+    def _run(self, max_id: int):
+        try:
+            self.loaded.emit(load_history(self.db, max_id, self.days, self.window_s, self.limit))
+        except Exception as e:
+            print(f"[Dashboard] Erreur lecture historique: {e}")
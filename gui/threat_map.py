@@ -0,0 +1,163 @@
+import json
+import math
+from typing import Dict, List, Tuple
+
+from PySide6 import QtCore
+from PySide6.QtCore import Signal, Slot
+from PySide6.QtWebChannel import QWebChannel
+
+# Cellules d'agrégation de CELL_DEG degrés : au plus (180 / CELL_DEG) x (360 / CELL_DEG) marqueurs,
+# quel que soit le nombre d'alertes
+CELL_DEG = 2.0
+# Intervalle d'envoi des cellules modifiées à la page (les alertes entre deux envois sont regroupées)
+FLUSH_MS = 1000
+
+# Côté page : un marqueur par cellule, créé ou mis à jour à chaque envoi du pont QWebChannel
+MAP_JS = """
+new QWebChannel(qt.webChannelTransport, function (channel) {
+    var bridge = channel.objects.bridge;
+    var markers = {};
+    bridge.cells.connect(function (payload) {
+        JSON.parse(payload).forEach(function (cell) {
+            var radius = Math.min(4 + 3 * Math.log2(1 + cell.count), 30);
+            var label = cell.count + (cell.count > 1 ? " alertes" : " alerte");
+            var marker = markers[cell.id];
+            if (marker) {
+                marker.setLatLng([cell.lat, cell.lon]);
+                marker.setRadius(radius);
+                marker.setTooltipContent(label);
+            } else {
+                markers[cell.id] = L.circleMarker([cell.lat, cell.lon], {
+                    radius: radius, color: "#ef4444", weight: 2,
+                    fill: true, fillColor: "#ef4444", fillOpacity: 0.7
+                }).bindTooltip(label).addTo(%(map)s);
+            }
+        });
+    });
+    bridge.ready();
+});
+"""
+
+
+class GridAggregator:
+    """Points agrégés par cellule (nombre, centre de gravité) ; suit les cellules modifiées"""
+
+    def __init__(self, cell_deg: float = CELL_DEG):
+        self.cell_deg = cell_deg
+        self.cells: Dict[Tuple[int, int], list] = {}   # (ligne, colonne) -> [nombre, somme lat, somme lon]
+        self.dirty = set()
+
+    def add(self, lat: float, lon: float, count: int = 1):
+        key = (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+        cell = self.cells.get(key)
+        if cell is None:
+            cell = self.cells[key] = [0, 0.0, 0.0]
+        cell[0] += count
+        cell[1] += lat * count
+        cell[2] += lon * count
+        self.dirty.add(key)
+
+    def _payload(self, keys) -> List[dict]:
+        out = []
+        for key in keys:
+            count, sum_lat, sum_lon = self.cells[key]
+            out.append({"id": f"{key[0]}:{key[1]}", "lat": round(sum_lat / count, 4),
+                        "lon": round(sum_lon / count, 4), "count": count})
+        return out
+
+    def flush(self) -> List[dict]:
+        """Cellules modifiées depuis le dernier appel"""
+        keys, self.dirty = self.dirty, set()
+        return self._payload(keys)
+
+    def snapshot(self) -> List[dict]:
+        """Toutes les cellules (page (re)chargée)"""
+        self.dirty = set()
+        return self._payload(self.cells)
+
+
+class MapBridge(QtCore.QObject):
+    """Objet exposé à la page via QWebChannel"""
+    cells = Signal(str)
+    page_ready = Signal()
+
+    @Slot()
+    def ready(self):
+        self.page_ready.emit()
+
+
+def _webchannel_js() -> str:
+    """qwebchannel.js (ressource Qt), incorporé à la page : pas de dépendance au schéma qrc://"""
+    resource = QtCore.QFile(":/qtwebchannel/qwebchannel.js")
+    if not resource.open(QtCore.QIODevice.ReadOnly):
+        raise RuntimeError("qwebchannel.js introuvable")
+    try:
+        return bytes(resource.readAll()).decode("utf-8")
+    finally:
+        resource.close()
+
+
+def build_map_html() -> str:
+    """Carte folium vide (générée une seule fois) + pont QWebChannel"""
+    import folium
+    m = folium.Map(
+        location=[20, 0],
+        zoom_start=2,
+        tiles="CartoDB dark_matter",
+        no_wrap=True,
+        min_zoom=2
+    )
+    root = m.get_root()
+    root.header.add_child(folium.Element(f"<script>{_webchannel_js()}</script>"))
+    root.script.add_child(folium.Element(MAP_JS % {"map": m.get_name()}))
+    return root.render()
+
+
+class ThreatMap(QtCore.QObject):
+    """
+    Carte des menaces chargée une seule fois dans `web_view`.
+    add_point() est appelé pour chaque alerte (thread GUI) et ne fait qu'agréger ;
+    toutes les FLUSH_MS ms, seules les cellules modifiées sont envoyées à la page.
+    """
+
+    def __init__(self, web_view, cell_deg: float = CELL_DEG, interval_ms: int = FLUSH_MS, parent=None):
+        super().__init__(parent)
+        self.web_view = web_view
+        self.grid = GridAggregator(cell_deg)
+        self.loaded = False
+
+        self.bridge = MapBridge(self)
+        self.bridge.page_ready.connect(self._on_page_ready)
+        self.channel = QWebChannel(self)
+        self.channel.registerObject("bridge", self.bridge)
+        web_view.page().setWebChannel(self.channel)
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start()
+
+        try:
+            web_view.setHtml(build_map_html())
+        except Exception as e:
+            print(f"[MAP ERROR] {e}")
+
+    def add_point(self, coords, count: int = 1):
+        if not coords or len(coords) < 2 or list(coords[:2]) == [0, 0]:
+            return
+        self.grid.add(float(coords[0]), float(coords[1]), count)
+
+    @Slot()
+    def flush(self):
+        # Avant le chargement de la page, les cellules restent marquées et partiront avec l'instantané
+        if not self.loaded or not self.grid.dirty:
+            return
+        self.bridge.cells.emit(json.dumps(self.grid.flush()))
+
+    @Slot()
+    def _on_page_ready(self):
+        self.loaded = True
+        self.bridge.cells.emit(json.dumps(self.grid.snapshot()))
+
+    def stop(self):
+        self.timer.stop()
@@ -1,18 +1,46 @@
 import os
 import re
+import json
 import pickle
-import numpy as np
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
-from typing import Tuple, List
+import threading
+from datetime import datetime
+from typing import NamedTuple, Optional, Tuple, List
+
+from config.settings import settings
+
+# numpy et scikit-learn (~1 s d'import) sont importés dans les méthodes qui s'en servent :
+# importer ce module reste immédiat, le coût est payé au chargement du modèle (voir warmup)
+
+# Version des modèles livrés sans fichier de métadonnées (entraînés avant le versionnage)
+INITIAL_VERSION = "initial"
+# Version de extract_features : à incrémenter quand les features changent (invalide les caches de ml/train.py)
+FEATURES_VERSION = 1
+
+
+class ModelState(NamedTuple):
+    """Modèle actif : remplacé d'un seul bloc (swap), jamais modifié en place"""
+    model: object = None
+    scaler: object = None
+    version: Optional[str] = None
+    # Portique des lignes manifestement normales (ml/gate.py), appris avec la forêt ; None = aucun
+    gate: object = None
 
 class AnomalyDetector:
     """
     Détecteur d'anomalies basé sur Isolation Forest avec normalisation des caractéristiques
-    Analyse les caractéristiques des requêtes HTTP pour détecter des comportements suspects
+    Analyse les caractéristiques des requêtes HTTP pour détecter des comportements suspects.
+    Avec background=True, le modèle est chargé dans un thread (warmup) : le constructeur rend
+    la main tout de suite et le premier appel qui a besoin du modèle attend la fin du chargement.
+    La forêt exportée en tableaux NumPy (anomaly_model.npz, voir ml/forest.py) est chargée de
+    préférence aux pickles : quelques millisecondes, sans importer scikit-learn.
+    Modèle, scaler et version forment un ModelState remplacé d'un bloc (swap) : un lot
+    en cours de scoring garde l'état lu au départ, même si un ré-entraînement le remplace.
+    Les lignes admises par le portique du modèle (ml/gate.py) ne passent pas par la forêt ;
+    une sur ML_GATE_AUDIT y passe quand même, pour mesurer les désaccords (gate_stats)
     """
     
-    def __init__(self, model_path: str = None, scaler_path: str = None):
+    def __init__(self, model_path: str = None, scaler_path: str = None, background: bool = False,
+                 load: bool = True):
         if model_path is None:
             model_path = os.path.join(os.path.dirname(__file__), 'anomaly_model.pkl')
         if scaler_path is None:
@@ -20,32 +48,96 @@ class AnomalyDetector:
         
         self.model_path = model_path
         self.scaler_path = scaler_path
-        self.model = None
-        self.scaler = None
-        self.is_trained = False
+        self.forest_path = os.path.splitext(model_path)[0] + '.npz'
+        self.meta_path = os.path.splitext(model_path)[0] + '.json'
+        self._state = ModelState()
+        self._trained = False
+        self._loaded = threading.Event()
+        self._loaded.set()
+        # Portique : lignes reçues, admises sans la forêt, contrôlées, et jugées anormales par la forêt au contrôle
+        self.gate_counts = {"lines": 0, "passed": 0, "audited": 0, "disagreements": 0}
+        # Lots scorés en parallèle par les workers du moteur : compteurs et tirage du contrôle protégés
+        self._gate_lock = threading.Lock()
         
-        # Charger le modèle et le scaler si ils existent
-        if os.path.exists(self.model_path) and os.path.exists(self.scaler_path):
+        # Charger le modèle et le scaler si ils existent (load=False : extraction des features seule)
+        if not load:
+            return
+        if (os.path.exists(self.model_path) and os.path.exists(self.scaler_path)) or os.path.exists(self.forest_path):
+            if background:
+                self.warmup()
+            else:
+                self.load_model()
+
+    @property
+    def is_trained(self) -> bool:
+        # Attend un éventuel chargement en arrière-plan : aucune ligne n'est scorée sans modèle par erreur
+        self._loaded.wait()
+        return self._trained
+
+    @is_trained.setter
+    def is_trained(self, value: bool):
+        self._trained = value
+
+    @property
+    def current(self) -> ModelState:
+        """Modèle actif, une fois un éventuel chargement en arrière-plan terminé"""
+        self._loaded.wait()
+        return self._state
+
+    @property
+    def model(self):
+        return self.current.model
+
+    @property
+    def scaler(self):
+        return self.current.scaler
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.current.version
+
+    def swap(self, state: ModelState) -> ModelState:
+        """
+        Remplace le modèle actif sans pause de l'ingestion (une seule affectation) et
+        retourne l'ancien état, pour un retour arrière éventuel
+        """
+        previous = self._state
+        self._state = state
+        self._trained = state.model is not None and state.scaler is not None
+        return previous
+
+    def warmup(self):
+        """Charge le modèle (et importe numpy) dans un thread en arrière-plan"""
+        self._loaded.clear()
+        threading.Thread(target=self._load_in_background, name="ml-warmup", daemon=True).start()
+
+    def _load_in_background(self):
+        try:
             self.load_model()
+            if self._trained:
+                import numpy  # Utilisé par extract_features dès la première ligne
+        finally:
+            self._loaded.set()
     
-    def extract_features(self, log_line: str) -> np.ndarray:
+    def extract_features(self, log_line: str) -> "np.ndarray":
         """
         Extrait les features d'une ligne de log
         Retourne un vecteur de caractéristiques
         """
         # Imports dynamiques pour éviter les dépendances circulaires
+        import numpy as np
         from detectors import sqli, xss, os_injection, traversal, nosql
+        from utils.log_parser import as_record
         
+        record = as_record(log_line)
         features = []
         line_lower = log_line.lower()
         
         # 1. Longueur de la ligne
         features.append(len(log_line))
         
-        # 2. Longueur de l'URL
-        url_match = re.search(r'\s(?:GET|POST|PUT|DELETE|PATCH)\s+([^\s?]+)', log_line)
-        url = url_match.group(1) if url_match else ""
-        features.append(len(url))
+        # 2. Longueur de l'URL (chemin sans query string, issu du parseur commun)
+        features.append(len(record.path or ""))
         
         # 3. Nombre de paramètres (URL + Body)
         param_count = log_line.count('=') + log_line.count('&')
@@ -102,6 +194,7 @@ class AnomalyDetector:
         if not text:
             return 0.0
         
+        import numpy as np
         from collections import Counter
         counts = Counter(text)
         total = len(text)
@@ -119,85 +212,167 @@ class AnomalyDetector:
         Entraîne le modèle sur des logs normaux
         """
         # print("[ML] Préparation des données d'entraînement...")
+        import numpy as np
         
         X = []
         for log in normal_logs:
             features = self.extract_features(log)
             X.append(features[0])
         
-        X = np.array(X)
+        self.train_features(np.array(X), contamination)
+
+    def train_features(self, X, contamination: float = 0.01, n_estimators: int = 300, n_jobs: int = None):
+        """
+        Entraîne le modèle sur une matrice de features déjà extraites (une ligne par log).
+        n_jobs : arbres construits en parallèle (-1 = tous les coeurs), sans effet sur les scores
+        """
+        from sklearn.ensemble import IsolationForest
+        from sklearn.preprocessing import StandardScaler
         
         # Initialiser et entraîner le scaler
         # print("[ML] Normalisation des caractéristiques...")
-        self.scaler = StandardScaler()
-        X_scaled = self.scaler.fit_transform(X)
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
         
         # Créer et entraîner le modèle
         # print("[ML] Entraînement de IsolationForest...")
-        self.model = IsolationForest(
+        model = IsolationForest(
             contamination=contamination,
             random_state=42,
-            n_estimators=300,
-            max_samples='auto'
+            n_estimators=n_estimators,
+            max_samples='auto',
+            n_jobs=n_jobs
         )
         
-        self.model.fit(X_scaled)
-        self.is_trained = True
+        model.fit(X_scaled)
+        from ml.gate import BenignGate
+        gate = BenignGate.learn(X, model.decision_function(X_scaled))
+        self.swap(ModelState(model, scaler, datetime.now().strftime("%Y%m%d-%H%M%S"), gate))
         
         # print(f"[ML] ✓ Modèle entraîné sur {len(X)} exemples")
     
-    def predict(self, log_line: str) -> Tuple[bool, float]:
+    def predict(self, log_line: str, state: ModelState = None) -> Tuple[bool, float]:
         """
-        Prédit si une ligne de log est une anomalie
+        Prédit si une ligne de log est une anomalie (avec `state` : ce modèle plutôt que l'actif)
         Retourne: (is_anomaly, anomaly_score)
         """
-        if not self.is_trained or self.model is None or self.scaler is None:
+        if not self.is_trained:
+            return False, 0.0
+        state = state or self.current
+        if state.model is None or state.scaler is None:
             return False, 0.0
         
         try:
-            features = self.extract_features(log_line)
-            features_scaled = self.scaler.transform(features)
-            
-            # Prediction (-1 = anomalie, 1 = normal)
-            prediction = self.model.predict(features_scaled)[0]
-            
-            # decision_function: > 0 normal, < 0 anomalie
-            decision_func = self.model.decision_function(features_scaled)[0]
-            
-            # Calibration ÉQUILIBRÉE pour le SIEM
-            # decision_function: > 0 normal, < 0 anomalie
-            # On utilise une sigmoïde centrée sur 0.0 (seuil naturel de Isolation Forest)
-            # Une pente de 15 (au lieu de 10) pour des scores plus nets
-            score = 1.0 / (1.0 + np.exp(decision_func * 15))
-            
-            # On vérifie si un pattern critique a été détecté (indices 4, 5, 6, 7, 8 dans extract_features)
-            # 4: SQL, 5: XSS/HTML, 6: Traversal, 7: RCE, 8: NoSQL
-            pattern_detected = any(features[0][i] > 0 for i in [4, 5, 6, 7, 8])
-            
-            if pattern_detected:
-                # Si on détecte un pattern connu, on booste le score au dessus du seuil (0.6)
-                score = max(score, 0.75)
-                is_anomaly = True
-            else:
-                # Sinon on se fie au modèle Isolation Forest
-                is_anomaly = prediction == -1 or score > 0.6
-            
-            return is_anomaly, score
+            # Mêmes étapes que pour un lot : portique, forêt, calibration, boost des patterns
+            return self.predict_features(self.extract_features(log_line), state)[0]
         except Exception as e:
             # print(f"[ML] Erreur prédiction: {e}")
             return False, 0.0
     
-    def save_model(self):
-        """Sauvegarde le modèle et le scaler"""
-        if self.model is None or self.scaler is None:
+    def predict_batch(self, log_lines: List[str], state: ModelState = None) -> List[Tuple[bool, float]]:
+        """
+        Version vectorisée de predict() : une seule normalisation et un seul
+        passage dans la forêt pour tout le lot (mêmes scores que predict)
+        """
+        if not log_lines:
+            return []
+        state = state or self.current
+        if not self.is_trained or state.model is None or state.scaler is None:
+            return [(False, 0.0)] * len(log_lines)
+        
+        import numpy as np
+        try:
+            X = np.vstack([self.extract_features(line)[0] for line in log_lines])
+            return self.predict_features(X, state)
+        except Exception:
+            # Repli ligne par ligne (une ligne invalide ne doit pas faire échouer le lot)
+            return [self.predict(line, state) for line in log_lines]
+
+    def predict_features(self, X, state: ModelState = None) -> List[Tuple[bool, float]]:
+        """predict_batch() sur une matrice de features déjà extraites (évaluation de ml/train.py)"""
+        import numpy as np
+        state = state or self.current
+        if not self.is_trained or state.model is None or state.scaler is None:
+            return [(False, 0.0)] * len(X)
+        X = np.asarray(X)
+        if state.gate is not None and settings.ML_GATE:
+            decision = self._gate_decision(X, state)
+        else:
+            decision = state.model.decision_function(state.scaler.transform(X))
+        
+        # Calibration ÉQUILIBRÉE pour le SIEM
+        # decision_function: > 0 normal, < 0 anomalie
+        # On utilise une sigmoïde centrée sur 0.0 (seuil naturel de Isolation Forest)
+        # Une pente de 15 (au lieu de 10) pour des scores plus nets
+        scores = 1.0 / (1.0 + np.exp(decision * 15))
+        
+        # Un pattern critique connu (indices 4 à 8 : SQL, XSS, Traversal, RCE, NoSQL)
+        # booste le score au-dessus du seuil (0.6) ; sinon on se fie à Isolation Forest
+        pattern_detected = (X[:, 4:9] > 0).any(axis=1)
+        # IsolationForest.predict() vaut -1 exactement quand decision_function < 0
+        is_anomaly = pattern_detected | (decision < 0) | (scores > 0.6)
+        scores = np.where(pattern_detected, np.maximum(scores, 0.75), scores)
+        
+        return [(bool(a), float(s)) for a, s in zip(is_anomaly, scores)]
+
+    def _gate_decision(self, X, state: ModelState):
+        """
+        decision_function du lot en cascade : estimation du portique pour les lignes admises,
+        forêt pour les autres et pour les lignes admises tirées pour le contrôle (dès que la
+        forêt a scoré une ligne, c'est son score qui est gardé)
+        """
+        import numpy as np
+        from ml.gate import audit_positions
+
+        admitted, decision = state.gate.admit(X)
+        passed = np.flatnonzero(admitted)
+        # Positions du contrôle réservées d'un bloc : deux lots simultanés ne tirent pas les mêmes
+        with self._gate_lock:
+            audited = passed[audit_positions(self.gate_counts["passed"], len(passed), settings.ML_GATE_AUDIT)]
+            self.gate_counts["lines"] += len(X)
+            self.gate_counts["passed"] += len(passed)
+            self.gate_counts["audited"] += len(audited)
+        todo = np.concatenate([np.flatnonzero(~admitted), audited])
+        if len(todo):
+            exact = state.model.decision_function(state.scaler.transform(X[todo]))
+            # Désaccord : la forêt signale une ligne admise (decision < 0, voir predict_features)
+            disagreements = int((exact[len(todo) - len(audited):] < 0).sum())
+            decision[todo] = exact
+            if disagreements:
+                with self._gate_lock:
+                    self.gate_counts["disagreements"] += disagreements
+        return decision
+
+    def gate_stats(self) -> dict:
+        """Portique : part des lignes admises sans la forêt et désaccords constatés au contrôle"""
+        with self._gate_lock:
+            counts = dict(self.gate_counts)
+        state = self._state
+        return {
+            "enabled": state.gate is not None and settings.ML_GATE,
+            **counts,
+            "pass_rate": round(counts["passed"] / counts["lines"], 4) if counts["lines"] else 0.0,
+            "disagreement_rate": round(counts["disagreements"] / counts["audited"], 4) if counts["audited"] else 0.0,
+        }
+    
+    def save_model(self, meta: dict = None):
+        """Sauvegarde le modèle et le scaler, puis la version (+ `meta`) dans le .json associé"""
+        model, scaler, version, gate = self.current
+        if model is None or scaler is None:
             # print("[ML] Aucun modèle/scaler à sauvegarder")
             return
         
         try:
             with open(self.model_path, 'wb') as f:
-                pickle.dump(self.model, f)
+                pickle.dump(model, f)
             with open(self.scaler_path, 'wb') as f:
-                pickle.dump(self.scaler, f)
+                pickle.dump(scaler, f)
+            
+            from ml.forest import export_forest
+            export_forest(model, scaler, self.forest_path)
+            with open(self.meta_path, 'w', encoding='utf-8') as f:
+                json.dump({**(meta or {}), "version": version,
+                           "gate": gate.to_dict() if gate is not None else None}, f, indent=2)
             
             # print(f"[ML] + Modèle sauvegardé: {self.model_path}")
             # print(f"[ML] + Scaler sauvegardé: {self.scaler_path}")
@@ -206,27 +381,57 @@ class AnomalyDetector:
             pass
 
     def load_model(self):
-        """Charge un modèle et un scaler existants"""
+        """Charge un modèle et un scaler existants (forêt exportée si elle est à jour, sinon pickles)"""
         try:
+            version, gate = self._read_meta()
+            if self._forest_is_current():
+                from ml.forest import CompiledForest
+                # Modèle et scaler dans le même fichier : l'objet tient les deux rôles
+                forest = CompiledForest.load(self.forest_path)
+                self.swap(ModelState(forest, forest, version, gate))
+                return
+
+            model = scaler = None
             if os.path.exists(self.model_path):
                 with open(self.model_path, 'rb') as f:
-                    self.model = pickle.load(f)
+                    model = pickle.load(f)
             
             if os.path.exists(self.scaler_path):
                 with open(self.scaler_path, 'rb') as f:
-                    self.scaler = pickle.load(f)
+                    scaler = pickle.load(f)
             
-            if self.model is not None and self.scaler is not None:
-                self.is_trained = True
-                # print(f"[ML] + Modèle et Scaler chargés")
-            else:
-                self.is_trained = False
+            # Modèle et scaler requis tous les deux (sinon non entraîné)
+            self.swap(ModelState(model, scaler, version, gate) if model is not None and scaler is not None
+                      else ModelState())
+            # print(f"[ML] + Modèle et Scaler chargés")
         
         except Exception as e:
             # print(f"[ML] Erreur chargement: {e}")
-            self.model = None
-            self.scaler = None
-            self.is_trained = False
+            self.swap(ModelState())
+
+    def _read_meta(self) -> tuple:
+        """(version, portique) du .json associé ; modèles sans portique (antérieurs) : toutes les lignes à la forêt"""
+        try:
+            with open(self.meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            version = str(meta["version"])
+        except (OSError, ValueError, KeyError):
+            return INITIAL_VERSION, None
+        gate = None
+        if meta.get("gate"):
+            try:
+                from ml.gate import BenignGate
+                gate = BenignGate.from_dict(meta["gate"])
+            except (KeyError, TypeError, ValueError):
+                gate = None
+        return version, gate
+
+    def _forest_is_current(self) -> bool:
+        """Forêt exportée présente et pas plus ancienne que le modèle pickle (ré-entraînement sans export)"""
+        if not os.path.exists(self.forest_path):
+            return False
+        return not os.path.exists(self.model_path) or \
+            os.path.getmtime(self.forest_path) >= os.path.getmtime(self.model_path)
 
 
 def detect(line: str, detector: AnomalyDetector = None) -> Tuple[bool, str, str]:
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Corpus d'entraînement tiré du trafic réel.
+
+Les lignes sans signature passent dans un échantillon stratifié par endpoint et statut
+(StratifiedReservoir) : mémoire constante, O(1) par ligne. CorpusSampler l'enregistre
+périodiquement dans CORPUS_PATH, compressé et chiffré avec la clé courante (utils/keyring.py).
+ml/train.py et le ré-entraînement le chargent directement (load_lines).
+
+    python ml/corpus.py                     # résumé du corpus (strates, lignes)
+    python ml/corpus.py --export lignes.log # lignes en clair
+"""
+
+import os
+import re
+import sys
+import json
+import zlib
+import random
+import threading
+from datetime import datetime
+from typing import Dict, List
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from config.settings import settings
+
+FORMAT_VERSION = 1
+# Strate commune des lignes arrivées une fois max_strata atteint
+OTHER = "(autres)"
+# Lignes tronquées : la mémoire reste bornée même face à des lignes géantes
+MAX_LINE = 4096
+# Segment de chemin variable (identifiant numérique, hexadécimal long, UUID)
+ID_SEGMENT_RE = re.compile(r"^(?:\d+|[0-9a-fA-F]{16,}|[0-9a-fA-F]{8}(?:-[0-9a-fA-F]{4}){3}-[0-9a-fA-F]{12})$")
+# Fichier statique : regroupé par dossier et extension
+STATIC_RE = re.compile(r"\.([A-Za-z0-9]{1,8})$")
+
+
+def endpoint_key(record) -> str:
+    """
+    Strate d'une ligne analysée : "méthode chemin statut", identifiants remplacés par {id}
+    et fichiers regroupés par extension (/api/users/42 -> /api/users/{id}, /img/a.png -> /img/*.png)
+    """
+    segments = (record.path or "").split("/")
+    segments = ["{id}" if ID_SEGMENT_RE.match(segment) else segment for segment in segments]
+    if segments:
+        static = STATIC_RE.search(segments[-1])
+        if static:
+            segments[-1] = f"*.{static.group(1).lower()}"
+    return f"{record.method or '-'} {'/'.join(segments)} {record.status or '-'}"
+
+
+class StratifiedReservoir:
+    """
+    Échantillon uniforme de chaque strate (algorithme R), en mémoire constante :
+    au plus `capacity` lignes au total, réparties à parts égales entre les strates vues.
+    Au-delà de `max_strata` strates, les nouvelles partagent la strate OTHER.
+    add() est en O(1) amorti : une nouvelle strate réduit les autres à la nouvelle part en
+    retirant des lignes au hasard (un sous-échantillon uniforme d'un échantillon uniforme reste
+    uniforme), chaque ligne n'est retirée qu'une fois. Pas de verrou (voir CorpusSampler)
+    """
+
+    def __init__(self, capacity: int = 20000, max_strata: int = 500, seed: int = None):
+        self.capacity = max(1, capacity)
+        self.max_strata = max(1, max_strata)
+        self.strata: Dict[str, list] = {}     # clé -> [lignes vues, échantillon]
+        self.per_stratum = self.capacity
+        self.random = random.Random(seed)
+
+    def __len__(self):
+        return sum(len(sample) for _, sample in self.strata.values())
+
+    def add(self, key: str, line: str):
+        stratum = self.strata.get(key)
+        if stratum is None:
+            if len(self.strata) >= self.max_strata - 1:
+                key = OTHER
+                stratum = self.strata.get(OTHER)
+            if stratum is None:
+                stratum = self._new_stratum(key)
+        stratum[0] += 1
+        sample = stratum[1]
+        if len(sample) < self.per_stratum:
+            sample.append(line)
+        else:
+            j = int(self.random.random() * stratum[0])
+            if j < self.per_stratum:
+                sample[j] = line
+
+    def _new_stratum(self, key: str) -> list:
+        stratum = self.strata[key] = [0, []]
+        self._resize(max(1, self.capacity // len(self.strata)))
+        return stratum
+
+    def _resize(self, per_stratum: int):
+        self.per_stratum = per_stratum
+        for _, sample in self.strata.values():
+            # Retrait d'une ligne au hasard : la dernière prend sa place, O(1) par ligne retirée
+            while len(sample) > per_stratum:
+                j = int(self.random.random() * len(sample))
+                sample[j] = sample[-1]
+                sample.pop()
+
+    def lines(self) -> List[str]:
+        return [line for _, sample in self.strata.values() for line in sample]
+
+    def state(self) -> dict:
+        """Copie des strates ({clé: {"seen", "lines"}}), pour l'enregistrement"""
+        return {key: {"seen": seen, "lines": list(sample)} for key, (seen, sample) in self.strata.items()}
+
+    def restore(self, strata: dict):
+        """Reprend un état enregistré ; l'échantillonnage continue comme sans interruption"""
+        self.strata = {key: [s["seen"], list(s["lines"])] for key, s in strata.items()}
+        self._resize(max(1, self.capacity // max(len(self.strata), 1)))
+
+
+def save_corpus(path: str, strata: dict):
+    """Écrit le corpus : JSON compressé (zlib), chiffré avec la clé courante, remplacé atomiquement"""
+    from utils.keyring import get_keyring
+
+    payload = {
+        "format": FORMAT_VERSION,
+        "saved_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "strata": strata,
+    }
+    data = zlib.compress(json.dumps(payload, ensure_ascii=False).encode("utf-8"), 6)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(get_keyring().encrypt(data) + b"\n")
+    os.replace(tmp, path)
+
+
+def load_corpus(path: str) -> dict:
+    """Contenu d'un corpus enregistré (lève InvalidToken si aucune clé du trousseau ne convient)"""
+    from utils.keyring import get_keyring
+
+    with open(path, "rb") as f:
+        payload = json.loads(zlib.decompress(get_keyring().decrypt(f.read())).decode("utf-8"))
+    if payload.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Format de corpus {payload.get('format')} non supporté")
+    return payload
+
+
+def load_lines(path: str) -> List[str]:
+    """Lignes d'entraînement : corpus chiffré (.enc) ou fichier texte (une ligne de log par ligne)"""
+    if path.endswith(".enc"):
+        return [line for stratum in load_corpus(path)["strata"].values() for line in stratum["lines"]]
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+
+class CorpusSampler:
+    """
+    Échantillonnage continu du trafic sans signature pour l'entraînement : le moteur
+    passe chaque lot (add_batch), le corpus est enregistré toutes les `interval` secondes
+    s'il a changé, et à l'arrêt. Au démarrage, le corpus existant est rechargé
+    """
+
+    def __init__(self, path: str = None, capacity: int = None, max_strata: int = None,
+                 interval: float = None, notify=None):
+        self.path = path or settings.CORPUS_PATH
+        self.reservoir = StratifiedReservoir(settings.CORPUS_SIZE if capacity is None else capacity,
+                                             settings.CORPUS_STRATA if max_strata is None else max_strata)
+        self.interval = settings.CORPUS_INTERVAL if interval is None else interval
+        self.notify = notify or (lambda msg: None)
+        self.offered = 0        # Lignes reçues depuis le démarrage
+        self.saved_at = None
+        self.running = False
+        self.thread = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+    def add_batch(self, records: list):
+        """Lignes sans signature d'un lot (les lignes de format inconnu sont ignorées)"""
+        with self._lock:
+            for record in records:
+                if record.parsed:
+                    self.reservoir.add(endpoint_key(record), str(record)[:MAX_LINE])
+                    self.offered += 1
+                    self._dirty = True
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            strata = load_corpus(self.path)["strata"]
+        except Exception as e:
+            print(f"[ML] Erreur lecture corpus {self.path}: {e}")
+            return
+        with self._lock:
+            self.reservoir.restore(strata)
+
+    def save(self) -> int:
+        """Enregistre le corpus s'il a changé ; retourne le nombre de lignes écrites"""
+        with self._lock:
+            if not self._dirty:
+                return 0
+            strata = self.reservoir.state()
+            self._dirty = False
+        try:
+            save_corpus(self.path, strata)
+        except Exception as e:
+            print(f"[ML] Erreur enregistrement corpus {self.path}: {e}")
+            self._dirty = True
+            return 0
+        self.saved_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return sum(len(s["lines"]) for s in strata.values())
+
+    def start(self):
+        if self.running: return
+        self.load()
+        self.running = True
+        self.thread = threading.Thread(target=self._run_loop, name="ml-corpus", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if not self.running: return
+        self.running = False
+        self._wakeup.set()
+        if self.thread:
+            self.thread.join(timeout=2)
+        self.save()
+
+    def _run_loop(self):
+        while self.running:
+            self._wakeup.wait(self.interval)
+            if not self.running:
+                break
+            count = self.save()
+            if count:
+                self.notify(f"[ML] Corpus d'entraînement enregistré: {count} lignes")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "lines": len(self.reservoir),
+                "strata": len(self.reservoir.strata),
+                "per_stratum": self.reservoir.per_stratum,
+                "offered": self.offered,
+                "saved_at": self.saved_at,
+            }
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Corpus d'entraînement échantillonné du trafic réel")
+    parser.add_argument("path", nargs="?", default=settings.CORPUS_PATH)
+    parser.add_argument("--export", help="Écrit les lignes en clair dans ce fichier")
+    parser.add_argument("--top", type=int, default=20, help="Strates affichées (les plus vues)")
+    args = parser.parse_args(argv)
+
+    payload = load_corpus(args.path)
+    strata = payload["strata"]
+    print(f"[ML] {args.path} (enregistré le {payload['saved_at']}) : "
+          f"{sum(len(s['lines']) for s in strata.values())} lignes, {len(strata)} strates")
+    for key, stratum in sorted(strata.items(), key=lambda kv: -kv[1]["seen"])[:args.top]:
+        print(f"  {stratum['seen']:>10} vues  {len(stratum['lines']):>6} gardées  {key}")
+    if args.export:
+        with open(args.export, "w", encoding="utf-8") as f:
+            for stratum in strata.values():
+                f.writelines(line + "\n" for line in stratum["lines"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
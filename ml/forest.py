@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Forêt d'isolement "compilée" : l'IsolationForest et le StandardScaler entraînés sont aplatis
+en tableaux NumPy (anomaly_model.npz). Le scoring se passe de scikit-learn et de pickle,
+et les scores sont identiques à ceux de decision_function.
+
+    python ml/forest.py                 # exporte ml/anomaly_model.pkl + ml/scaler.pkl -> ml/anomaly_model.npz
+    python ml/forest.py --check         # + compare les scores aux modèles scikit-learn
+"""
+
+import os
+import sys
+import struct
+import zipfile
+from typing import Dict
+
+import numpy as np
+
+FORMAT_VERSION = 1
+# Lignes traversées ensemble : le tableau des noeuds courants (arbres x CHUNK_ROWS) reste en cache
+CHUNK_ROWS = 256
+
+
+def average_path_length(n_samples) -> np.ndarray:
+    """
+    Longueur moyenne du chemin d'isolement dans un arbre de `n_samples` lignes
+    (Liu, Ting & Zhou, 2008), même formule que scikit-learn : 0 pour 1 ligne, 1 pour 2
+    """
+    n = np.asarray(n_samples, dtype=np.float64)
+    length = np.zeros_like(n)
+    length[n == 2] = 1.0
+    large = n > 2
+    length[large] = 2.0 * (np.log(n[large] - 1.0) + np.euler_gamma) - 2.0 * (n[large] - 1.0) / n[large]
+    return length
+
+
+def node_depths(tree) -> np.ndarray:
+    """Nombre de noeuds du chemin racine -> noeud (racine = 1), depuis les tableaux publics de tree_"""
+    depth = np.zeros(tree.node_count, dtype=np.float64)
+    depth[0] = 1.0
+    # Un enfant a toujours un indice supérieur à son parent (construction en profondeur)
+    for node in range(tree.node_count):
+        left, right = tree.children_left[node], tree.children_right[node]
+        if left != -1:
+            depth[left] = depth[right] = depth[node] + 1.0
+    return depth
+
+
+def export_forest(model, scaler, path: str):
+    """
+    Aplatit `model` (IsolationForest) et `scaler` (StandardScaler) dans `path` (.npz).
+    Tous les noeuds des arbres sont mis bout à bout ; une feuille boucle sur elle-même
+    (gauche = droite = elle) et porte sa contribution à la profondeur, calculée comme
+    scikit-learn : longueur du chemin + longueur moyenne du sous-échantillon restant - 1.
+    Seuls les attributs publics du modèle sont lus (tree_, estimators_features_, max_samples_...)
+    """
+    # Même condition que scikit-learn : les arbres voient les colonnes d'origine si toutes sont tirées
+    subsample = len(model.estimators_features_[0]) != model.n_features_in_
+    feature, threshold, left, right, missing_left, value, roots = [], [], [], [], [], [], []
+    offset = 0
+    for estimator, features in zip(model.estimators_, model.estimators_features_):
+        tree = estimator.tree_
+        nodes = np.arange(tree.node_count)
+        leaf = tree.children_left == -1
+        columns = np.where(leaf, 0, tree.feature)
+        if subsample:
+            columns = np.asarray(features)[columns]
+        feature.append(columns)
+        threshold.append(tree.threshold)
+        left.append(np.where(leaf, nodes, tree.children_left) + offset)
+        right.append(np.where(leaf, nodes, tree.children_right) + offset)
+        missing = getattr(tree, "missing_go_to_left", None)
+        missing_left.append(np.zeros(tree.node_count, dtype=bool) if missing is None else np.asarray(missing, dtype=bool))
+        value.append(node_depths(tree) + average_path_length(tree.n_node_samples) - 1.0)
+        roots.append(offset)
+        offset += tree.node_count
+
+    n_features = model.n_features_in_
+    arrays = {
+        "version": np.array(FORMAT_VERSION),
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": np.concatenate(threshold).astype(np.float64),
+        "left": np.concatenate(left).astype(np.int32),
+        "right": np.concatenate(right).astype(np.int32),
+        "missing_left": np.concatenate(missing_left),
+        "value": np.concatenate(value).astype(np.float64),
+        "roots": np.array(roots, dtype=np.int32),
+        "max_depth": np.array(max(e.tree_.max_depth for e in model.estimators_)),
+        "denominator": np.array(len(model.estimators_) * average_path_length([model.max_samples_])[0]),
+        "offset": np.array(model.offset_, dtype=np.float64),
+        # Étapes désactivées du scaler : soustraire 0 / diviser par 1 laisse les valeurs intactes
+        "mean": scaler.mean_ if scaler.with_mean and scaler.mean_ is not None else np.zeros(n_features),
+        "scale": scaler.scale_ if scaler.with_std and scaler.scale_ is not None else np.ones(n_features),
+    }
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+
+class CompiledForest:
+    """
+    Forêt chargée depuis un .npz (export_forest). Remplace à la fois le modèle et le scaler
+    dans AnomalyDetector : transform(), decision_function() et predict() ont la même
+    sémantique que StandardScaler / IsolationForest
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        if int(arrays["version"]) != FORMAT_VERSION:
+            raise ValueError(f"Format de forêt {int(arrays['version'])} non supporté")
+        self.feature = arrays["feature"].astype(np.intp)
+        self.threshold = arrays["threshold"]
+        # Seuils arrondis au float32 inférieur : pour x float32, x <= seuil64 <=> x <= seuil32
+        threshold32 = self.threshold.astype(np.float32)
+        above = threshold32.astype(np.float64) > self.threshold
+        threshold32[above] = np.nextafter(threshold32[above], np.float32(-np.inf))
+        self.threshold32 = threshold32
+        # Enfants entrelacés : children[2 * noeud + va_à_droite], un seul accès par niveau
+        self.children = np.empty(2 * len(self.feature), dtype=np.intp)
+        self.children[0::2] = arrays["left"]
+        self.children[1::2] = arrays["right"]
+        self.missing_left = arrays["missing_left"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"].astype(np.intp)
+        self.max_depth = int(arrays["max_depth"])
+        self.denominator = float(arrays["denominator"])
+        self.offset = float(arrays["offset"])
+        self.mean = arrays["mean"]
+        self.scale = arrays["scale"]
+
+    @classmethod
+    def load(cls, path: str) -> "CompiledForest":
+        return cls(load_arrays(path))
+
+    def transform(self, X) -> np.ndarray:
+        """Normalisation (StandardScaler.transform)"""
+        X = np.array(X, dtype=np.float64)
+        X -= self.mean
+        X /= self.scale
+        return X
+
+    def decision_function(self, X) -> np.ndarray:
+        """IsolationForest.decision_function : < 0 anomalie, > 0 normal"""
+        # Comme scikit-learn : entrées en float32, comparées aux seuils float64
+        X = np.asarray(X, dtype=np.float32)
+        if len(X) <= CHUNK_ROWS:
+            return self._decision(X)
+        return np.concatenate([self._decision(X[i:i + CHUNK_ROWS]) for i in range(0, len(X), CHUNK_ROWS)])
+
+    def predict(self, X) -> np.ndarray:
+        """-1 = anomalie, 1 = normal (IsolationForest.predict)"""
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
+    def _decision(self, X: np.ndarray) -> np.ndarray:
+        n, n_features = X.shape
+        flat = np.ascontiguousarray(X).ravel()
+        row_start = (np.arange(n) * n_features)[None, :]
+        # Noeud courant de chaque (arbre, ligne) ; tous les arbres descendent d'un niveau à la fois
+        node = np.repeat(self.roots[:, None], n, axis=1)
+        has_nan = np.isnan(flat).any()
+        for _ in range(self.max_depth):
+            x = flat.take(row_start + self.feature.take(node))
+            go_right = x > self.threshold32.take(node)
+            if has_nan:
+                go_right = np.where(np.isnan(x), ~self.missing_left.take(node), go_right)
+            node = self.children.take(2 * node + go_right)
+        # Somme cumulée arbre par arbre : même ordre d'addition que scikit-learn, quel que soit n
+        depths = np.cumsum(self.value.take(node), axis=0)[-1]
+        scores = 2 ** (-np.divide(depths, self.denominator, out=np.ones_like(depths),
+                                  where=self.denominator != 0))
+        return -scores - self.offset
+
+
+def load_arrays(path: str) -> Dict[str, np.ndarray]:
+    """
+    Tableaux d'un .npz, projetés en mémoire en lecture seule (pages partagées entre processus).
+    np.load ignore mmap_mode pour une archive .npz : chaque membre stocké sans compression
+    (np.savez) est projeté à son offset dans le fichier ; les autres sont lus normalement
+    """
+    arrays = {}
+    with open(path, "rb") as f, zipfile.ZipFile(f) as archive:
+        for info in archive.infolist():
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if info.compress_type == zipfile.ZIP_STORED:
+                # En-tête local du membre : longueurs du nom et du champ extra aux octets 26 à 30
+                f.seek(info.header_offset + 26)
+                name_len, extra_len = struct.unpack("<HH", f.read(4))
+                f.seek(info.header_offset + 30 + name_len + extra_len)
+                read_header = {(1, 0): np.lib.format.read_array_header_1_0,
+                               (2, 0): np.lib.format.read_array_header_2_0}.get(np.lib.format.read_magic(f))
+                shape, fortran, dtype = read_header(f) if read_header else ((), False, None)
+                # Tableaux vides ou scalaires (version, max_depth...) : rien à projeter
+                if shape and np.prod(shape) and not dtype.hasobject:
+                    arrays[name] = np.asarray(np.memmap(f, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                                                        order="F" if fortran else "C"))
+                    continue
+            with archive.open(info) as member:
+                arrays[name] = np.lib.format.read_array(member)
+    return arrays
+
+
+def main(argv=None) -> int:
+    import pickle
+    import argparse
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Export de la forêt d'isolement en tableaux NumPy")
+    parser.add_argument("--model", default=os.path.join(base_dir, "anomaly_model.pkl"))
+    parser.add_argument("--scaler", default=os.path.join(base_dir, "scaler.pkl"))
+    parser.add_argument("--out", help="Fichier .npz (défaut: à côté du modèle)")
+    parser.add_argument("--check", action="store_true", help="Compare les scores à scikit-learn")
+    args = parser.parse_args(argv)
+    out = args.out or os.path.splitext(args.model)[0] + ".npz"
+
+    with open(args.model, "rb") as f:
+        model = pickle.load(f)
+    with open(args.scaler, "rb") as f:
+        scaler = pickle.load(f)
+    export_forest(model, scaler, out)
+    print(f"[ML] Forêt exportée: {out} ({os.path.getsize(out) // 1024} Ko)")
+    if not args.check:
+        return 0
+
+    sys.path.insert(0, os.path.dirname(base_dir))
+    from ml.anomaly_detector import AnomalyDetector
+    from ml.train import generate_normal_logs, generate_attack_logs
+
+    forest = CompiledForest.load(out)
+    extractor = AnomalyDetector(model_path=args.model, scaler_path=args.scaler)
+    lines = generate_normal_logs(2000) + generate_attack_logs(2000)
+    X = np.vstack([extractor.extract_features(line)[0] for line in lines])
+    # Valeurs extrêmes : chaque seuil est franchi des deux côtés
+    rng = np.random.default_rng(0)
+    X = np.vstack([X, rng.normal(0, 50, size=(2000, X.shape[1])), np.zeros((1, X.shape[1]))])
+    expected = model.decision_function(scaler.transform(X))
+    got = forest.decision_function(forest.transform(X))
+    mismatches = int(np.count_nonzero(expected != got))
+    print(f"[ML] {len(X)} lignes, écarts: {mismatches} (max {np.max(np.abs(expected - got)):.3g})")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
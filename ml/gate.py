@@ -0,0 +1,144 @@
+"""
+Premier étage du scoring ML : portique des lignes manifestement normales.
+
+La forêt (300 arbres) n'a rien à apprendre d'une requête ordinaire sur un fichier statique ;
+le portique, appris avec elle (AnomalyDetector.train_features) sur les lignes d'entraînement
+sans pattern qu'elle juge normales, lui évite ces lignes :
+  - un seuil bas et un seuil haut par feature (quantiles QUANTILE et 1 - QUANTILE : longueurs,
+    paramètres, caractères spéciaux, entropie...) ; les compteurs de patterns (indices 4 à 8)
+    doivent valoir 0, une ligne avec un pattern connu passe toujours par la forêt
+  - un modèle additif du score de la forêt (une table par feature, BINS classes de quantiles),
+    qui donne aux lignes admises un score proche du sien : la distribution des scores suivie
+    pendant la période d'essai d'un ré-entraînement (PSI) n'est pas faussée
+Une ligne dans les seuils et dont le score additif garde la marge MARGIN est admise comme
+normale ; les autres (ambiguës) sont scorées par la forêt. Une feature constante à l'entraînement
+(ignorée par les arbres, voir ml/train.py --drop) n'est pas bornée.
+"""
+
+from typing import List, Optional
+
+# numpy est importé dans les méthodes (voir ml/anomaly_detector.py)
+
+# Part des lignes normales d'entraînement laissée hors des seuils, de chaque côté de chaque feature
+QUANTILE = 0.01
+# Classes de quantiles par feature du modèle additif
+BINS = 16
+# Passes d'ajustement du modèle additif (backfitting)
+ITERATIONS = 10
+# Marge exigée sur le score additif (decision_function estimée, > 0 = normal)
+MARGIN = 0.02
+# En dessous, pas de portique : toutes les lignes vont à la forêt
+MIN_ROWS = 200
+# Compteurs de patterns d'attaque (extract_features) : toujours bornés à 0
+PATTERN_FEATURES = range(4, 9)
+
+
+class BenignGate:
+    """
+    Seuils par feature (None = non bornée) et modèle additif de la decision_function de la forêt :
+    intercept + somme des tables[j][classe de la feature j]
+    """
+
+    def __init__(self, low: list, high: list, edges: list, tables: list, intercept: float):
+        import numpy as np
+
+        self.low = np.array([-np.inf if v is None else v for v in low], dtype=np.float64)
+        self.high = np.array([np.inf if v is None else v for v in high], dtype=np.float64)
+        self.edges = [np.asarray(e, dtype=np.float64) for e in edges]
+        self.tables = [np.asarray(t, dtype=np.float64) for t in tables]
+        self.intercept = float(intercept)
+
+    @classmethod
+    def learn(cls, X, decision) -> Optional["BenignGate"]:
+        """
+        Portique appris sur les features d'entraînement X et la decision_function de la forêt
+        sur ces mêmes lignes (None si trop peu de lignes normales sans pattern)
+        """
+        import numpy as np
+
+        X = np.asarray(X, dtype=np.float64)
+        decision = np.asarray(decision, dtype=np.float64)
+        pattern_columns = list(PATTERN_FEATURES)
+        # Colonne constante sur tout l'entraînement : jamais choisie par les arbres
+        constant = X.min(axis=0) == X.max(axis=0)
+        normal = (decision >= 0) & ~(X[:, pattern_columns] > 0).any(axis=1)
+        X, decision = X[normal], decision[normal]
+        if len(X) < MIN_ROWS:
+            return None
+
+        low = np.quantile(X, QUANTILE, axis=0)
+        high = np.quantile(X, 1 - QUANTILE, axis=0)
+        unbounded = constant.copy()
+        unbounded[pattern_columns] = False
+        low[pattern_columns] = high[pattern_columns] = 0.0
+
+        # Modèle additif ajusté sur les lignes admises (backfitting : chaque table sur le résidu des autres)
+        inside = ((X >= low) | unbounded).all(axis=1) & ((X <= high) | unbounded).all(axis=1)
+        X, decision = X[inside], decision[inside]
+        edges, tables, classes = [], [], []
+        for j in range(X.shape[1]):
+            e = np.unique(np.quantile(X[:, j], np.linspace(0, 1, BINS + 1)[1:-1]))
+            if unbounded[j]:
+                e = e[:0]
+            edges.append(e)
+            tables.append(np.zeros(len(e) + 1))
+            classes.append(np.searchsorted(e, X[:, j]))
+        intercept = float(decision.mean())
+        residual = decision - intercept
+        for _ in range(ITERATIONS):
+            for j, c in enumerate(classes):
+                residual += tables[j][c]
+                counts = np.bincount(c, minlength=len(tables[j]))
+                sums = np.bincount(c, residual, minlength=len(tables[j]))
+                tables[j] = np.where(counts > 0, sums / np.maximum(counts, 1), 0.0)
+                residual -= tables[j][c]
+
+        return cls([None if u else float(v) for u, v in zip(unbounded, low)],
+                   [None if u else float(v) for u, v in zip(unbounded, high)],
+                   edges, tables, intercept)
+
+    def estimate(self, X):
+        """decision_function estimée de chaque ligne (modèle additif)"""
+        import numpy as np
+
+        decision = np.full(len(X), self.intercept)
+        for j, (e, table) in enumerate(zip(self.edges, self.tables)):
+            if len(e):
+                decision += table.take(np.searchsorted(e, X[:, j]))
+        return decision
+
+    def admit(self, X):
+        """(lignes admises sans la forêt, decision_function estimée) pour la matrice de features X"""
+        import numpy as np
+
+        X = np.asarray(X, dtype=np.float64)
+        decision = self.estimate(X)
+        admitted = (X >= self.low).all(axis=1) & (X <= self.high).all(axis=1) & (decision >= MARGIN)
+        return admitted, decision
+
+    def to_dict(self) -> dict:
+        """Forme JSON (enregistrée avec la version du modèle, voir AnomalyDetector.save_model)"""
+        import numpy as np
+
+        return {
+            "low": [None if np.isinf(v) else float(v) for v in self.low],
+            "high": [None if np.isinf(v) else float(v) for v in self.high],
+            "edges": [e.tolist() for e in self.edges],
+            "tables": [t.tolist() for t in self.tables],
+            "intercept": self.intercept,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BenignGate":
+        return cls(data["low"], data["high"], data["edges"], data["tables"], data["intercept"])
+
+
+def audit_positions(passed: int, admitted: int, every: int) -> List[int]:
+    """
+    Positions (parmi `admitted` lignes admises) contrôlées par la forêt : une ligne admise
+    sur `every`, comptée sur tout le flux (`passed` lignes admises avant ce lot)
+    """
+    if every <= 0:
+        return []
+    first = (-passed - 1) % every
+    return list(range(first, admitted, every))
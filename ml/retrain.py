@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Ré-entraînement du modèle ML sans redémarrer le SIEM.
+
+Ce script, lancé dans un processus à part : entraîne un modèle candidat, le valide sur un
+jeu mis de côté (faux positifs sur du trafic normal, détection sur des attaques générées),
+le compare au modèle en service sur ce même jeu et l'écrit dans <out>/ avec son rapport
+(anomaly_model.json). Code de sortie 0 = candidat accepté, 2 = rejeté.
+
+RetrainService, dans le moteur : lance ce script périodiquement (RETRAIN_INTERVAL) ou à la
+demande, remplace à chaud le modèle du détecteur (AnomalyDetector.swap) puis le garde en
+probation sur le trafic réel. Si la distribution des scores régresse, l'ancien modèle est
+rétabli ; sinon les fichiers du modèle en service sont remplacés (adoption).
+
+    python ml/retrain.py --out ml/models/essai                      # données synthétiques
+    python ml/retrain.py --out ml/models/essai --data ml/data/corpus.enc --baseline ml/anomaly_model.pkl
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import threading
+import subprocess
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import List, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from config.settings import settings
+from core.metrics import metrics
+
+# Part des lignes normales gardée pour la validation
+HOLDOUT = 0.2
+# Recul toléré par rapport au modèle en service sur le jeu de validation
+# (deux modèles entraînés sur des tirages différents varient d'environ ±4 points en détection)
+TOLERANCE = 0.05
+# Dossiers de candidats conservés dans RETRAIN_DIR (les plus récents)
+KEEP_VERSIONS = 5
+# Classes de scores pour l'indice de stabilité (PSI)
+PSI_BINS = 10
+# Fichiers d'un modèle, dans l'ordre de remplacement à l'adoption : les pickles d'abord,
+# la forêt exportée ensuite (plus récente, donc chargée en priorité), la version en dernier
+MODEL_FILES = ("anomaly_model.pkl", "scaler.pkl", "anomaly_model.npz", "anomaly_model.json")
+
+
+def evaluate(detector, normal: List[str], attacks: List[str]) -> dict:
+    """Taux de faux positifs (lignes normales signalées) et de détection (attaques signalées)"""
+    fp = sum(is_anomaly for is_anomaly, _ in detector.predict_batch(normal))
+    tp = sum(is_anomaly for is_anomaly, _ in detector.predict_batch(attacks))
+    return {"fp_rate": round(fp / max(len(normal), 1), 4), "tp_rate": round(tp / max(len(attacks), 1), 4)}
+
+
+def train_candidate(out_dir: str, version: str, data_path: str = None, baseline: tuple = None,
+                    seed: int = 0) -> dict:
+    """
+    Entraîne et valide un candidat dans `out_dir` ; retourne son rapport (aussi écrit
+    dans anomaly_model.json). `baseline` : (modèle, scaler) du modèle en service
+    """
+    from ml.anomaly_detector import AnomalyDetector
+    from ml.corpus import load_lines
+    from ml.train import generate_normal_logs, generate_attack_logs
+
+    # Données synthétiques : 5000 lignes d'entraînement après la mise de côté, comme ml/train.py
+    lines = load_lines(data_path) if data_path else generate_normal_logs(int(5000 / (1 - HOLDOUT)))
+    random.Random(seed).shuffle(lines)
+    n_test = max(1, int(len(lines) * HOLDOUT))
+    test_normal, train_lines = lines[:n_test], lines[n_test:]
+    # Mêmes attaques à chaque ré-entraînement : les rapports successifs restent comparables
+    random.seed(seed)
+    attacks = generate_attack_logs(500)
+
+    os.makedirs(out_dir, exist_ok=True)
+    candidate = AnomalyDetector(model_path=os.path.join(out_dir, MODEL_FILES[0]),
+                                scaler_path=os.path.join(out_dir, MODEL_FILES[1]))
+    started = time.perf_counter()
+    candidate.train(train_lines, contamination=0.01)
+    candidate.swap(candidate.current._replace(version=version))
+    report = {
+        "trained_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "data": data_path or "synthetic",
+        "train_lines": len(train_lines),
+        "test_lines": len(test_normal),
+        "attack_lines": len(attacks),
+        "train_sec": round(time.perf_counter() - started, 1),
+        **evaluate(candidate, test_normal, attacks),
+    }
+
+    reasons = []
+    if report["fp_rate"] > settings.RETRAIN_MAX_FP:
+        reasons.append(f"faux positifs {report['fp_rate']:.1%} > {settings.RETRAIN_MAX_FP:.1%}")
+    if report["tp_rate"] < settings.RETRAIN_MIN_TP:
+        reasons.append(f"détection {report['tp_rate']:.1%} < {settings.RETRAIN_MIN_TP:.1%}")
+    if baseline:
+        current = AnomalyDetector(model_path=baseline[0], scaler_path=baseline[1])
+        if current.is_trained:
+            report["baseline"] = {"version": current.version, **evaluate(current, test_normal, attacks)}
+            if report["fp_rate"] > report["baseline"]["fp_rate"] + TOLERANCE:
+                reasons.append(f"faux positifs {report['fp_rate']:.1%} (en service: "
+                               f"{report['baseline']['fp_rate']:.1%})")
+            if report["tp_rate"] < report["baseline"]["tp_rate"] - TOLERANCE:
+                reasons.append(f"détection {report['tp_rate']:.1%} (en service: "
+                               f"{report['baseline']['tp_rate']:.1%})")
+    report["accepted"] = not reasons
+    report["reasons"] = reasons
+    candidate.save_model(meta=report)
+    return {**report, "version": version}
+
+
+def population_stability(expected: List[float], actual: List[float], bins: int = PSI_BINS) -> float:
+    """
+    Indice de stabilité (PSI) entre deux échantillons de scores dans [0, 1] :
+    < 0.1 stable, 0.1-0.25 changement modéré, > 0.25 changement marqué
+    """
+    def shares(scores):
+        counts = [0] * bins
+        for score in scores:
+            counts[min(int(score * bins), bins - 1)] += 1
+        total = max(len(scores), 1)
+        # Classe vide : proportion plancher, le logarithme reste défini
+        return [max(c / total, 1e-4) for c in counts]
+
+    return sum((a - e) * math.log(a / e) for e, a in zip(shares(expected), shares(actual)))
+
+
+class ScoreMonitor:
+    """
+    Scores ML observés en direct par version de modèle : les `window` derniers de chaque
+    version (les MAX_VERSIONS dernières versions vues). Alimenté par DetectionPipeline
+    (score / score_batch) depuis le thread de détection, lu par RetrainService
+    """
+    MAX_VERSIONS = 3
+
+    def __init__(self, window: int = 5000):
+        self.window = max(1, window)
+        self.scores: "OrderedDict[str, deque]" = OrderedDict()
+        self.alerts: "OrderedDict[str, deque]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def observe(self, version: Optional[str], results: list):
+        if version is None or not results:
+            return
+        with self._lock:
+            if version not in self.scores:
+                self.scores[version] = deque(maxlen=self.window)
+                self.alerts[version] = deque(maxlen=self.window)
+                while len(self.scores) > self.MAX_VERSIONS:
+                    self.scores.popitem(last=False)
+                    self.alerts.popitem(last=False)
+            # Même condition d'alerte ML que DetectionPipeline.build_result
+            self.scores[version].extend(score for _, score in results)
+            self.alerts[version].extend(is_anomaly and score > 0.50 for is_anomaly, score in results)
+
+    def sample(self, version: Optional[str]) -> List[float]:
+        with self._lock:
+            return list(self.scores.get(version, ()))
+
+    def summary(self, version: Optional[str]) -> dict:
+        with self._lock:
+            alerts = self.alerts.get(version, ())
+            return {"lines": len(alerts), "alert_rate": round(sum(alerts) / max(len(alerts), 1), 4)}
+
+
+class RetrainService:
+    """
+    Ré-entraînement en arrière-plan avec remplacement à chaud du modèle.
+    Cycle : entraînement + validation dans un processus à part (ce script, priorité basse)
+    -> remplacement du modèle du détecteur (une affectation, l'ingestion continue)
+    -> probation sur RETRAIN_PROBATION_LINES lignes réelles -> adoption, ou retour arrière
+    si le taux d'alertes ML augmente ou si la distribution des scores change trop (PSI).
+    Le modèle sur disque n'est remplacé qu'à l'adoption : un redémarrage pendant la
+    probation repart de l'ancien modèle
+    """
+
+    def __init__(self, detector, interval: float = None, data_path: str = None,
+                 models_dir: str = None, notify=None):
+        self.detector = detector
+        self.interval = settings.RETRAIN_INTERVAL if interval is None else interval
+        self.data_path = settings.RETRAIN_DATA if data_path is None else data_path
+        self.models_dir = models_dir or settings.RETRAIN_DIR
+        self.notify = notify or (lambda msg: None)
+        self.monitor = ScoreMonitor(settings.RETRAIN_PROBATION_LINES)
+        self.status = "idle"            # idle, training, probation
+        self.candidate = None           # Rapport du dernier candidat
+        self.previous = None            # ModelState remplacé, gardé pendant la probation
+        self.history = deque(maxlen=20)
+        self.running = False
+        self.thread = None
+        self._wake = threading.Event()
+        self._pending = False
+        self._process = None
+        self._next_run = 0.0
+
+    def start(self):
+        if self.running: return
+        self.running = True
+        self._next_run = time.time() + self.interval
+        self.thread = threading.Thread(target=self._run, name="ml-retrain", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if not self.running: return
+        self.running = False
+        self._wake.set()
+        process = self._process
+        if process and process.poll() is None:
+            process.kill()
+        if self.thread:
+            self.thread.join(timeout=2)
+
+    def request(self):
+        """Ré-entraînement à la demande (dashboard, SIGUSR1) ; différé si une probation est en cours"""
+        self._wake.set()
+
+    def _run(self):
+        while self.running:
+            if self._wake.wait(1.0):
+                self._wake.clear()
+                self._pending = True
+            if not self.running:
+                break
+            try:
+                if self.status == "probation":
+                    self._check_probation()
+                due = self.interval > 0 and time.time() >= self._next_run
+                if (self._pending or due) and self.status == "idle":
+                    self._pending = False
+                    self._next_run = time.time() + self.interval
+                    self.retrain()
+            except Exception as e:
+                print(f"[ML] Erreur ré-entraînement: {e}")
+                self.status = "idle"
+
+    def retrain(self) -> bool:
+        """Entraîne un candidat (processus séparé) et, s'il est validé, le met en service en probation"""
+        from ml.anomaly_detector import AnomalyDetector
+
+        version = datetime.now().strftime("%Y%m%d-%H%M%S")
+        out_dir = os.path.join(self.models_dir, version)
+        cmd = [sys.executable, os.path.abspath(__file__), "--out", out_dir, "--version", version]
+        if self.data_path:
+            cmd += ["--data", self.data_path]
+        if os.path.exists(self.detector.model_path) and os.path.exists(self.detector.scaler_path):
+            cmd += ["--baseline", self.detector.model_path, "--baseline-scaler", self.detector.scaler_path]
+
+        self.status = "training"
+        self.notify(f"[ML] Ré-entraînement du modèle {version}...")
+        try:
+            self._process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                             preexec_fn=_lower_priority if os.name == "posix" else None)
+            try:
+                _, stderr = self._process.communicate(timeout=settings.RETRAIN_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                _, stderr = self._process.communicate()
+            returncode = self._process.returncode
+        finally:
+            self._process = None
+        if not self.running:
+            self.status = "idle"
+            return False
+
+        report = _read_report(os.path.join(out_dir, MODEL_FILES[3]))
+        if report is None:
+            error = (stderr or "").strip().splitlines()[-1:] or [f"code {returncode}"]
+            return self._finish(version, "failed", error[0])
+        # Rapport sans les tables du portique (lues avec le modèle)
+        self.candidate = {**{k: v for k, v in report.items() if k != "gate"}, "version": version}
+        if returncode != 0 or not report.get("accepted"):
+            return self._finish(version, "rejected", "; ".join(report.get("reasons", [])))
+
+        candidate = AnomalyDetector(model_path=os.path.join(out_dir, MODEL_FILES[0]),
+                                    scaler_path=os.path.join(out_dir, MODEL_FILES[1]))
+        if not candidate.is_trained:
+            return self._finish(version, "failed", "chargement du candidat impossible")
+        self.previous = self.detector.swap(candidate.current)
+        self.status = "probation"
+        self._event(version, "probation", f"faux positifs {report['fp_rate']:.1%}, "
+                                          f"détection {report['tp_rate']:.1%}")
+        return True
+
+    def _check_probation(self):
+        version = self.candidate["version"]
+        live = self.monitor.summary(version)
+        if live["lines"] < self.monitor.window:
+            return
+        reasons = []
+        baseline = self.monitor.summary(self.previous.version) if self.previous.model is not None else None
+        # Ancien modèle sans assez de trafic scoré : pas de référence, seule la validation compte
+        if baseline and baseline["lines"] >= self.monitor.window // 2:
+            if live["alert_rate"] > baseline["alert_rate"] + settings.RETRAIN_MAX_ALERT_DELTA:
+                reasons.append(f"alertes ML {live['alert_rate']:.1%} (avant: {baseline['alert_rate']:.1%})")
+            psi = population_stability(self.monitor.sample(self.previous.version), self.monitor.sample(version))
+            if psi > settings.RETRAIN_MAX_PSI:
+                reasons.append(f"distribution des scores modifiée (PSI {psi:.2f})")
+        self.candidate["live"] = {**live, "baseline": baseline}
+
+        if reasons:
+            # Retour arrière, sauf si le modèle a été remplacé entre-temps (rechargement manuel)
+            if self.detector.current.version == version:
+                self.detector.swap(self.previous)
+            self._finish(version, "rolled_back", "; ".join(reasons))
+        else:
+            self._promote(os.path.join(self.models_dir, version))
+            self._finish(version, "promoted", f"alertes ML {live['alert_rate']:.1%} sur {live['lines']} lignes")
+        self.previous = None
+
+    def _promote(self, model_dir: str):
+        """Remplace les fichiers du modèle en service (chacun atomiquement, voir MODEL_FILES)"""
+        targets = (self.detector.model_path, self.detector.scaler_path,
+                   self.detector.forest_path, self.detector.meta_path)
+        for name, target in zip(MODEL_FILES, targets):
+            tmp = f"{target}.tmp"
+            shutil.copyfile(os.path.join(model_dir, name), tmp)
+            os.replace(tmp, target)
+
+    def _finish(self, version: str, event: str, detail: str) -> bool:
+        self.status = "idle"
+        self._event(version, event, detail)
+        self._prune()
+        return event == "promoted"
+
+    def _event(self, version: str, event: str, detail: str):
+        self.history.append({"time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                             "version": version, "event": event, "detail": detail})
+        if metrics.enabled:
+            metrics.inc("model_retrain", result=event)
+        labels = {"probation": "en probation", "promoted": "adopté", "rolled_back": "retour arrière",
+                  "rejected": "rejeté", "failed": "échec"}
+        self.notify(f"[ML] Modèle {version} {labels[event]}: {detail}")
+
+    def _prune(self):
+        """Garde les KEEP_VERSIONS candidats les plus récents (noms horodatés)"""
+        try:
+            names = sorted(n for n in os.listdir(self.models_dir)
+                           if os.path.isdir(os.path.join(self.models_dir, n)))
+        except OSError:
+            return
+        for name in names[:-KEEP_VERSIONS]:
+            shutil.rmtree(os.path.join(self.models_dir, name), ignore_errors=True)
+
+    def stats(self) -> dict:
+        version = self.detector.current.version
+        return {
+            "version": version,
+            "status": self.status,
+            "live": self.monitor.summary(version),
+            "candidate": self.candidate,
+            "history": list(self.history),
+        }
+
+
+def _lower_priority():
+    os.nice(10)
+
+
+def _read_report(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Entraîne et valide un modèle ML candidat")
+    parser.add_argument("--out", required=True, help="Dossier du candidat")
+    parser.add_argument("--version", help="Version du candidat (défaut: date et heure)")
+    parser.add_argument("--data", help="Corpus (.enc) ou lignes d'entraînement (défaut: données synthétiques)")
+    parser.add_argument("--baseline", help="Modèle en service (.pkl), comparé sur le même jeu de validation")
+    parser.add_argument("--baseline-scaler", help="Scaler du modèle en service (défaut: scaler.pkl à côté)")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        baseline = (args.baseline, args.baseline_scaler or os.path.join(os.path.dirname(args.baseline), "scaler.pkl"))
+    version = args.version or datetime.now().strftime("%Y%m%d-%H%M%S")
+    report = train_candidate(args.out, version, args.data, baseline)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0 if report["accepted"] else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
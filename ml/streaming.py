@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Détecteur d'anomalies en ligne : Half-Space Trees (Tan, Ting & Liu, 2011) en NumPy,
+sur les 13 features d'AnomalyDetector.extract_features.
+
+La forêt d'isolement est entraînée une fois puis figée ; ce modèle apprend en continu,
+lot par lot, en mémoire constante. Les arbres sont aléatoires et fixés à la création
+(aucun entraînement) ; chaque noeud compte les lignes qui le traversent. Le profil de
+référence est celui de la fenêtre précédente (HST_WINDOW lignes) : une ligne est anormale
+quand elle tombe dans une région peu peuplée de ce profil. À chaque fin de fenêtre, le
+profil de la fenêtre écoulée remplace la référence : le modèle suit la dérive du trafic.
+
+ML_MODEL choisit le détecteur du moteur (create_detector) :
+    iforest  forêt d'isolement seule (défaut)
+    hst      Half-Space Trees seuls (pas de ré-entraînement : le modèle s'adapte seul)
+    both     les deux : une ligne est anormale si l'un des deux la signale, score = le plus élevé
+"""
+
+import os
+import time
+import threading
+from typing import List, Optional, Tuple
+
+from config.settings import settings
+from ml.anomaly_detector import AnomalyDetector, ModelState
+
+# numpy est importé dans les méthodes (voir ml/anomaly_detector.py) : l'import du module reste immédiat
+
+FORMAT_VERSION = 1
+MODES = ("iforest", "hst", "both")
+# Version des alertes scorées par le modèle en ligne seul (il change à chaque fenêtre, sans version propre)
+VERSION = "hst"
+# Un noeud dont la référence compte au plus size_limit x fenêtre lignes arrête la descente
+SIZE_LIMIT = 0.1
+# Part de la fenêtre écoulée au-dessous du seuil d'anomalie (comme la contamination de la forêt)
+CONTAMINATION = 0.01
+# Pente de la calibration : masse = seuil -> 0.5, masse = seuil / 2 -> 0.8
+SLOPE = 2.0
+# Étendue minimale d'une feature : une feature constante sur la première
+# fenêtre (patterns d'attaque à 0) reste séparable des valeurs non nulles
+MIN_SPAN = 1.0
+# Enregistrement de l'état au plus toutes les SAVE_INTERVAL secondes (en fin de fenêtre) et à l'arrêt
+SAVE_INTERVAL = 300
+# Graine des arbres (comme random_state de la forêt) : deux rejeux du même archive donnent les mêmes scores
+SEED = 42
+
+
+class HalfSpaceTrees:
+    """
+    Modèle Half-Space Trees : n_trees arbres binaires complets de profondeur `depth`,
+    stockés à plat (enfants de i : 2i + 1 et 2i + 2). Les features sont ramenées à [0, 1]
+    avec les bornes de la première fenêtre ; chaque arbre découpe
+    un espace de travail tiré au hasard autour de [0, 1] (au milieu d'une dimension au hasard
+    à chaque noeud). Mémoire fixe : deux profils de masses (référence, fenêtre en cours)
+    et les lignes de la fenêtre en cours (calibration du seuil)
+    """
+
+    def __init__(self, n_features: int = 13, n_trees: int = 50, depth: int = 10, window: int = 2048,
+                 seed: int = None):
+        import numpy as np
+
+        self.n_features = n_features
+        self.n_trees = n_trees
+        self.depth = depth
+        self.window = window
+        self.n_nodes = 2 ** (depth + 1) - 1
+        self.feature, self.value = self._build(np.random.default_rng(seed))
+        self.ref = np.zeros((n_trees, self.n_nodes))
+        self.latest = np.zeros((n_trees, self.n_nodes))
+        self.buffer = np.zeros((window, n_features))     # Lignes de la fenêtre en cours
+        self.count = 0                                   # Lignes dans la fenêtre en cours
+        self.windows = 0                                 # Fenêtres terminées
+        self.lo = np.zeros(n_features)
+        self.span = np.ones(n_features)
+        self.threshold = 0.0
+
+    @property
+    def ready(self) -> bool:
+        """Vrai dès la fin de la première fenêtre (bornes et profil de référence connus)"""
+        return self.windows > 0
+
+    def _build(self, rng):
+        """Dimension et valeur de coupe de chaque noeud interne, niveau par niveau"""
+        import numpy as np
+
+        n_internal = 2 ** self.depth - 1
+        trees = np.arange(self.n_trees)[:, None]
+        # Espace de travail de chaque arbre : [s - r, s + r], s ~ U(0, 1), r = 2 max(s, 1 - s)
+        s = rng.random((self.n_trees, self.n_features))
+        r = 2 * np.maximum(s, 1 - s)
+        low = np.empty((self.n_trees, n_internal, self.n_features))
+        high = np.empty_like(low)
+        low[:, 0], high[:, 0] = s - r, s + r
+        feature = rng.integers(0, self.n_features, size=(self.n_trees, n_internal))
+        value = np.empty((self.n_trees, n_internal))
+        for level in range(self.depth):
+            nodes = np.arange(2 ** level - 1, 2 ** (level + 1) - 1)
+            q = feature[:, nodes]
+            mid = (low[trees, nodes, q] + high[trees, nodes, q]) / 2
+            value[:, nodes] = mid
+            if level < self.depth - 1:
+                for child, bound in ((2 * nodes + 1, high), (2 * nodes + 2, low)):
+                    low[:, child], high[:, child] = low[:, nodes], high[:, nodes]
+                    bound[trees, child, q] = mid
+        return feature, value
+
+    def paths(self, X):
+        """
+        Noeuds traversés (niveau, arbre, ligne) par les lignes X (features non normalisées),
+        en indices à plat dans un profil ; réutilisables par score() et update() une fois prêt
+        """
+        import numpy as np
+
+        U = (X - self.lo) / self.span
+        rows = np.arange(len(U))[None, :]
+        trees = np.arange(self.n_trees)[:, None]
+        node = np.zeros((self.n_trees, len(U)), dtype=np.intp)
+        paths = [node]
+        for _ in range(self.depth):
+            go_right = U[rows, self.feature[trees, node]] > self.value[trees, node]
+            node = 2 * node + 1 + go_right
+            paths.append(node)
+        return np.stack(paths) + trees * self.n_nodes
+
+    def masses(self, X, exclude_self: bool = False, paths=None):
+        """
+        Score de masse de chaque ligne (élevé = région dense = normal) : somme sur les arbres
+        de ref[noeud] x 2^niveau, au premier noeud du chemin peu peuplé (<= size_limit) ou à la feuille.
+        exclude_self : lignes déjà comptées dans la référence (calibration), chacune s'en retire
+        """
+        import numpy as np
+
+        M = self.ref.ravel().take(self.paths(X) if paths is None else paths)
+        if exclude_self:
+            M = M - 1
+        small = M <= SIZE_LIMIT * self.window
+        stop = np.where(small.any(axis=0), small.argmax(axis=0), self.depth)
+        mass = np.take_along_axis(M, stop[None], axis=0)[0] * 2.0 ** stop
+        return mass.sum(axis=0)
+
+    def score(self, X, paths=None):
+        """(anomalie, score 0-1) de chaque ligne ; masse au seuil de la référence -> 0.5"""
+        mass = self.masses(X, paths=paths)
+        scores = 1.0 / (1.0 + ((mass + 1) / (self.threshold + 1)) ** SLOPE)
+        return mass < self.threshold, scores
+
+    def update(self, X, paths=None):
+        """Ajoute les lignes à la fenêtre en cours ; une fenêtre pleine devient la référence"""
+        start = 0
+        while start < len(X):
+            take = min(self.window - self.count, len(X) - start)
+            part = X[start:start + take]
+            self.buffer[self.count:self.count + take] = part
+            self.count += take
+            if self.ready:
+                self._add(self.latest, self.paths(part) if paths is None else paths[:, :, start:start + take])
+            start += take
+            if self.count == self.window:
+                self._end_window()
+
+    def _add(self, profile, paths):
+        import numpy as np
+
+        profile += np.bincount(paths.ravel(), minlength=profile.size).reshape(profile.shape)
+
+    def _end_window(self):
+        import numpy as np
+
+        if not self.ready:
+            # Première fenêtre : bornes de normalisation, puis son profil
+            self.lo = self.buffer.min(axis=0)
+            self.span = np.maximum(self.buffer.max(axis=0) - self.lo, MIN_SPAN)
+            self._add(self.latest, self.paths(self.buffer))
+        self.ref, self.latest = self.latest, self.ref
+        self.latest[:] = 0
+        # Seuil : quantile `CONTAMINATION` des masses de la fenêtre écoulée dans sa propre référence
+        self.threshold = float(np.quantile(self.masses(self.buffer, exclude_self=True), CONTAMINATION))
+        self.count = 0
+        self.windows += 1
+
+    def params(self) -> tuple:
+        return self.n_features, self.n_trees, self.depth, self.window
+
+    def save(self, path: str):
+        import numpy as np
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, version=FORMAT_VERSION, params=np.array(self.params()), feature=self.feature,
+                     value=self.value, ref=self.ref, latest=self.latest, buffer=self.buffer[:self.count],
+                     windows=self.windows, lo=self.lo, span=self.span, threshold=self.threshold)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "HalfSpaceTrees":
+        import numpy as np
+
+        with np.load(path) as data:
+            if int(data["version"]) != FORMAT_VERSION:
+                raise ValueError(f"Format HST {int(data['version'])} non supporté")
+            n_features, n_trees, depth, window = (int(v) for v in data["params"])
+            model = cls.__new__(cls)
+            model.n_features, model.n_trees, model.depth, model.window = n_features, n_trees, depth, window
+            model.n_nodes = 2 ** (depth + 1) - 1
+            model.feature, model.value = data["feature"], data["value"]
+            model.ref, model.latest = data["ref"], data["latest"]
+            model.count = len(data["buffer"])
+            model.buffer = np.zeros((window, n_features))
+            model.buffer[:model.count] = data["buffer"]
+            model.windows = int(data["windows"])
+            model.lo, model.span = data["lo"], data["span"]
+            model.threshold = float(data["threshold"])
+        return model
+
+
+class StreamingDetector:
+    """
+    Half-Space Trees avec l'interface d'AnomalyDetector utilisée par le pipeline
+    (is_trained, current, predict, predict_batch). Chaque lot est scoré puis appris
+    (les lignes contenant un pattern d'attaque ne sont pas apprises). Avant la fin de la
+    première fenêtre, seul le boost des patterns s'applique.
+    Le pipeline passe ici chaque ligne scorée, copies répétées comprises : le cache des verdicts
+    ne garde pas le score ML (core/verdict_cache.py), les profils comptent donc tout le trafic.
+    Avec `forest` (ML_MODEL=both), la forêt d'isolement score les mêmes features :
+    anomalie si l'un des deux modèles la signale, score = le plus élevé. La forêt reste
+    ré-entraînable à chaud (ml/retrain.py) ; current et la version des alertes sont les siens.
+    Avec `path`, l'état est rechargé au démarrage et enregistré en fin de fenêtre
+    (au plus toutes les SAVE_INTERVAL s) et à l'arrêt (close)
+    """
+
+    def __init__(self, path: str = None, forest: AnomalyDetector = None, n_trees: int = None,
+                 depth: int = None, window: int = None, seed: int = SEED, background: bool = False):
+        self.path = path
+        self.forest = forest
+        # Extraction des features : celle de la forêt, ou un extracteur sans modèle
+        self.extractor = forest or AnomalyDetector(load=False)
+        self.params = (13, n_trees or settings.HST_TREES, depth or settings.HST_DEPTH,
+                       window or settings.HST_WINDOW)
+        self.seed = seed
+        self.hst: Optional[HalfSpaceTrees] = None
+        self.saved_at = time.time()
+        self._loaded = threading.Event()
+        if background:
+            threading.Thread(target=self._load_in_background, name="hst-warmup", daemon=True).start()
+        else:
+            self._load_in_background()
+
+    def _load_in_background(self):
+        try:
+            self.hst = self._restore()
+        finally:
+            if self.hst is None:
+                n_features, n_trees, depth, window = self.params
+                self.hst = HalfSpaceTrees(n_features, n_trees, depth, window, self.seed)
+            self._loaded.set()
+
+    def _restore(self) -> Optional[HalfSpaceTrees]:
+        """État enregistré, s'il existe et a les paramètres courants (sinon le modèle repart de zéro)"""
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            hst = HalfSpaceTrees.load(self.path)
+        except Exception as e:
+            print(f"[ML] Erreur chargement état HST {self.path}: {e}")
+            return None
+        if hst.params() != self.params:
+            print(f"[ML] Paramètres HST modifiés : état {self.path} ignoré")
+            return None
+        return hst
+
+    @property
+    def is_trained(self) -> bool:
+        # Toujours prêt à recevoir des lignes : le modèle apprend dès la première
+        self._loaded.wait()
+        return True
+
+    @property
+    def current(self) -> ModelState:
+        self._loaded.wait()
+        if self.forest is None:
+            return ModelState(self.hst, None, VERSION)
+        return self.forest.current
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.current.version
+
+    def predict(self, log_line: str, state: ModelState = None) -> Tuple[bool, float]:
+        return self.predict_batch([log_line], state)[0]
+
+    def predict_batch(self, log_lines: List[str], state: ModelState = None) -> List[Tuple[bool, float]]:
+        if not log_lines:
+            return []
+        import numpy as np
+        try:
+            X = np.vstack([self.extractor.extract_features(line)[0] for line in log_lines])
+        except Exception:
+            # Repli ligne par ligne (une ligne invalide ne doit pas faire échouer le lot)
+            if len(log_lines) == 1:
+                return [(False, 0.0)]
+            return [self.predict(line, state) for line in log_lines]
+        return self.predict_features(X, state)
+
+    def predict_features(self, X, state: ModelState = None) -> List[Tuple[bool, float]]:
+        """Score puis apprentissage d'un lot de features (une ligne par log)"""
+        import numpy as np
+
+        X = np.asarray(X, dtype=np.float64)
+        hst = self.hst
+        # Même boost que AnomalyDetector.predict lorsqu'un pattern critique est présent (indices 4 à 8)
+        pattern_detected = (X[:, 4:9] > 0).any(axis=1)
+        # Chemins calculés une fois, pour le score et l'apprentissage (normalisation fixée une fois prêt)
+        paths = hst.paths(X) if hst.ready else None
+        if hst.ready:
+            is_anomaly, scores = hst.score(X, paths)
+            is_anomaly = is_anomaly | pattern_detected
+            scores = np.where(pattern_detected, np.maximum(scores, 0.75), scores)
+        else:
+            is_anomaly, scores = pattern_detected, np.where(pattern_detected, 0.75, 0.0)
+
+        windows = hst.windows
+        learn = ~pattern_detected
+        hst.update(X[learn], paths[:, :, learn] if paths is not None else None)
+        if self.path and hst.windows != windows and time.time() - self.saved_at >= SAVE_INTERVAL:
+            self.save()
+
+        results = [(bool(a), float(s)) for a, s in zip(is_anomaly, scores)]
+        if self.forest is not None:
+            forest = self.forest.predict_features(X, state)
+            results = [(a or fa, max(s, fs)) for (a, s), (fa, fs) in zip(results, forest)]
+        return results
+
+    def save(self):
+        self.saved_at = time.time()
+        try:
+            self.hst.save(self.path)
+        except Exception as e:
+            print(f"[ML] Erreur enregistrement état HST {self.path}: {e}")
+
+    def close(self):
+        """Enregistre l'état (arrêt du moteur)"""
+        self._loaded.wait()
+        if self.path and self.hst is not None:
+            self.save()
+
+    def stats(self) -> dict:
+        hst = self.hst
+        if hst is None:
+            return {"ready": False}
+        return {"ready": hst.ready, "windows": hst.windows, "window": hst.window,
+                "window_lines": hst.count, "threshold": round(hst.threshold, 1)}
+
+
+def create_detector(mode: str = None, model_path: str = None, background: bool = False,
+                    persist: bool = True):
+    """
+    Détecteur ML selon `mode` (ML_MODEL par défaut) : AnomalyDetector (iforest),
+    StreamingDetector (hst) ou StreamingDetector avec la forêt (both).
+    persist=False : l'état du modèle en ligne n'est ni rechargé ni enregistré (rejeu)
+    """
+    mode = (mode or settings.ML_MODEL).lower()
+    if mode not in MODES:
+        raise ValueError(f"ML_MODEL inconnu: {mode} (attendu: {', '.join(MODES)})")
+    forest = AnomalyDetector(model_path=model_path, background=background) if mode != "hst" else None
+    if mode == "iforest":
+        return forest
+    return StreamingDetector(settings.HST_PATH if persist else None, forest, background=background)
@@ -2,18 +2,38 @@
 """
 Script d'entraînement des modèles ML
 Génère des données synthétiques et entraîne le détecteur d'anomalies
+
+Les features sont extraites en parallèle (un processus par coeur) et mises en cache
+dans ml/cache/ (.npy lus en mémoire mappée, clé = empreinte du corpus) : un nouvel
+entraînement ou un balayage d'hyperparamètres sur le même corpus ne les recalcule pas.
+
+    python ml/train.py                           # données synthétiques
+    python ml/train.py --data ml/data/corpus.enc # corpus échantillonné du trafic réel (ml/corpus.py)
+    python ml/train.py --sweep                   # balayage contamination x arbres, rien n'est enregistré
+    python ml/train.py --sweep --drop - 9 0,1    # + features ignorées (aucune, entropie, longueurs)
 """
 
 import sys
 import os
+import time
+import hashlib
 
 # Chemin absolu du dossier racine du projet
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, BASE_DIR)
 
-from ml.anomaly_detector import AnomalyDetector
+from ml.anomaly_detector import AnomalyDetector, FEATURES_VERSION
 import random
 
+CACHE_DIR = os.path.join(BASE_DIR, "ml", "cache")
+# Matrices gardées dans le cache (les moins récemment utilisées sont supprimées)
+CACHE_KEEP = 10
+# Lignes par tâche envoyée aux processus d'extraction
+CHUNK_LINES = 2000
+N_FEATURES = 13
+SWEEP_CONTAMINATION = [0.005, 0.01, 0.02, 0.05]
+SWEEP_ESTIMATORS = [100, 200, 300]
+
 def generate_normal_logs(count: int = 2000) -> list:
     """Génère des logs HTTP normaux (Diversifiés: Custom + Apache CLF)"""
     logs = []
@@ -160,71 +180,215 @@ def generate_attack_logs(count: int = 200) -> list:
     
     return logs
 
-def main():
-    # print("=" * 60)
-    # print("ENTRAÎNEMENT AMÉLIORÉ DU MODÈLE ML - SIEM")
-    # print("=" * 60)
-    
-    # 1. Générer les données
-    # print("\n[1/4] Génération des données d'entraînement (Logs diversifiés)...")
-    train_normal = generate_normal_logs(5000) # Augmenté
-    valid_normal = generate_normal_logs(500)
-    valid_attacks = generate_attack_logs(500)
-    # print(f"  ✓ {len(train_normal)} logs normaux pour l'entraînement")
-    # print(f"  ✓ {len(valid_normal)} logs normaux pour la validation")
-    # print(f"  ✓ {len(valid_attacks)} logs d'attaques pour la validation")
-    
-    # 2. Entraîner le modèle
-    # print("\n[2/4] Entraînement du détecteur d'anomalies (Isolation Forest + Scaler)...")
-    detector = AnomalyDetector()
-    # Contamination (1%)
-    detector.train(train_normal, contamination=0.01)
-    
-    # 3. Évaluation précise
-    # print("\n[3/4] Évaluation de la précision du modèle...")
-    
-    # print("\n  Test sur logs NORMRAUX (Faux Positifs):")
-    fp = 0
-    normal_scores = []
-    for log in valid_normal:
-        is_anomaly, score = detector.predict(log)
-        normal_scores.append(score)
-        if is_anomaly: fp += 1
-    
-    fp_rate = (fp / len(valid_normal)) * 100
-    avg_normal_score = sum(normal_scores) / len(normal_scores)
-    # print(f"    - Taux de Faux Positifs: {fp_rate:.1f}% ({fp}/{len(valid_normal)})")
-    # print(f"    - Score moyen (Normal): {avg_normal_score:.3f}")
-    
-    # print("\n  Test sur logs d'ATTAQUE (Vrais Positifs):")
-    tp = 0
-    attack_scores = []
-    for log in valid_attacks:
-        is_anomaly, score = detector.predict(log)
-        attack_scores.append(score)
-        if is_anomaly: tp += 1
-    
-    tp_rate = (tp / len(valid_attacks)) * 100
-    avg_attack_score = sum(attack_scores) / len(attack_scores)
-    # print(f"    - Taux de Vrais Positifs (Détection): {tp_rate:.1f}% ({tp}/{len(valid_attacks)})")
-    # print(f"    - Score moyen (Attaque): {avg_attack_score:.3f}")
-    
-    # 4. Sauvegarde
-    # print("\n[4/4] Sauvegarde du modèle et du scaler...")
-    detector.save_model()
-    
-    # print("\n" + "=" * 60)
-    # print("RÉSUMÉ FINAL")
-    # print("=" * 60)
+# Extracteur de chaque processus de travail (créé au premier lot, sans charger de modèle)
+_extractor = None
+
+def _featurize_chunk(lines: list):
+    global _extractor
+    import numpy as np
+    if _extractor is None:
+        _extractor = AnomalyDetector(load=False)
+    X = np.empty((len(lines), N_FEATURES))
+    for i, line in enumerate(lines):
+        X[i] = _extractor.extract_features(line)[0]
+    return X
+
+def _workers(n_jobs: int = None) -> int:
+    """Nombre de processus : n_jobs, ou tous les coeurs si None / négatif (comme scikit-learn)"""
+    return n_jobs if n_jobs and n_jobs > 0 else os.cpu_count() or 1
+
+def featurize(lines: list, n_jobs: int = None):
+    """Matrice des features (une ligne par log), extraites par lots dans un pool de processus"""
+    import numpy as np
+    workers = _workers(n_jobs)
+    if workers == 1 or len(lines) <= CHUNK_LINES:
+        return _featurize_chunk(lines)
+    from concurrent.futures import ProcessPoolExecutor
+    chunks = [lines[i:i + CHUNK_LINES] for i in range(0, len(lines), CHUNK_LINES)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        return np.vstack(list(pool.map(_featurize_chunk, chunks)))
+
+def corpus_hash(lines: list) -> str:
+    """Empreinte du corpus (et de la version des features) : clé du cache"""
+    digest = hashlib.sha256(f"features-v{FEATURES_VERSION}\n".encode())
+    for line in lines:
+        digest.update(line.encode("utf-8", "surrogatepass"))
+        digest.update(b"\n")
+    return f"{len(lines)}-{digest.hexdigest()[:16]}"
+
+def load_features(lines: list, cache_dir: str = CACHE_DIR, n_jobs: int = None):
+    """
+    Features de `lines`, lues dans le cache (mémoire mappée, en lecture seule) si le même
+    corpus a déjà été extrait, sinon calculées puis enregistrées. cache_dir None : sans cache
+    """
+    import numpy as np
+    if not cache_dir:
+        return featurize(lines, n_jobs)
+    path = os.path.join(cache_dir, corpus_hash(lines) + ".npy")
+    if os.path.exists(path):
+        os.utime(path)
+        return np.load(path, mmap_mode="r")
+    X = featurize(lines, n_jobs)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, X)
+    os.replace(tmp, path)
+    _prune_cache(cache_dir)
+    return np.load(path, mmap_mode="r")
+
+def _prune_cache(cache_dir: str):
+    files = sorted((os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.endswith(".npy")),
+                   key=os.path.getmtime, reverse=True)
+    for path in files[CACHE_KEEP:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def parse_drop(spec: str) -> tuple:
+    """ "9" / "0,1" -> indices des features ignorées ; "" ou "-" : aucune"""
+    import argparse
+    if spec.strip() in ("", "-"):
+        return ()
+    try:
+        indices = tuple(sorted({int(part) for part in spec.split(",")}))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"indices de features attendus (ex: 9 ou 0,1) : {spec!r}")
+    if any(not 0 <= i < N_FEATURES for i in indices):
+        raise argparse.ArgumentTypeError(f"indices de features entre 0 et {N_FEATURES - 1} : {spec!r}")
+    return indices
+
+def fit(X_train, contamination: float = 0.01, n_estimators: int = 300, drop: tuple = (),
+        n_jobs: int = None) -> AnomalyDetector:
+    """
+    Entraîne un détecteur (non enregistré) sur les features d'entraînement.
+    Les features de `drop` sont mises à zéro : une colonne constante n'est jamais choisie par
+    les arbres, la feature est ignorée sans rien changer au scoring. Une pondération non
+    nulle n'aurait pas d'effet (le StandardScaler la compense)
+    """
+    import numpy as np
+    if drop:
+        X_train = np.array(X_train)
+        X_train[:, list(drop)] = 0.0
+    detector = AnomalyDetector(load=False)
+    detector.train_features(X_train, contamination, n_estimators, n_jobs)
+    return detector
+
+def evaluate(detector: AnomalyDetector, X_normal, X_attacks) -> tuple:
+    """(taux de faux positifs, taux de détection) en %, par lot sur les features de validation"""
+    fp = sum(is_anomaly for is_anomaly, _ in detector.predict_features(X_normal))
+    tp = sum(is_anomaly for is_anomaly, _ in detector.predict_features(X_attacks))
+    return fp / max(len(X_normal), 1) * 100, tp / max(len(X_attacks), 1) * 100
+
+def gate_check(detector: AnomalyDetector, X) -> tuple:
+    """
+    Portique du modèle sur les features X : (part des lignes admises sans la forêt en %,
+    lignes admises que la forêt aurait signalées). Contrôle complet, sans échantillonnage
+    """
+    import numpy as np
+    state = detector.current
+    if state.gate is None or not len(X):
+        return 0.0, 0
+    X = np.asarray(X)
+    admitted, _ = state.gate.admit(X)
+    if not admitted.any():
+        return 0.0, 0
+    decision = state.model.decision_function(state.scaler.transform(X[admitted]))
+    return admitted.mean() * 100, int((decision < 0).sum())
+
+def rating(tp_rate: float, fp_rate: float) -> str:
     if tp_rate > 95 and fp_rate < 5:
-        print("  ÉVALUATION: EXCELLENTE")
-    elif tp_rate > 80 and fp_rate < 10:
-        print("  ÉVALUATION: BONNE")
+        return "EXCELLENTE"
+    if tp_rate > 80 and fp_rate < 10:
+        return "BONNE"
+    return "À AMÉLIORER"
+
+def sweep(X_train, X_valid, X_attacks, contaminations: list, estimators: list, drops: list,
+          n_jobs: int = None) -> list:
+    """Entraîne et évalue chaque combinaison sur les mêmes features ; résultats du meilleur au moins bon"""
+    results = []
+    for drop in drops:
+        for n_estimators in estimators:
+            for contamination in contaminations:
+                t0 = time.perf_counter()
+                detector = fit(X_train, contamination, n_estimators, drop, n_jobs)
+                fp_rate, tp_rate = evaluate(detector, X_valid, X_attacks)
+                results.append({"contamination": contamination, "n_estimators": n_estimators, "drop": drop,
+                                "fp_rate": fp_rate, "tp_rate": tp_rate, "seconds": time.perf_counter() - t0})
+    return sorted(results, key=lambda r: r["fp_rate"] - r["tp_rate"])
+
+def main(argv=None):
+    import argparse
+    import numpy as np
+    parser = argparse.ArgumentParser(description="Entraînement du détecteur d'anomalies")
+    parser.add_argument("--data", help="Corpus (.enc) ou fichier de lignes normales (défaut: données synthétiques)")
+    parser.add_argument("--contamination", type=float, nargs="+", help="Défaut 0.01 (balayage: 0.005 à 0.05)")
+    parser.add_argument("--estimators", type=int, nargs="+", help="Nombre d'arbres (défaut 300, balayage: 100 à 300)")
+    parser.add_argument("--drop", type=parse_drop, nargs="+", default=[()], metavar="INDICES",
+                        help="Features ignorées, ex: 9 ou 0,1 ; '-' : aucune (défaut)")
+    parser.add_argument("--sweep", action="store_true", help="Compare toutes les combinaisons, sans enregistrer")
+    parser.add_argument("--jobs", type=int, default=-1, help="Processus d'extraction et de construction des arbres (-1 = tous les coeurs)")
+    parser.add_argument("--cache", default=CACHE_DIR, help="Dossier du cache des features")
+    parser.add_argument("--no-cache", action="store_true", help="Recalcule les features sans les enregistrer")
+    parser.add_argument("--seed", type=int, default=42, help="Graine des données générées et du découpage")
+    args = parser.parse_args(argv)
+    contaminations = args.contamination or (SWEEP_CONTAMINATION if args.sweep else [0.01])
+    estimators = args.estimators or (SWEEP_ESTIMATORS if args.sweep else [300])
+    if not args.sweep and (len(contaminations) > 1 or len(estimators) > 1 or len(args.drop) > 1):
+        parser.error("plusieurs valeurs : utiliser --sweep")
+
+    # 1. Générer les données (graine fixe : mêmes lignes, features reprises du cache)
+    random.seed(args.seed)
+    if args.data:
+        # Trafic réel : 10 % (500 lignes max) gardées pour mesurer les faux positifs
+        from ml.corpus import load_lines
+        lines = load_lines(args.data)
+        n_valid = min(500, max(1, len(lines) // 10))
     else:
-        print("  ÉVALUATION: À AMÉLIORER")
-        
-    # print(f"\n✓ Entraînement terminé avec succès!")
-    # print("=" * 60)
+        lines = generate_normal_logs(5500) # Augmenté
+        n_valid = 500
+    valid_attacks = generate_attack_logs(500)
+
+    # 2. Features : cache ou extraction parallèle
+    t0 = time.perf_counter()
+    cache_dir = None if args.no_cache else args.cache
+    X_lines = load_features(lines, cache_dir, args.jobs)
+    X_attacks = load_features(valid_attacks, cache_dir, args.jobs)
+    order = np.random.default_rng(args.seed).permutation(len(lines))
+    X_valid, X_train = X_lines[order[:n_valid]], X_lines[order[n_valid:]]
+    print(f"  Corpus: {len(X_train)} lignes d'entraînement, {len(X_valid)} de validation "
+          f"(features en {time.perf_counter() - t0:.1f} s)")
+
+    if args.sweep:
+        results = sweep(X_train, X_valid, X_attacks, contaminations, estimators, args.drop, args.jobs)
+        print(f"  {'Contamination':>13} {'Arbres':>7} {'Ignorées':>9} {'FP %':>6} {'TP %':>6} {'Durée':>7}")
+        for r in results:
+            drop = ",".join(map(str, r["drop"])) or "-"
+            print(f"  {r['contamination']:>13g} {r['n_estimators']:>7} {drop:>9} {r['fp_rate']:>6.1f} "
+                  f"{r['tp_rate']:>6.1f} {r['seconds']:>6.1f}s")
+        best = results[0]
+        print(f"  Meilleur: --contamination {best['contamination']:g} --estimators {best['n_estimators']} "
+              f"--drop {','.join(map(str, best['drop'])) or '-'}")
+        return
+
+    # 3. Entraîner le modèle et l'évaluer par lot
+    detector = fit(X_train, contaminations[0], estimators[0], args.drop[0], args.jobs)
+    fp_rate, tp_rate = evaluate(detector, X_valid, X_attacks)
+    gate_rate, gate_disagreements = gate_check(detector, X_valid)
+    gate_disagreements += gate_check(detector, X_attacks)[1]
+
+    # 4. Sauvegarde (paramètres et évaluation dans anomaly_model.json)
+    detector.save_model(meta={
+        "trained_at": time.strftime("%Y-%m-%d %H:%M:%S"), "data": args.data or "synthetic",
+        "contamination": contaminations[0], "n_estimators": estimators[0],
+        "dropped_features": list(args.drop[0]), "train_lines": len(X_train),
+        "fp_rate": round(fp_rate / 100, 4), "tp_rate": round(tp_rate / 100, 4),
+        "gate_pass_rate": round(gate_rate / 100, 4), "gate_disagreements": gate_disagreements,
+    })
+    print(f"  ÉVALUATION: {rating(tp_rate, fp_rate)} (faux positifs {fp_rate:.1f} %, détection {tp_rate:.1f} %)")
+    print(f"  Portique: {gate_rate:.1f} % des lignes de validation sans la forêt, "
+          f"{gate_disagreements} désaccord(s) avec la forêt")
 
 if __name__ == "__main__":
     main()
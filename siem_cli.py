@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Outils en ligne de commande du SIEM (sans interface graphique)
+
+    python siem_cli.py replay logs/archive/*.enc --since 2026-02-01 --until 2026-02-15 --db replay.db
+    python siem_cli.py replay access.log.gz --db replay.db --json
+    python siem_cli.py stats                # moteur lancé avec METRICS_ENABLED=1
+    python siem_cli.py run                  # moteur sans interface (conteneur, service)
+                                            # kill -USR1 <pid> : ré-entraîne le modèle ML
+"""
+
+import os
+import sys
+import json
+import argparse
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+
+def time_arg(value: str) -> float:
+    """--since / --until : date lue par core.replay.parse_time, erreur argparse si illisible"""
+    from core.replay import parse_time
+
+    try:
+        return parse_time(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def cmd_replay(args) -> int:
+    from core.replay import Replayer, expand_paths
+
+    paths = expand_paths(args.paths)
+    if not paths:
+        print("[Replay] Aucun fichier trouvé")
+        return 1
+    encrypted = {"auto": None, "encrypted": True, "plain": False}[args.mode]
+    replayer = Replayer(
+        db_path=args.db, since=args.since, until=args.until,
+        batch_size=args.batch_size, fmt=args.format, reputation=args.reputation,
+        dry_run=args.dry_run, notify=None if args.json else print, detector_mode=args.detectors
+    )
+    report = replayer.run(paths, encrypted)
+
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        return 0
+
+    print("=" * 60)
+    print(f"Fichiers      : {report['files']}")
+    print(f"Lignes lues   : {report['lines']} (analysées: {report['analyzed']}, "
+          f"hors plage: {report['out_of_range']}, illisibles: {report['decrypt_errors']})")
+    print(f"Durée         : {report['elapsed_sec']} s  ->  {report['lines_per_sec']} lignes/s")
+    print(f"Alertes       : {report['alerts']}" + (" (simulation, rien n'est écrit)" if report['dry_run'] else f" -> {report['db']}"))
+    print("-" * 60)
+    print(f"{'Type':<24}{'Rejeu':>8}{'Existant':>10}{'Écart':>8}")
+    for attack_type, delta in report["delta"].items():
+        print(f"{attack_type:<24}{report['by_type'].get(attack_type, 0):>8}"
+              f"{report['baseline'].get(attack_type, 0):>10}{delta:>+8}")
+    detectors = report["detectors"]
+    print("-" * 60)
+    print(f"Détecteurs ({detectors['mode']}) : {' > '.join(detectors['order'])}")
+    gate = report["ml_gate"]
+    if gate and gate["enabled"]:
+        print(f"Portique ML   : {gate['pass_rate']:.1%} des lignes sans la forêt "
+              f"(contrôlées: {gate['audited']}, désaccords: {gate['disagreements']})")
+    return 0
+
+
+def cmd_stats(args) -> int:
+    from urllib.request import urlopen
+    from urllib.error import URLError
+    from config.settings import settings
+    from core.metrics import parse_metrics_address
+
+    host, port = parse_metrics_address(args.addr or settings.METRICS_ADDR)
+    path = "/metrics" if args.prometheus else "/stats"
+    try:
+        with urlopen(f"http://{host}:{port}{path}", timeout=5) as response:
+            body = response.read().decode("utf-8")
+    except (URLError, OSError) as e:
+        print(f"[Stats] Moteur injoignable sur {host}:{port} ({e}). METRICS_ENABLED=1 est-il défini ?")
+        return 1
+
+    if args.prometheus or args.json:
+        print(body)
+        return 0
+
+    stats = json.loads(body)
+    print(f"Uptime : {stats['uptime_sec']} s")
+    print("-" * 72)
+    print(f"{'Étape':<24}{'n':>10}{'p50 ms':>10}{'p99 ms':>10}{'p99.9 ms':>10}{'max ms':>8}")
+    for stage, h in stats["stages"].items():
+        print(f"{stage:<24}{h['count']:>10}{h['p50_ms']:>10.4f}{h['p99_ms']:>10.4f}{h['p99.9_ms']:>10.4f}{h['max_ms']:>8.1f}")
+    print("-" * 72)
+    for name, samples in list(stats["counters"].items()) + list(stats["gauges"].items()):
+        for sample in samples:
+            labels = ",".join(f"{k}={v}" for k, v in sample["labels"].items())
+            print(f"{name + ('{' + labels + '}' if labels else ''):<56}{sample['value']:>16g}")
+    return 0
+
+
+def cmd_run(args) -> int:
+    import signal
+    import threading
+    from core.engine import SIEMEngine
+
+    def on_alert(alert: dict):
+        print(f"[ALERTE] {alert['timestamp']}  {alert['type']:<20} {alert['ip']:<16} "
+              f"{alert.get('country', '-')}  ML:{alert.get('ml_score') or 0:.2f}", flush=True)
+
+    engine = SIEMEngine(
+        on_log=(lambda text: print(text, flush=True)) if args.verbose else None,
+        on_alert=on_alert
+    )
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())  # Arrêt du conteneur
+    if hasattr(signal, "SIGUSR1") and engine.retrain:
+        # kill -USR1 <pid> : ré-entraînement du modèle ML à chaud
+        signal.signal(signal.SIGUSR1, lambda signum, frame: engine.retrain.request())
+    engine.start()
+    print("[SYSTEM] Moteur démarré (Ctrl+C pour arrêter)", flush=True)
+    try:
+        while not stop.wait(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+        from geo_finder import close_reader
+        close_reader()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="siem_cli", description="Outils SIEM en ligne de commande")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    replay = sub.add_parser("replay", help="Rejoue des archives de logs à travers la détection")
+    replay.add_argument("paths", nargs="+", help="Fichiers ou motifs glob (.enc, clair, .gz)")
+    replay.add_argument("--since", type=time_arg,
+                        help="Début de plage, UTC sans fuseau comme les logs (ex: 2026-02-01 ou '2026-02-01 08:00')")
+    replay.add_argument("--until", type=time_arg, help="Fin de plage (exclue)")
+    replay.add_argument("--db", help="Base de résultats séparée (requise sauf avec --dry-run)")
+    replay.add_argument("--mode", choices=("auto", "encrypted", "plain"), default="auto",
+                        help="Archives chiffrées ou en clair (défaut: détection automatique)")
+    replay.add_argument("--format", choices=("unified", "clf"), help="Format de log attendu")
+    replay.add_argument("--batch-size", type=int, default=2000, help="Lignes par lot ML / transaction")
+    replay.add_argument("--detectors", choices=("fixed", "adaptive", "all"),
+                        help="Ordonnancement des détecteurs (défaut: DETECTOR_MODE)")
+    replay.add_argument("--reputation", action="store_true", help="Interroger AbuseIPDB (désactivé par défaut)")
+    replay.add_argument("--dry-run", action="store_true", help="Détecter sans écrire en base")
+    replay.add_argument("--json", action="store_true", help="Rapport JSON")
+    replay.set_defaults(func=cmd_replay)
+
+    stats = sub.add_parser("stats", help="Métriques du moteur en cours d'exécution")
+    stats.add_argument("--addr", help="hôte:port du point d'accès (défaut: METRICS_ADDR)")
+    stats.add_argument("--json", action="store_true", help="Instantané JSON brut")
+    stats.add_argument("--prometheus", action="store_true", help="Format texte Prometheus")
+    stats.set_defaults(func=cmd_stats)
+
+    run = sub.add_parser("run", help="Moteur de détection sans interface graphique")
+    run.add_argument("-v", "--verbose", action="store_true", help="Affiche aussi chaque ligne analysée")
+    run.set_defaults(func=cmd_run)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    # Rejouer dans siem.db dupliquerait les alertes déjà enregistrées par le moteur
+    if args.command == "replay" and not args.db and not args.dry_run:
+        parser.error("replay : --db est requis (base de résultats séparée), ou --dry-run")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
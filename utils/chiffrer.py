@@ -1,13 +1,13 @@
-from cryptography.fernet import Fernet
 import sys
 import os
 
 # Ajouter le chemin parent pour importer config.settings
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from config.settings import settings
+from utils.keyring import get_keyring
 
-key = settings.FERNET_KEY.encode()
-fernet = Fernet(key)
+keyring = get_keyring()
+fernet = keyring.current
 
 def chiffrer_donnees(data_str: str, dest_file: str = None):
     """Chiffre une chaîne de caractères et l'ajoute comme une nouvelle ligne au fichier destination"""
@@ -19,7 +19,8 @@ def chiffrer_donnees(data_str: str, dest_file: str = None):
     
     # On s'assure que la donnée est sur une seule ligne pour le stockage
     data_str = data_str.strip().replace("\n", " ")
-    encrypted = fernet.encrypt(data_str.encode())
+    # Enregistrement préfixé par l'identifiant de clé (voir utils/keyring.py)
+    encrypted = keyring.encrypt(data_str.encode())
     
     # On ajoute le log chiffré sur une nouvelle ligne (en base64/ascii pour être lisible par ligne)
     with open(dest_file, "ab") as f:
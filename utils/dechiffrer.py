@@ -1,12 +1,12 @@
-from cryptography.fernet import Fernet
 import sys , os
 
 # Ajouter le chemin parent pour importer config.settings
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from config.settings import settings
+from utils.keyring import get_keyring
 
-key = settings.FERNET_KEY.encode()
-fernet = Fernet(key)
+keyring = get_keyring()
+fernet = keyring.current
 
 def dechiffrer_fichier(src):
     """Déchiffre un fichier complet (format ligne par ligne)"""
@@ -19,7 +19,7 @@ def dechiffrer_fichier(src):
             line = line.strip()
             if not line: continue
             try:
-                decrypted = fernet.decrypt(line)
+                decrypted = keyring.decrypt(line)
                 results.append(decrypted.decode("utf-8", errors="ignore"))
             except Exception as e:
                 print(f"[Crypto] Erreur ligne: {e}")
@@ -29,7 +29,7 @@ def dechiffrer_fichier(src):
 def dechiffrer_donnees(encrypted_data: bytes) -> str:
     """Déchiffre un bloc de données (ligne unique)"""
     try:
-        decrypted = fernet.decrypt(encrypted_data.strip())
+        decrypted = keyring.decrypt(encrypted_data)
         return decrypted.decode("utf-8", errors="ignore")
     except:
         return ""
@@ -0,0 +1,103 @@
+import hashlib
+from cryptography.fernet import Fernet, InvalidToken
+from typing import Dict, Iterable, List, Optional
+
+# Séparateur entre l'identifiant de clé et le jeton Fernet.
+# Un jeton Fernet est en base64 "urlsafe" : il ne contient jamais ':'.
+SEPARATOR = b":"
+KEY_ID_LENGTH = 8
+
+
+def key_id(key: bytes) -> bytes:
+    """Identifiant court (et non secret) d'une clé Fernet"""
+    return hashlib.sha256(key).hexdigest()[:KEY_ID_LENGTH].encode()
+
+
+class KeyRing:
+    """
+    Trousseau de clés Fernet indexé par identifiant.
+    Chaque enregistrement est écrit sous la forme `<key_id>:<jeton>` :
+    le lecteur choisit directement la bonne clé (O(1)) au lieu d'essayer
+    chaque clé tour à tour comme MultiFernet.
+    """
+
+    def __init__(self, current_key: bytes, old_keys: Iterable[bytes] = ()):
+        self.current_id = key_id(current_key)
+        self.current = Fernet(current_key)
+        self._fernets: Dict[bytes, Fernet] = {self.current_id: self.current}
+        for k in old_keys:
+            kid = key_id(k)
+            if kid not in self._fernets:
+                self._fernets[kid] = Fernet(k)
+        # Ordre d'essai pour les anciens enregistrements sans identifiant
+        self._legacy_order: List[Fernet] = list(self._fernets.values())
+
+    @property
+    def key_ids(self) -> List[bytes]:
+        return list(self._fernets.keys())
+
+    def split(self, record: bytes):
+        """Sépare un enregistrement en (key_id, jeton). key_id vaut None pour le format historique"""
+        record = record.strip()
+        kid, sep, token = record.partition(SEPARATOR)
+        if not sep:
+            return None, record
+        return kid, token
+
+    def encrypt(self, data: bytes, at_time: Optional[int] = None) -> bytes:
+        """Chiffre avec la clé courante et préfixe l'identifiant de clé"""
+        if at_time is None:
+            token = self.current.encrypt(data)
+        else:
+            token = self.current.encrypt_at_time(data, at_time)
+        return self.current_id + SEPARATOR + token
+
+    def decrypt(self, record: bytes) -> bytes:
+        """Déchiffre un enregistrement (lève InvalidToken si aucune clé ne correspond)"""
+        kid, token = self.split(record)
+        if kid is not None:
+            fernet = self._fernets.get(kid)
+            if fernet is None:
+                raise InvalidToken
+            return fernet.decrypt(token)
+
+        # Format historique (sans identifiant) : essai séquentiel, clé courante en premier
+        for fernet in self._legacy_order:
+            try:
+                return fernet.decrypt(token)
+            except InvalidToken:
+                continue
+        raise InvalidToken
+
+    def needs_rotation(self, record: bytes) -> bool:
+        """Vrai si l'enregistrement n'est pas chiffré avec la clé courante"""
+        kid, _ = self.split(record)
+        return kid != self.current_id
+
+    def rotate(self, record: bytes) -> bytes:
+        """Rechiffre un enregistrement avec la clé courante en conservant son horodatage Fernet"""
+        kid, token = self.split(record)
+        if kid == self.current_id:
+            return record.strip()
+        fernet = self._fernets.get(kid) if kid is not None else None
+        candidates = [fernet] if fernet is not None else self._legacy_order
+        for f in candidates:
+            try:
+                data = f.decrypt(token)
+                timestamp = f.extract_timestamp(token)
+                return self.encrypt(data, at_time=timestamp)
+            except InvalidToken:
+                continue
+        raise InvalidToken
+
+
+_KEYRING = None
+
+def get_keyring() -> KeyRing:
+    """Trousseau global construit à partir de FERNET_KEY (courante) et FERNET_OLD_KEYS (retirées)"""
+    global _KEYRING
+    if _KEYRING is None:
+        from config.settings import settings
+        old_keys = [k.strip().encode() for k in settings.FERNET_OLD_KEYS.split(",") if k.strip()]
+        _KEYRING = KeyRing(settings.FERNET_KEY.encode(), old_keys)
+    return _KEYRING
@@ -0,0 +1,146 @@
+import re
+from datetime import datetime, timezone
+from typing import Optional
+
+from utils.normalize import normalize
+
+# Format Node.js unifié (éventuellement précédé de "[HH:MM:SS] ") :
+#   2026-02-18T11:58:30.166Z  190.162.53.218  POST /api/auth/login body:{...}  401  138ms
+UNIFIED_RE = re.compile(
+    r'^(?:\[\d{2}:\d{2}:\d{2}\]\s+)?(?P<time>\d{4}-\d{2}-\d{2}T\S+)\s+(?P<ip>[0-9A-Fa-f:.]+)\s+'
+    r'(?P<method>[A-Z]{3,7})\s+(?P<rest>.*?)\s+(?P<status>\d{3})\s+(?P<duration>\d+)ms\s*$',
+    re.S
+)
+# Apache Common/Combined Log Format :
+#   1.2.3.4 - - [04/Feb/2026:12:00:00 +0100] "GET /index.html HTTP/1.1" 200 512 "-" "Mozilla/5.0"
+CLF_RE = re.compile(
+    r'^(?P<ip>[0-9A-Fa-f:.]+)\s+\S+\s+\S+\s+\[(?P<time>[^\]]+)\]\s+'
+    r'"(?P<method>[A-Z]{3,7})\s+(?P<target>.*?)(?:\s+HTTP/[\d.]+)?"\s+(?P<status>\d{3})\s+(?P<size>\d+|-)'
+    r'(?:\s+"(?P<referer>[^"]*)"\s+"(?P<ua>[^"]*)")?'
+)
+# Marqueurs de fin de cible dans le format unifié
+BODY_MARKER_RE = re.compile(r'\s(?:body:|User-Agent:)')
+USER_AGENT_RE = re.compile(r'User-Agent:\s*"([^"]*)"')
+# Repli pour les lignes non reconnues : première adresse IPv4
+IPV4_RE = re.compile(r'(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})')
+
+FORMATS = ("unified", "clf")
+
+
+class LogRecord(str):
+    """
+    Ligne de log analysée une seule fois.
+    C'est une `str` (la ligne brute, sans espaces de fin) : tout code qui attend une
+    ligne continue de fonctionner, et les détecteurs lisent les champs structurés
+    sans re-parser. `normalized` est calculé une seule fois puis partagé.
+    """
+    __slots__ = ("fmt", "event_time", "ip", "method", "path", "query", "body",
+                 "status", "duration_ms", "user_agent", "_normalized", "_epoch")
+
+    @property
+    def parsed(self) -> bool:
+        return self.fmt is not None
+
+    @property
+    def target(self) -> Optional[str]:
+        """Chemin + query string"""
+        if self.path is None:
+            return None
+        return f"{self.path}?{self.query}" if self.query is not None else self.path
+
+    @property
+    def normalized(self) -> str:
+        if self._normalized is None:
+            self._normalized = normalize(self)
+        return self._normalized
+
+    @property
+    def epoch(self) -> Optional[float]:
+        """Horodatage de l'événement (secondes epoch UTC), None si absent ou illisible"""
+        if self._epoch is None and self.event_time:
+            try:
+                if self.fmt == "clf":
+                    dt = datetime.strptime(self.event_time, "%d/%b/%Y:%H:%M:%S %z")
+                else:
+                    dt = datetime.fromisoformat(self.event_time.replace("Z", "+00:00"))
+                    if dt.tzinfo is None:
+                        dt = dt.replace(tzinfo=timezone.utc)
+                self._epoch = dt.timestamp()
+            except ValueError:
+                self._epoch = False
+        return self._epoch or None
+
+
+def _new(line: str, fmt=None, event_time=None, ip=None, method=None, target=None,
+         body=None, status=None, duration_ms=None, user_agent=None) -> LogRecord:
+    record = LogRecord(line)
+    record.fmt = fmt
+    record.event_time = event_time
+    record.ip = ip
+    record.method = method
+    if target is not None:
+        path, sep, query = target.partition("?")
+        record.path = path
+        record.query = query if sep else None
+    else:
+        record.path = record.query = None
+    record.body = body
+    record.status = status
+    record.duration_ms = duration_ms
+    record.user_agent = user_agent
+    record._normalized = None
+    record._epoch = None
+    return record
+
+
+def _parse_unified(line: str) -> Optional[LogRecord]:
+    m = UNIFIED_RE.match(line)
+    if not m:
+        return None
+    rest = m.group("rest")
+    body = None
+    marker = BODY_MARKER_RE.search(rest)
+    if marker:
+        target, extra = rest[:marker.start()], rest[marker.start() + 1:]
+        if extra.startswith("body:"):
+            body = extra[5:]
+    else:
+        target = rest
+    ua = USER_AGENT_RE.search(rest)
+    return _new(line, "unified", m.group("time"), m.group("ip"), m.group("method"), target,
+                body, int(m.group("status")), int(m.group("duration")),
+                ua.group(1) if ua else None)
+
+
+def _parse_clf(line: str) -> Optional[LogRecord]:
+    m = CLF_RE.match(line)
+    if not m:
+        return None
+    return _new(line, "clf", m.group("time"), m.group("ip"), m.group("method"), m.group("target"),
+                None, int(m.group("status")), None, m.group("ua"))
+
+
+_PARSERS = {"unified": _parse_unified, "clf": _parse_clf}
+
+
+def parse(line: str, fmt: str = None) -> LogRecord:
+    """
+    Analyse une ligne (format unifié ou CLF). `fmt` indique le format attendu,
+    essayé en premier. Une ligne non reconnue donne un LogRecord avec fmt=None
+    et seule l'IP (IPv4 trouvée dans la ligne) éventuellement renseignée.
+    """
+    if isinstance(line, LogRecord):
+        return line
+    line = line.strip()
+    order = (fmt, *(f for f in FORMATS if f != fmt)) if fmt in _PARSERS else FORMATS
+    for name in order:
+        record = _PARSERS[name](line)
+        if record is not None:
+            return record
+    ip = IPV4_RE.search(line)
+    return _new(line, ip=ip.group(1) if ip else None)
+
+
+def as_record(line: str) -> LogRecord:
+    """Retourne la ligne si elle est déjà analysée, sinon l'analyse (détection automatique du format)"""
+    return line if isinstance(line, LogRecord) else parse(line)
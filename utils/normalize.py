@@ -1,17 +1,46 @@
+import re
 import html
+import unicodedata
 from urllib.parse import unquote
 
+# Séquences d'échappement interprétées comme le codec 'unicode_escape' :
+# \xNN, \uNNNN, \UNNNNNNNN, octal, \N{nom}, échappements simples, backslash final
+ESCAPE_RE = re.compile(r"\\(x[0-9a-fA-F]{2}|u[0-9a-fA-F]{4}|U[0-9a-fA-F]{8}|[0-7]{1,3}|N\{[^}]*\}|.|$)", re.S)
+SIMPLE_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "a": "\a", "b": "\b", "f": "\f", "v": "\v", "\n": ""}
+
+
+def _unescape(match) -> str:
+    seq = match.group(1)
+    head = seq[:1]
+    try:
+        if head in ("x", "u", "U") and len(seq) > 1:
+            return chr(int(seq[1:], 16))
+        if head.isdigit() and head < "8":
+            return chr(int(seq, 8))
+        if head == "N" and len(seq) > 1:
+            return unicodedata.lookup(seq[2:-1])
+    except (KeyError, ValueError):
+        pass
+    # Échappement simple, inconnu ou invalide : le backslash disparaît (comme en sortie de l'ancien décodage)
+    return SIMPLE_ESCAPES.get(seq, seq)
+
+
 def normalize(text: str) -> str:
+    """
+    Forme canonique d'une ligne pour les détecteurs : URL décodée (deux fois, pour le double
+    encodage), entités HTML, séquences d'échappement, sans backslash, espaces réduits, minuscules.
+    Chaque étape ne tourne que si son caractère déclencheur (%, &, \\) est présent :
+    une ligne ordinaire n'a que ses espaces et sa casse à normaliser.
+    Le texte non ASCII est conservé tel quel
+    """
     if not text:
         return ""
-    try:
-        decoded = unquote(text)
-        decoded =unquote(decoded)   # Pour double encodage 
-        decoded = html.unescape(decoded) 
-        decoded = decoded.encode('utf-8').decode('unicode_escape')
-        decoded = decoded.replace('\\"', '"').replace("\\'", "'")
-        decoded = decoded.replace("\\\\", "").replace("\\","")
-        decoded = " ".join(decoded.split())
-        return decoded.lower().strip()
-    except:
-        return text.lower().strip()
+    if "%" in text:
+        text = unquote(text)
+        if "%" in text:
+            text = unquote(text)   # Pour double encodage
+    if "&" in text:
+        text = html.unescape(text)
+    if "\\" in text:
+        text = ESCAPE_RE.sub(_unescape, text).replace("\\", "")
+    return " ".join(text.split()).lower()
@@ -0,0 +1,138 @@
+import glob
+import os
+import sys
+import threading
+import time
+
+# Ajouter le chemin parent pour importer config.settings
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from config.settings import settings
+from utils.keyring import get_keyring
+
+TMP_SUFFIX = ".rechiffre.tmp"
+
+
+def segment_needs_rotation(path: str, keyring=None) -> bool:
+    """Vrai si au moins un enregistrement du segment n'utilise pas la clé courante (sans déchiffrer)"""
+    keyring = keyring or get_keyring()
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip() and keyring.needs_rotation(line):
+                return True
+    return False
+
+
+def rechiffrer_segment(path: str, keyring=None, batch_size: int = 1000, pause: float = 0.0) -> int:
+    """
+    Réécrit un segment archivé avec la clé courante.
+    L'écriture se fait dans un fichier temporaire puis os.replace() : le segment
+    reste lisible à tout moment. Retourne le nombre d'enregistrements rechiffrés.
+    """
+    keyring = keyring or get_keyring()
+    if not segment_needs_rotation(path, keyring):
+        return 0
+
+    tmp_path = path + TMP_SUFFIX
+    rotated = 0
+    try:
+        with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+            for i, line in enumerate(src, 1):
+                record = line.strip()
+                if not record:
+                    continue
+                if keyring.needs_rotation(record):
+                    try:
+                        record = keyring.rotate(record)
+                        rotated += 1
+                    except Exception as e:
+                        # Enregistrement illisible : on le conserve tel quel
+                        print(f"[Crypto] Rechiffrement impossible ({path}:{i}): {e}")
+                dst.write(record + b"\n")
+                # Céder la main régulièrement pour ne pas concurrencer le watcher
+                if pause and i % batch_size == 0:
+                    time.sleep(pause)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return rotated
+
+
+class Rechiffreur:
+    """
+    Compacteur de fond : rechiffre périodiquement les segments archivés
+    (CHIFFRED_PATH.*) avec la clé courante. Le fichier vivant n'est jamais
+    modifié, le watcher continue donc de le suivre sans interruption.
+    """
+
+    def __init__(self, pattern: str = None, live_path: str = None,
+                 interval: float = None, min_age: float = 60.0, pause: float = 0.01):
+        self.pattern = pattern or settings.REENCRYPT_GLOB
+        self.live_path = os.path.abspath(live_path or settings.CHIFFRED_PATH)
+        self.interval = settings.REENCRYPT_INTERVAL if interval is None else interval
+        self.min_age = min_age      # Ignorer les segments encore en cours d'écriture
+        self.pause = pause
+        self.running = False
+        self.thread = None
+        self._wakeup = threading.Event()
+
+    def segments(self) -> list:
+        now = time.time()
+        result = []
+        for path in sorted(glob.glob(self.pattern)):
+            if os.path.abspath(path) == self.live_path or path.endswith(TMP_SUFFIX):
+                continue
+            try:
+                if now - os.path.getmtime(path) < self.min_age:
+                    continue
+            except OSError:
+                continue
+            result.append(path)
+        return result
+
+    def run_once(self) -> int:
+        """Rechiffre tous les segments éligibles, retourne le nombre d'enregistrements traités"""
+        total = 0
+        for path in self.segments():
+            try:
+                total += rechiffrer_segment(path, pause=self.pause)
+            except Exception as e:
+                print(f"[Crypto] Erreur rechiffrement {path}: {e}")
+        return total
+
+    def start(self):
+        if self.running: return
+        self.running = True
+        self.thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if not self.running: return
+        self.running = False
+        self._wakeup.set()
+        if self.thread:
+            self.thread.join(timeout=2)
+
+    def trigger(self):
+        """Demande un passage immédiat (ex: juste après une rotation de clé)"""
+        self._wakeup.set()
+
+    def _run_loop(self):
+        while self.running:
+            count = self.run_once()
+            if count:
+                print(f"[Crypto] {count} enregistrements rechiffrés avec la clé {get_keyring().current_id.decode()}")
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+
+def main():
+    # Usage: python utils/rechiffrer.py [segment ...]
+    paths = sys.argv[1:] or Rechiffreur(min_age=0).segments()
+    for path in paths:
+        print(f"{path}: {rechiffrer_segment(path)} enregistrements rechiffrés")
+
+if __name__ == "__main__":
+    main()